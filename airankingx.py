@@ -5,15 +5,71 @@ import csv
 import io
 import os
 import socket
+import time
 import logging
-import re
 import shutil
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import parse_qs, unquote, urlparse
+
+import backup_store
+import commit_log
+import data_version
+import leaderboard_snapshot
+import pair_stats
+import period_stats
+import prefork_server
+import ranking_index
+import record_archive
+import record_normalize
+import request_body
+import request_profiler
+import response_cache
+import server_lifecycle
+import settlement
+import skill_rating
+import stats_verifier
 
 PORT = 8888
 PassWord = "88888"
 LOG_FILE = "server.log"
-CODEBASE_PATH = "/home/jerry/codebase/airanking/"
+CODEBASE_PATH = os.environ.get('AIRANKING_CODEBASE_PATH', "/home/jerry/codebase/airanking/")
+# Directory holding the CSV data files (defaults to the server directory)
+DATA_DIR = os.environ.get('AIRANKING_DATA_DIR') or os.path.dirname(os.path.abspath(__file__))
+# Allowed difference (cents) between submitted FinalChips and the settlement engine's allocation
+FINAL_CHIPS_TOLERANCE_CENTS = 1
+# Request body limits for POST endpoints (bytes / seconds). In single-process mode a
+# slow client holds every other request for up to BODY_TOTAL_TIMEOUT: keep it short
+MAX_BODY_BYTES = int(os.environ.get('AIRANKING_MAX_BODY_BYTES', 10 * 1024 * 1024))
+BODY_READ_TIMEOUT = float(os.environ.get('AIRANKING_BODY_READ_TIMEOUT', 2))
+BODY_TOTAL_TIMEOUT = float(os.environ.get('AIRANKING_BODY_TOTAL_TIMEOUT', 5))
+# Pre-fork mode: number of reader processes (0 = single process)
+WORKERS = int(os.environ.get('AIRANKING_WORKERS', 0))
+# Deduplicated snapshot of the data files after every commit (AIRANKING_BACKUP=0 disables)
+BACKUP_ENABLED = os.environ.get('AIRANKING_BACKUP', '1') != '0'
+BACKUP_DIR = os.environ.get('AIRANKING_BACKUP_DIR') or os.path.join(DATA_DIR, 'backups')
+BACKUP_KEEP = os.environ.get('AIRANKING_BACKUP_KEEP', backup_store.DEFAULT_RETENTION)
+# Seal finished quarters of team_building_record.csv into archive/ (AIRANKING_ARCHIVE=0 disables)
+ARCHIVE_ENABLED = os.environ.get('AIRANKING_ARCHIVE', '1') != '0'
+# Check player_statistics.csv against a full recompute in a nice'd child process
+# every AIRANKING_VERIFY_INTERVAL seconds (0 disables)
+VERIFY_INTERVAL = float(os.environ.get('AIRANKING_VERIFY_INTERVAL', 6 * 3600))
+VERIFY_WORKERS = int(os.environ.get('AIRANKING_VERIFY_WORKERS', 2))
+# Per-process cache of ?period= / ?season= leaderboards
+PERIOD_CACHE = period_stats.WindowCache(os.path.join(DATA_DIR, period_stats.PERIODS_FILE))
+# Per-process pair matrix behind /player/<name>/versus and /pairs (bodies go through RESPONSE_CACHE)
+PAIR_CACHE = pair_stats.PairCache(os.path.join(DATA_DIR, pair_stats.PAIRS_FILE))
+DEFAULT_TOP_PAIRS = 20
+# Per-process cache of encoded GET responses, dropped as a whole when the data version changes
+# (AIRANKING_RESPONSE_CACHE_BYTES=0 disables)
+RESPONSE_CACHE = response_cache.ResponseCache(
+    int(os.environ.get('AIRANKING_RESPONSE_CACHE_BYTES', response_cache.DEFAULT_MAX_BYTES)))
+# Routes answered through RESPONSE_CACHE (exact paths; see is_cached_route)
+CACHED_ROUTES = ('/leaderboard', '/pairs', '/records')
+# Per-process ordered index behind ?top=, ?offset=&limit= and /rank/<player>
+RANKING = ranking_index.LiveIndex()
+# Page size for ?offset= without ?limit=, and players on each side for /rank/<player>
+DEFAULT_PAGE_LIMIT = 50
+DEFAULT_NEIGHBOURS = 2
+RECORD_FIELDS = ['Time', 'ServiceFee_Rate', 'Player', 'Chips', 'WinOrLose', 'Value', 'FinalChips']
 
 # Configure logging
 try:
@@ -42,6 +98,14 @@ except (IOError, PermissionError) as e:
     )
 
 class CustomHandler(SimpleHTTPRequestHandler):
+    # Set per process by prefork_server: readers forward writes to the writer
+    # socket and serve reads from the snapshot; the writer republishes it.
+    writer_socket = None
+    snapshot = None
+    snapshot_publisher = None
+    # Normalized URL under which send_json stores this GET's response (see serve_cached)
+    cache_key = None
+
     def log_message(self, format, *args):
         """Override log_message to use our logging system."""
         logging.info("%s - %s" % (self.address_string(), format % args))
@@ -57,10 +121,24 @@ class CustomHandler(SimpleHTTPRequestHandler):
         self.send_response(200)
         self.end_headers()
 
+    @request_profiler.profiled
     def do_GET(self):
         # Make index.html the default page
         if self.path == '/':
             self.path = '/index.html'
+
+        # API routes match the exact path so static files (e.g. records_bak/) fall through
+        route = urlparse(self.path).path
+
+        # Derived views are answered from the response cache until the data changes
+        self.cache_key = None
+        if RESPONSE_CACHE.enabled and is_cached_route(route) and self.serve_cached():
+            return
+
+        # Response cache counters of this process
+        if route == '/cache_stats':
+            self.send_json({'success': True, 'pid': os.getpid(), 'cache': RESPONSE_CACHE.stats()})
+            return
         
         # Handle the update_leaderboard endpoint for GET requests with test_mode
         if self.path.startswith('/update_leaderboard'):
@@ -79,7 +157,7 @@ class CustomHandler(SimpleHTTPRequestHandler):
                 
                 response = {
                     'success': True,
-                    'message': 'Test mode - no data was updated',
+                    'message': 'Test mode - no data was updated (POST /update_leaderboard?dry_run=1 runs the full pipeline without writing)',
                     'test': True
                 }
                 
@@ -87,131 +165,393 @@ class CustomHandler(SimpleHTTPRequestHandler):
                 return
 
         # Provide leaderboard data from player_statistics.csv
-        if self.path.startswith('/leaderboard'):
+        if route == '/leaderboard':
             client_ip = self.address_string()
             logging.info(f"📊 GET /leaderboard request from {client_ip}")
             try:
+                since = self.parse_since()
+                version = self.current_data_version()
+                if self.not_modified(since, version):
+                    logging.info(f"✓ Leaderboard v{version} not modified for {client_ip}")
+                    return
+
+                query_params = parse_qs(urlparse(self.path).query)
+                paging = self.parse_paging(query_params)
+                if paging is not None:
+                    if 'period' in query_params or 'season' in query_params:
+                        raise ValueError("top/offset/limit cannot be combined with period or season")
+                    offset, limit = paging
+                    index = self.ranking_index(version)
+                    self.send_json({
+                        'success': True,
+                        'version': version,
+                        'total': len(index),
+                        'offset': offset,
+                        'limit': limit,
+                        'lastUpdate': index.last_update,
+                        'playerStats': index.page(offset, limit)
+                    }, version)
+                    logging.info(f"✓ Leaderboard v{version} rows {offset + 1}-{offset + limit} sent to {client_ip}")
+                    return
+
+                if 'period' in query_params or 'season' in query_params:
+                    # Only an unknown season name is a 404; other KeyErrors are server errors
+                    try:
+                        window = self.parse_window(query_params)
+                    except KeyError as e:
+                        self.send_error_response(404, str(e.args[0]))
+                        return
+                    self.send_json(self.window_leaderboard(window, version), version)
+                    logging.info(f"✓ Windowed leaderboard v{version} sent to {client_ip}")
+                    return
+
+                if since is not None:
+                    state = self.data_version_state()
+                    delta = data_version.changes_since(state, since)
+                    if delta is not None:
+                        version = state['version']
+                        self.send_json({
+                            'success': True,
+                            'version': version,
+                            'since': since,
+                            'full': False,
+                            'lastUpdate': delta['lastUpdate'],
+                            'playerStats': delta['stats']
+                        }, version)
+                        logging.info(f"✓ Leaderboard v{since}→v{version} delta ({len(delta['stats'])} rows) sent to {client_ip}")
+                        return
+                    logging.info(f"   → v{since} not in the change log, sending full leaderboard")
+
+                # Reader workers serve the pre-rendered body straight from the shared snapshot
+                payload = self.snapshot.section('leaderboard') if self.snapshot is not None else None
+                if payload is not None:
+                    self.send_json(payload, self.snapshot.version)
+                    logging.info(f"✓ Leaderboard snapshot v{self.snapshot.version} sent to {client_ip}")
+                    return
+
                 stats = self.read_csv_file('player_statistics.csv')
                 logging.info(f"   → Loaded {len(stats)} player statistics")
-                
-                # Determine last update date from Date column (max string YYYY-MM-DD)
-                dates = [str(row.get('Date')).strip() for row in stats if row.get('Date')]
-                last_update = max(dates) if dates else None
-                logging.info(f"   → Last update date: {last_update}")
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response_data = {
-                    'success': True,
-                    'lastUpdate': last_update,
-                    'playerStats': stats
-                }
-                self.wfile.write(json.dumps(response_data).encode('utf-8'))
+                response_data = leaderboard_response(stats, version)
+                logging.info(f"   → Last update date: {response_data['lastUpdate']}")
+                self.send_json(response_data, version)
                 logging.info(f"✓ Leaderboard data sent successfully to {client_ip}")
                 return
+            except ValueError as e:
+                self.send_error_response(400, str(e))
+                return
             except Exception as e:
                 logging.error(f"❌ Failed to load leaderboard: {str(e)}")
                 self.send_error_response(500, f"Failed to load leaderboard: {str(e)}")
                 return
-        
+
+        # Rank of one player plus ?neighbours=N players on each side
+        if route.startswith('/rank/'):
+            client_ip = self.address_string()
+            player = unquote(route[len('/rank/'):])
+            logging.info(f"🏅 GET /rank/{player} request from {client_ip}")
+            try:
+                version = self.current_data_version()
+                if self.not_modified(None, version):
+                    return
+                neighbours = self.int_param(parse_qs(urlparse(self.path).query), 'neighbours', DEFAULT_NEIGHBOURS)
+                index = self.ranking_index(version)
+                rank, rows = index.around(player, neighbours)
+                self.send_json({
+                    'success': True,
+                    'version': version,
+                    'player': player,
+                    'rank': rank,
+                    'total': len(index),
+                    'lastUpdate': index.last_update,
+                    'playerStats': rows
+                }, version)
+                logging.info(f"✓ Rank of {player} (#{rank} of {len(index)}) sent to {client_ip}")
+                return
+            except KeyError as e:
+                self.send_error_response(404, str(e.args[0]))
+                return
+            except ValueError as e:
+                self.send_error_response(400, str(e))
+                return
+            except Exception as e:
+                logging.error(f"❌ Failed to look up rank: {str(e)}")
+                self.send_error_response(500, f"Failed to look up rank: {str(e)}")
+                return
+
+        # How a player does with each other player at the table
+        if route.startswith('/player/') and route.endswith('/versus'):
+            client_ip = self.address_string()
+            player = unquote(route[len('/player/'):-len('/versus')])
+            logging.info(f"🤝 GET /player/{player}/versus request from {client_ip}")
+            try:
+                version = self.current_data_version()
+                if self.not_modified(None, version):
+                    return
+
+                overall, opponents = pair_stats.versus(PAIR_CACHE.get(version), player)
+                self.send_json({
+                    'success': True,
+                    'version': version,
+                    'player': player,
+                    'overall': overall,
+                    'opponents': opponents
+                }, version)
+                logging.info(f"✓ Versus stats of {player} v{version} sent to {client_ip}")
+                return
+            except KeyError as e:
+                self.send_error_response(404, str(e.args[0]))
+                return
+            except Exception as e:
+                logging.error(f"❌ Failed to load versus stats: {str(e)}")
+                self.send_error_response(500, f"Failed to load versus stats: {str(e)}")
+                return
+
+        # Player pairs that played together most often
+        if route == '/pairs':
+            client_ip = self.address_string()
+            logging.info(f"🤝 GET /pairs request from {client_ip}")
+            try:
+                version = self.current_data_version()
+                if self.not_modified(None, version):
+                    return
+                top = self.int_param(parse_qs(urlparse(self.path).query), 'top', DEFAULT_TOP_PAIRS)
+
+                self.send_json({
+                    'success': True,
+                    'version': version,
+                    'top': top,
+                    'pairs': pair_stats.top_pairs(PAIR_CACHE.get(version), top)
+                }, version)
+                logging.info(f"✓ Top {top} pairs v{version} sent to {client_ip}")
+                return
+            except ValueError as e:
+                self.send_error_response(400, str(e))
+                return
+            except Exception as e:
+                logging.error(f"❌ Failed to load pairs: {str(e)}")
+                self.send_error_response(500, f"Failed to load pairs: {str(e)}")
+                return
+
+        # Game records, optionally only those appended after ?since=<version>,
+        # or only ?from=&to= (YYYY-MM-DD, inclusive) and/or ?player=
+        if route == '/records':
+            client_ip = self.address_string()
+            logging.info(f"📜 GET /records request from {client_ip}")
+            try:
+                since = self.parse_since()
+                version = self.current_data_version()
+                if self.not_modified(since, version):
+                    return
+
+                query_params = parse_qs(urlparse(self.path).query)
+                if any(name in query_params for name in ('from', 'to', 'player')):
+                    if since is not None:
+                        raise ValueError("since cannot be combined with from, to or player")
+                    start, end = (self.date_param(query_params, name) for name in ('from', 'to'))
+                    player = query_params['player'][0] if 'player' in query_params else None
+                    # Only the archived segments overlapping the range (or holding the player) are opened
+                    records = read_game_records()[0].rows(start, end, player)
+                    self.send_json({
+                        'success': True,
+                        'version': version,
+                        'full': False,
+                        'from': start,
+                        'to': end,
+                        'player': player,
+                        'records': records
+                    }, version)
+                    logging.info(f"✓ {len(records)} records ({start or '…'}..{end or '…'}"
+                                 f"{', ' + player if player else ''}) v{version} sent to {client_ip}")
+                    return
+
+                state = self.data_version_state() if since is not None else None
+                delta = data_version.changes_since(state, since) if state is not None else None
+                if delta is not None:
+                    version = state['version']
+                    self.send_json({
+                        'success': True,
+                        'version': version,
+                        'since': since,
+                        'full': False,
+                        'dates': delta['dates'],
+                        'records': delta['records']
+                    }, version)
+                    logging.info(f"✓ Records v{since}→v{version} delta ({len(delta['records'])} rows) sent to {client_ip}")
+                    return
+
+                records = list(read_game_records()[0])
+                self.send_json({'success': True, 'version': version, 'full': True, 'records': records}, version)
+                logging.info(f"✓ All {len(records)} records v{version} sent to {client_ip}")
+                return
+            except ValueError as e:
+                self.send_error_response(400, str(e))
+                return
+            except Exception as e:
+                logging.error(f"❌ Failed to load records: {str(e)}")
+                self.send_error_response(500, f"Failed to load records: {str(e)}")
+                return
+
         # Log the actual path requested for other GET requests
         logging.info(f"GET request for {self.path}")
         
         return SimpleHTTPRequestHandler.do_GET(self)
     
+    @request_profiler.profiled
     def do_POST(self):
+        parsed_url = urlparse(self.path)
+        # ?dry_run=1 runs the whole pipeline in memory and writes nothing
+        dry_run = parse_qs(parsed_url.query).get('dry_run', ['0'])[0].lower() in ('1', 'true', 'yes')
+
+        # Reader workers never write: hand the request to the single writer process
+        # (dry runs and /settle are read-only and are answered by the reader itself)
+        if self.writer_socket and not dry_run and parsed_url.path != '/settle':
+            self.forward_to_writer()
+            return
+
         # Handle /update_leaderboard endpoint
-        if self.path == '/update_leaderboard':
+        if parsed_url.path == '/update_leaderboard':
             client_ip = self.address_string()
             logging.info("=" * 80)
-            logging.info(f"📥 RECEIVED POST REQUEST to {self.path} from {client_ip}")
+            logging.info(f"📥 RECEIVED POST REQUEST to {self.path} from {client_ip}{' (DRY RUN)' if dry_run else ''}")
             logging.info("=" * 80)
             
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+            body_counter = {'bytes': 0}
+            # Per-stage wall time in milliseconds
+            timings = {}
+            clock = [time.perf_counter()]
+
+            def lap(stage):
+                now = time.perf_counter()
+                timings[stage] = round((now - clock[0]) * 1000, 3)
+                clock[0] = now
             
             try:
-                # Parse incoming JSON data
-                logging.info("🔍 Step 1: Parsing JSON data...")
-                data = json.loads(post_data.decode('utf-8'))
-                logging.info("✓ JSON data parsed successfully")
+                # Stream and parse incoming JSON data, validating record rows as they arrive
+                logging.info("🔍 Step 1: Reading and parsing JSON data...")
+                row_errors = {}
+                data = self.read_json_body(body_counter, row_errors)
+                logging.info(f"✓ JSON data parsed successfully ({body_counter['bytes']} bytes)")
+                dry_run = dry_run or data.get('dryRun') is True
+                lap('parse')
                 
-                # Get new records from request
-                new_records = data.get('newRecords', [])
-                logging.info(f"📊 Step 2: Received {len(new_records)} new game records")
+                # Group incoming records into game days. ``gameDays`` is the batch
+                # form ({date, records} per day, accepted per day); ``newRecords``
+                # is the legacy form used by app.js (all-or-nothing).
+                batch_mode = 'gameDays' in data
+                game_days = self.collect_game_days(data, row_errors)
+                new_records = [rec for day in game_days for rec in day['records']]
+                logging.info(f"📊 Step 2: Received {len(new_records)} new game records in {len(game_days)} game day(s) "
+                             f"({'batch' if batch_mode else 'legacy'} mode)")
                 
                 # Log details of new records
                 if new_records:
-                    dates_in_request = set()
-                    players_in_request = set()
-                    for record in new_records:
-                        if record.get('Time'):
-                            dates_in_request.add(record['Time'])
-                        if record.get('Player'):
-                            players_in_request.add(record['Player'])
-                    logging.info(f"   - Game dates: {sorted(dates_in_request)}")
+                    players_in_request = {rec.get('Player') for rec in new_records if rec.get('Player')}
+                    logging.info(f"   - Game dates: {[day['date'] for day in game_days]}")
                     logging.info(f"   - Players involved: {sorted(players_in_request)}")
                     logging.info(f"   - Total records to add: {len(new_records)}")
                 
+                lap('group')
+
+                # Finish any commit interrupted by an earlier failure before reading
+                if commit_log.CommitLog(get_file_path(commit_log.WAL_FILE)).has_pending():
+                    if dry_run:
+                        logging.warning("⚠️ Dry run: interrupted commit pending in the WAL, not recovering")
+                    else:
+                        recover_pending_commits()
+
                 # Read existing game records
                 logging.info("📖 Step 3: Reading existing game records...")
-                game_records = self.read_csv_file('team_building_record.csv')
+                game_records, quarantined = read_game_records()
                 logging.info(f"✓ Successfully read {len(game_records)} existing records from database")
+                lap('read')
 
-                # Extract dates (YYYY-MM-DD) from new_records and existing records
-                logging.info("🔍 Step 4: Validating data - checking for duplicate dates...")
-                def extract_date_str(t):
-                    s = str(t or '').strip()
-                    return s if re.fullmatch(r"\d{4}-\d{2}-\d{2}", s) else None
+                # Validate every game day in one pass: zero-sum, FinalChips, duplicates
+                logging.info("🔍 Step 4: Validating game days (zero-sum, FinalChips, players, dates)...")
+                existing_dates = game_records.dates()
+                day_results = self.validate_game_days(game_days, existing_dates)
+                accepted_days = [day for day, result in zip(game_days, day_results) if result['accepted']]
+                rejected = [result for result in day_results if not result['accepted']]
+                for result in rejected:
+                    logging.warning(f"⚠️ Game day {result['date']} rejected: {result['errors']}")
+                lap('validate')
 
-                new_dates = {d for d in (extract_date_str(r.get('Time')) for r in new_records) if d}
-                existing_dates = {d for d in (extract_date_str(r.get('Time')) for r in game_records) if d}
-
-                # If any date already exists, do not update
-                duplicate_dates = sorted(list(new_dates & existing_dates))
-                if duplicate_dates:
-                    logging.warning(f"⚠️ VALIDATION FAILED: Duplicate date(s) detected: {duplicate_dates}")
-                    logging.info("❌ Update operation REJECTED - duplicate dates found")
+                # Legacy submissions are rejected as a whole; batches only when nothing passed
+                if not game_days or (rejected and not batch_mode) or not accepted_days:
+                    duplicate_dates = sorted(r['date'] for r in rejected if r.get('duplicate'))
+                    if duplicate_dates and not batch_mode:
+                        message = '已经存在改日期记录，请核对'
+                    elif not game_days:
+                        message = 'No game records received'
+                    else:
+                        message = 'Validation failed: ' + '; '.join(
+                            f"{r['date']}: {', '.join(r['errors'])}" for r in rejected)
+                    logging.warning(f"⚠️ VALIDATION FAILED: {message}")
+                    logging.info("❌ Update operation REJECTED")
                     logging.info("=" * 80)
+                    response = {
+                        'success': False,
+                        'message': message,
+                        'duplicateDates': duplicate_dates,
+                        'days': day_results
+                    }
+                    if dry_run:
+                        response.update({'dryRun': True, 'timings': timings})
                     self.send_response(200)
                     self.send_header('Content-type', 'application/json')
                     self.end_headers()
-                    self.wfile.write(json.dumps({
-                        'success': False,
-                        'message': '已经存在改日期记录，请核对',
-                        'duplicateDates': duplicate_dates
-                    }).encode('utf-8'))
+                    self.wfile.write(json.dumps(response).encode('utf-8'))
                     return
                 
-                logging.info("✓ Validation passed - no duplicate dates found")
+                logging.info(f"✓ Validation passed for {len(accepted_days)} game day(s)")
                 
                 # Add new records
+                # Keep only the CSV columns so extra client fields never reach DictWriter
+                fieldnames = game_records.fieldnames
+                new_records = [{field: rec.get(field, '') for field in fieldnames}
+                               for day in accepted_days for rec in day['records']]
                 logging.info("➕ Step 5: Merging new records with existing data...")
                 original_count = len(game_records)
                 game_records.extend(new_records)
                 new_count = len(game_records)
                 logging.info(f"✓ Successfully merged: {original_count} + {len(new_records)} = {new_count} total records")
+                lap('merge')
                 
-                # Save updated game records to production
-                logging.info("💾 Step 6: Saving game records to production database...")
-                self.write_csv_file('team_building_record.csv', game_records)
-                logging.info("✓ Successfully saved game records to /var/www/airankingx.com/team_building_record.csv")
+                # Calculate player statistics
+                logging.info("🧮 Step 6: Calculating player statistics...")
+                player_stats = self.calculate_player_statistics(game_records)
+                logging.info(f"✓ Successfully calculated statistics for {len(player_stats)} players")
+                lap('stats')
                 
-                # Try to save to codebase (may fail due to permissions, but don't stop the process)
-                logging.info("💾 Step 7: Syncing game records to codebase...")
+                # Update skill ratings for the players at the new tables only
+                logging.info("🎯 Step 7: Updating skill ratings...")
+                rating_state = None
+                new_games = [(day['date'], day['records']) for day in accepted_days]
                 try:
-                    codebase_path = os.path.join(CODEBASE_PATH, 'team_building_record.csv')
-                    self.write_csv_file(codebase_path, game_records)
-                    logging.info(f"✓ Successfully synced game records to {codebase_path}")
+                    ratings_path = self.get_file_path(skill_rating.RATINGS_FILE)
+                    rating_state = skill_rating.update_ratings(ratings_path, game_records, new_games, save=False)
+                    attach_ratings(player_stats, rating_state)
+                    logging.info(f"✓ Skill ratings updated ({rating_state['games']} games rated)")
                 except Exception as e:
-                    logging.warning(f"⚠️ Failed to sync to codebase (non-critical): {str(e)}")
-                    logging.warning("   → You can manually sync later using: sudo sync_csv_back.sh")
+                    logging.warning(f"⚠️ Failed to update skill ratings (non-critical): {str(e)}")
+                lap('ratings')
                 
-                # Calculate player statistics
-                logging.info("🧮 Step 8: Calculating player statistics...")
-                player_stats = self.calculate_player_statistics(game_records)
-                logging.info(f"✓ Successfully calculated statistics for {len(player_stats)} players")
+                # Add the new game days to the monthly / daily period buckets
+                period_state = None
+                try:
+                    periods_path = self.get_file_path(period_stats.PERIODS_FILE)
+                    period_state = period_stats.update_buckets(periods_path, game_records, new_games, save=False)
+                except Exception as e:
+                    logging.warning(f"⚠️ Failed to update period buckets (non-critical): {str(e)}")
+                lap('periods')
+
+                # Add the new game days to the head-to-head / co-attendance pair matrix
+                pair_state = None
+                try:
+                    pairs_path = self.get_file_path(pair_stats.PAIRS_FILE)
+                    pair_state = pair_stats.update_pairs(pairs_path, game_records, new_games, save=False)
+                except Exception as e:
+                    logging.warning(f"⚠️ Failed to update pair matrix (non-critical): {str(e)}")
+                lap('pairs')
                 
                 # Log top 3 players
                 if len(player_stats) > 0:
@@ -220,31 +560,67 @@ class CustomHandler(SimpleHTTPRequestHandler):
                     for player in top_3:
                         logging.info(f"      #{player['Ranking']} {player['Player']}: {player['WinChips']} chips")
                 
-                # Save updated player statistics to production
-                logging.info("💾 Step 9: Saving player statistics to production database...")
-                self.write_csv_file('player_statistics.csv', player_stats)
-                logging.info("✓ Successfully saved player statistics to /var/www/airankingx.com/player_statistics.csv")
+                if dry_run:
+                    self.send_dry_run_response(day_results, new_records, player_stats, timings, lap)
+                    logging.info("=" * 80)
+                    logging.info("🧪 DRY RUN COMPLETE - nothing was written")
+                    logging.info(f"   - Would add {len(new_records)} records over {len(accepted_days)} game day(s)")
+                    logging.info(f"   - Timings (ms): {timings}")
+                    logging.info(f"   - Client: {client_ip}")
+                    logging.info("=" * 80)
+                    return
+
+                # Commit records, statistics and ratings behind the write-ahead log
+                logging.info("💾 Step 8: Committing game records and player statistics (write-ahead log)...")
+                version = commit_data_files([day['date'] for day in accepted_days], new_records,
+                                            game_records, player_stats, rating_state, period_state, quarantined,
+                                            pair_state)
+                logging.info(f"✓ Successfully committed to {DATA_DIR} (data version v{version})")
+                RESPONSE_CACHE.invalidate(version)
+
+                # Move quarters that have ended out of the hot records file
+                seal_closed_periods(game_records)
                 
                 # Try to save to codebase (may fail due to permissions, but don't stop the process)
-                logging.info("💾 Step 10: Syncing player statistics to codebase...")
+                logging.info("💾 Step 9: Syncing game records and player statistics to codebase...")
+                for filename, rows in (('team_building_record.csv', game_records.hot), ('player_statistics.csv', player_stats)):
+                    try:
+                        codebase_path = os.path.join(CODEBASE_PATH, filename)
+                        self.write_csv_file(codebase_path, rows)
+                        logging.info(f"✓ Successfully synced {filename} to {codebase_path}")
+                    except Exception as e:
+                        logging.warning(f"⚠️ Failed to sync {filename} to codebase (non-critical): {str(e)}")
+                        logging.warning("   → You can manually sync later using: sudo sync_csv_back.sh")
                 try:
-                    codebase_path = os.path.join(CODEBASE_PATH, 'player_statistics.csv')
-                    self.write_csv_file(codebase_path, player_stats)
-                    logging.info(f"✓ Successfully synced player statistics to {codebase_path}")
+                    copied = record_archive.copy_archive(DATA_DIR, CODEBASE_PATH)
+                    if copied:
+                        logging.info(f"✓ Synced {copied} new archive segment(s) to {CODEBASE_PATH}")
                 except Exception as e:
-                    logging.warning(f"⚠️ Failed to sync player stats to codebase (non-critical): {str(e)}")
-                    logging.warning("   → You can manually sync later using: sudo sync_csv_back.sh")
+                    logging.warning(f"⚠️ Failed to sync the record archive to codebase (non-critical): {str(e)}")
+
+                # Republish the shared snapshot so reader workers see the new data
+                if self.snapshot_publisher is not None:
+                    try:
+                        self.snapshot_publisher()
+                    except Exception as e:
+                        logging.error(f"❌ Failed to publish leaderboard snapshot: {str(e)}")
+
+                # Back up the committed files (non-critical: the commit already succeeded)
+                backup_data_files(version)
 
                 # Send success response with updated data
-                logging.info("📤 Step 11: Preparing success response...")
+                logging.info("📤 Step 10: Preparing success response...")
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.end_headers()
                 
+                # Only the hot records: archived quarters are served by /records?from=&to=
                 response = {
                     'success': True,
-                    'gameRecords': game_records,
-                    'playerStats': player_stats
+                    'version': version,
+                    'gameRecords': game_records.hot,
+                    'playerStats': player_stats,
+                    'days': day_results
                 }
                 
                 response_size = len(json.dumps(response))
@@ -254,17 +630,30 @@ class CustomHandler(SimpleHTTPRequestHandler):
                 
                 logging.info("=" * 80)
                 logging.info("🎉 UPDATE LEADERBOARD SUCCESS!")
-                logging.info(f"   - Added {len(new_records)} new game records")
+                logging.info(f"   - Added {len(new_records)} new game records over {len(accepted_days)} game day(s)")
+                if rejected:
+                    logging.info(f"   - Rejected game days: {[r['date'] for r in rejected]}")
                 logging.info(f"   - Updated {len(player_stats)} player statistics")
                 logging.info(f"   - Client: {client_ip}")
                 logging.info("=" * 80)
                 
+            except request_body.RequestBodyError as e:
+                logging.error("=" * 80)
+                logging.error(f"❌ REQUEST BODY REJECTED ({e.status_code}): {str(e)}")
+                logging.error(f"   - Client: {client_ip}")
+                logging.error(f"   - Bytes read: {body_counter['bytes']}")
+                logging.error("=" * 80)
+                # The rest of the body may still be on the wire; do not reuse the connection
+                self.close_connection = True
+                self.send_error_response(e.status_code, str(e))
+                
             except json.JSONDecodeError as e:
                 logging.error("=" * 80)
                 logging.error(f"❌ JSON PARSE ERROR: {str(e)}")
                 logging.error(f"   - Client: {client_ip}")
-                logging.error(f"   - Raw data length: {len(post_data)} bytes")
+                logging.error(f"   - Raw data length: {body_counter['bytes']} bytes")
                 logging.error("=" * 80)
+                self.close_connection = True
                 self.send_error_response(400, f"Invalid JSON data: {str(e)}")
                 
             except Exception as e:
@@ -278,11 +667,215 @@ class CustomHandler(SimpleHTTPRequestHandler):
                 logging.error(f"   - Traceback:\n{traceback.format_exc()}")
                 logging.error("=" * 80)
                 self.send_error_response(500, str(e))
+
+        # Service-fee allocation and FinalChips for one game day, in exact integer cents
+        elif parsed_url.path == '/settle':
+            client_ip = self.address_string()
+            try:
+                chunks = request_body.iter_body(self, MAX_BODY_BYTES, BODY_READ_TIMEOUT, BODY_TOTAL_TIMEOUT)
+                data = request_body.parse_json_object(chunks)
+                result = settlement.settle(data.get('players'), data.get('ServiceFee_Rate'))
+            except request_body.RequestBodyError as e:
+                self.close_connection = True
+                self.send_error_response(e.status_code, str(e))
+                return
+            except json.JSONDecodeError as e:
+                self.close_connection = True
+                self.send_error_response(400, f"Invalid JSON data: {str(e)}")
+                return
+            except ValueError as e:
+                self.send_error_response(400, str(e))
+                return
+            self.send_json({'success': True, **result})
+            logging.info(f"🧾 Settled {len(result['players'])} player(s), service fee {result['ServiceFee_Rate']}, "
+                         f"for {client_ip}")
         else:
             # Handle other POST requests (404 Not Found)
             logging.warning(f"Received POST request to unknown endpoint: {self.path}")
             self.send_error_response(404, "Endpoint not found")
     
+    def send_json(self, payload, version=None, cache_status=None):
+        """Send a 200 JSON response (dict, or pre-encoded bytes) tagged with the data version.
+
+        A GET armed by ``serve_cached`` stores the body in the response cache.
+        """
+        body = payload if isinstance(payload, (bytes, memoryview)) else json.dumps(payload).encode('utf-8')
+        # Snapshot sections (memoryview) already come from shared memory
+        if self.cache_key is not None and self.command == 'GET' and version is not None and isinstance(body, bytes):
+            RESPONSE_CACHE.put(version, self.cache_key, body)
+            cache_status = 'MISS'
+        self.cache_key = None
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if version is not None:
+            self.send_header('X-Data-Version', str(version))
+            self.send_header('ETag', f'"v{version}"')
+        if cache_status is not None:
+            self.send_header('X-Cache', cache_status)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def serve_cached(self):
+        """Send this GET's response from the cache and return True, or arm send_json to store it."""
+        try:
+            # Only these endpoints answer ?since= (the others just ignore it)
+            since = self.parse_since() if urlparse(self.path).path in ('/leaderboard', '/records') else None
+        except ValueError:
+            return False
+        key = response_cache.normalize_key(self.path)
+        if key == '/leaderboard' and self.snapshot is not None:
+            # Reader workers already serve the full leaderboard pre-rendered from the snapshot
+            return False
+        version = self.current_data_version()
+        body = RESPONSE_CACHE.get(version, key)
+        if body is None:
+            self.cache_key = key
+            return False
+        if not self.not_modified(since, version):
+            self.send_json(body, version, 'HIT')
+        logging.info(f"⚡ GET {key} v{version} from the response cache for {self.address_string()}")
+        return True
+
+    def parse_since(self):
+        """Return the ?since=<version> query parameter as an int, or None if absent."""
+        values = parse_qs(urlparse(self.path).query).get('since')
+        if not values:
+            return None
+        try:
+            return int(values[0])
+        except ValueError:
+            raise ValueError(f"Invalid since version: {values[0]}")
+
+    def int_param(self, query_params, name, default=None):
+        """Return a non-negative integer query parameter, ``default`` if absent."""
+        values = query_params.get(name)
+        if not values:
+            return default
+        try:
+            value = int(values[0])
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise ValueError(f"Invalid {name}: {values[0]} (expected a non-negative integer)")
+        return value
+
+    def date_param(self, query_params, name):
+        """Return query parameter ``name`` as an ISO date, or None when absent."""
+        if name not in query_params:
+            return None
+        normalized = record_normalize.normalize_time(query_params[name][0])
+        if normalized is None:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+        return normalized[0]
+
+    def parse_paging(self, query_params):
+        """Return ``(offset, limit)`` for ?top=N or ?offset=&limit=, or None for the full leaderboard."""
+        top = self.int_param(query_params, 'top')
+        if top is not None:
+            return 0, top
+        if 'offset' not in query_params and 'limit' not in query_params:
+            return None
+        return self.int_param(query_params, 'offset', 0), self.int_param(query_params, 'limit', DEFAULT_PAGE_LIMIT)
+
+    def ranking_index(self, version):
+        """The ranking index at ``version``, updated from the change log when possible."""
+        def load_rows():
+            if self.snapshot is not None:
+                leaderboard = self.snapshot.json_section('leaderboard')
+                if leaderboard is not None:
+                    return leaderboard['playerStats']
+            return self.read_csv_file('player_statistics.csv')
+
+        return RANKING.get(version, self.data_version_state, load_rows)
+
+    def parse_window(self, query_params):
+        """Return ``(label, start, end)`` for ?period=YYYY-MM|YYYY-Qn|YYYY or ?season=NAME|START..END.
+
+        Raises ValueError for a malformed value and KeyError for an unknown season.
+        """
+        if 'period' in query_params:
+            label = query_params['period'][0]
+            return (label,) + period_stats.parse_period(label)
+        label = query_params['season'][0]
+        return (label,) + period_stats.parse_season(label, get_file_path(period_stats.SEASONS_FILE))
+
+    def window_leaderboard(self, window, version):
+        """Encoded leaderboard of the ``(label, start, end)`` window from ``parse_window``."""
+        label, start, end = window
+
+        def build(state):
+            stats, last_date = period_stats.window_stats(state, start, end)
+            logging.info(f"   → Merged period buckets for {start}..{end}: {len(stats)} players")
+            return json.dumps({
+                'success': True,
+                'version': version,
+                'period': label,
+                'start': start,
+                'end': end,
+                'lastUpdate': last_date,
+                'playerStats': stats
+            }).encode('utf-8')
+
+        return PERIOD_CACHE.get(version, start, end, build)
+
+    def current_data_version(self):
+        if self.snapshot is not None and self.snapshot.section('leaderboard') is not None:
+            return self.snapshot.version
+        return self.data_version_state()['version']
+
+    def data_version_state(self):
+        """Current data version and change log (from the shared snapshot in reader workers).
+
+        The returned state is shared between requests and must not be modified.
+        """
+        if self.snapshot is not None:
+            state = self.snapshot.json_section('data_version')
+            if state is not None:
+                return state
+        return data_version.load_cached(get_file_path(data_version.VERSION_FILE))
+
+    def not_modified(self, since, version):
+        """Send 304 if the client already has ``version`` (?since= or If-None-Match)."""
+        if since is not None:
+            current = since == version
+        else:
+            current = self.headers.get('If-None-Match') == f'"v{version}"'
+        if not current:
+            return False
+        self.send_response(304)
+        self.send_header('X-Data-Version', str(version))
+        self.send_header('ETag', f'"v{version}"')
+        self.end_headers()
+        return True
+
+    def send_dry_run_response(self, day_results, new_records, player_stats, timings, lap):
+        """Answer a dry run with the would-be statistics diff and the stage timings."""
+        logging.info("🧪 Dry run: diffing against the live player statistics (no writes, no codebase sync)")
+        old_stats = read_csv_file('player_statistics.csv')
+        diff = data_version.stats_changes(old_stats, player_stats)
+        lap('diff')
+        response = {
+            'success': True,
+            'dryRun': True,
+            'message': 'Dry run - no data was written',
+            'days': day_results,
+            'newRecords': new_records,
+            'statsDiff': diff,
+            'playerStats': player_stats
+        }
+        # Encode the body once and time that; the timings then go in as the last key
+        body = json.dumps(response).encode('utf-8')
+        lap('response')
+        timings['total'] = round(sum(value for stage, value in timings.items() if stage != 'total'), 3)
+        tail = b', "timings": ' + json.dumps(timings).encode('utf-8') + b'}'
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body) - 1 + len(tail)))
+        self.end_headers()
+        self.wfile.write(memoryview(body)[:-1])
+        self.wfile.write(tail)
+
     def send_error_response(self, status_code, message):
         """Helper method to send error responses."""
         self.send_response(status_code)
@@ -295,204 +888,655 @@ class CustomHandler(SimpleHTTPRequestHandler):
         }
         
         self.wfile.write(json.dumps(error_response).encode('utf-8'))
-    
+
+    def forward_to_writer(self):
+        """Relay a POST request to the writer process and copy back its response."""
+        client_ip = self.address_string()
+        try:
+            body = b''.join(request_body.iter_body(self, MAX_BODY_BYTES, BODY_READ_TIMEOUT, BODY_TOTAL_TIMEOUT))
+        except request_body.RequestBodyError as e:
+            logging.error(f"❌ Request body from {client_ip} rejected ({e.status_code}): {str(e)}")
+            self.close_connection = True
+            self.send_error_response(e.status_code, str(e))
+            return
+
+        headers = {'Content-Type': self.headers.get('Content-Type', 'application/json'),
+                   'X-Forwarded-For': client_ip}
+        for name in (request_profiler.PROFILE_HEADER, request_profiler.MEMORY_HEADER):
+            if name in self.headers:
+                headers[name] = self.headers[name]
+        conn = prefork_server.UnixHTTPConnection(self.writer_socket, timeout=BODY_TOTAL_TIMEOUT + 60)
+        try:
+            conn.request('POST', self.path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except OSError as e:
+            logging.error(f"❌ Writer process unavailable for {self.path}: {str(e)}")
+            self.send_error_response(503, "Writer process unavailable, please retry")
+            return
+        finally:
+            conn.close()
+
+        self.send_response(response.status)
+        self.send_header('Content-type', response.getheader('Content-type', 'application/json'))
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json_body(self, counter=None, row_errors=None):
+        """Read the request body as a stream and decode it as a JSON object.
+
+        The body is bounded by MAX_BODY_BYTES and the read timeouts; each element of
+        ``newRecords`` / ``gameDays`` is normalized and row-validated as soon as it is
+        decoded. A bad ``newRecords`` row aborts the upload with a 400 before the rest
+        is read; bad rows of ``gameDays[i]`` are collected into ``row_errors[i]`` (a
+        dict) so only that day is rejected.
+        """
+        def check_item(key, index, item):
+            default_time = None
+            prefix = ''
+            if key == 'newRecords':
+                rows = [(f"newRecords[{index}]", item)]
+            elif not isinstance(item, dict):
+                raise request_body.RequestBodyError(400, f"gameDays[{index}]: expected an object")
+            else:
+                day_records = item.get('records') or []
+                if not isinstance(day_records, list):
+                    raise request_body.RequestBodyError(400, f"gameDays[{index}].records: expected a list")
+                rows = [(f"records[{i}]", rec) for i, rec in enumerate(day_records)]
+                prefix = f"gameDays[{index}]."
+                # Rows without Time inherit the day's date
+                default_time = item.get('date') or (day_records[0].get('Time') if day_records and isinstance(day_records[0], dict) else None)
+            for label, record in rows:
+                error = self.validate_record_row(record, default_time)
+                if not error:
+                    continue
+                if key == 'newRecords' or row_errors is None:
+                    raise request_body.RequestBodyError(400, f"{prefix}{label}: {error}")
+                row_errors.setdefault(index, []).append(f"{label}: {error}")
+
+        chunks = request_body.iter_body(self, MAX_BODY_BYTES, BODY_READ_TIMEOUT, BODY_TOTAL_TIMEOUT, counter)
+        return request_body.parse_json_object(chunks, ('newRecords', 'gameDays'), check_item)
+
+    def validate_record_row(self, record, default_time=None):
+        """Normalize a single submitted record in place; return an error message or None."""
+        reasons = record_normalize.normalize_record(record, default_time)
+        return '; '.join(reasons) if reasons else None
+
+    def collect_game_days(self, data, row_errors=None):
+        """Group the submitted records into game days.
+
+        Accepts either ``{"gameDays": [{"date": ..., "records": [...]}, ...]}`` or the
+        legacy ``{"newRecords": [...]}`` (grouped by ``Time``, in submission order).
+        Returns a list of ``{'date': str, 'records': list, 'rowErrors': list}``;
+        ``row_errors`` maps a ``gameDays`` index to the errors of its rows.
+        """
+        row_errors = row_errors or {}
+        if 'gameDays' in data:
+            game_days = []
+            for index, day in enumerate(data.get('gameDays') or []):
+                records = list(day.get('records') or [])
+                first_time = records[0].get('Time') if records and isinstance(records[0], dict) else ''
+                date = str(day.get('date') or first_time or '').strip()
+                normalized = record_normalize.normalize_time(date)
+                game_days.append({'date': normalized[0] if normalized else date, 'records': records,
+                                  'rowErrors': row_errors.get(index, [])})
+            return game_days
+
+        # Records were normalized while the body was read, so Time is already ISO
+        days_by_date = {}
+        for rec in data.get('newRecords') or []:
+            days_by_date.setdefault(rec['Time'], []).append(rec)
+        return [{'date': date, 'records': records, 'rowErrors': []} for date, records in days_by_date.items()]
+
+    def validate_game_days(self, game_days, existing_dates):
+        """Validate each game day in a single pass over its records.
+
+        Checks: no row failed normalization (``rowErrors``; the record checks are then
+        skipped), valid YYYY-MM-DD date not already stored or repeated in the batch,
+        one ServiceFee_Rate per day, no duplicate players, Chips summing to zero and
+        FinalChips within FINAL_CHIPS_TOLERANCE_CENTS of the settlement engine's
+        allocation. All amounts are compared in integer cents; the FinalChips of an
+        accepted day are replaced by the engine's exact values.
+        Returns one ``{'date', 'accepted', 'errors', 'duplicate'}`` dict per day.
+        """
+        results = []
+        seen_dates = set()
+        for day in game_days:
+            date = day['date']
+            errors = []
+            duplicate = False
+
+            if record_normalize.normalize_time(date) is None:
+                errors.append(f"invalid date '{date}'")
+            elif date in existing_dates:
+                errors.append("date already exists")
+                duplicate = True
+            elif date in seen_dates:
+                errors.append("date repeated in batch")
+                duplicate = True
+            seen_dates.add(date)
+
+            errors.extend(day['rowErrors'])
+            # Rows that failed normalization already reject the day; skip the record checks
+            records = [] if day['rowErrors'] else day['records']
+            if not day['records']:
+                errors.append("no records")
+
+            # Parse every row once; later checks only use the parsed tuples
+            parsed = []
+            players = set()
+            fee_rates = set()
+            for rec in records:
+                player = str(rec.get('Player') or '').strip()
+                if not player:
+                    errors.append("record without Player")
+                    continue
+                if player in players:
+                    errors.append(f"duplicate player {player}")
+                players.add(player)
+                if rec.get('Time') != date:
+                    errors.append(f"{player}: Time does not match {date}")
+                try:
+                    chips = settlement.to_cents(rec.get('Chips'))
+                    final_chips = settlement.to_cents(rec.get('FinalChips'))
+                    fee_rates.add(settlement.to_cents(rec.get('ServiceFee_Rate') or 0))
+                except ValueError:
+                    errors.append(f"{player}: non-numeric Chips/FinalChips/ServiceFee_Rate")
+                    continue
+                parsed.append((player, chips, final_chips, rec))
+
+            if len(fee_rates) > 1:
+                errors.append(f"inconsistent ServiceFee_Rate {[settlement.format_cents(fee) for fee in sorted(fee_rates)]}")
+            service_fee = fee_rates.pop() if len(fee_rates) == 1 else 0
+            if service_fee < 0:
+                errors.append("negative ServiceFee_Rate")
+            chips_sum = sum(chips for _, chips, _, _ in parsed)
+            if chips_sum != 0:
+                errors.append(f"Chips sum is {settlement.format_cents(chips_sum)}, expected 0")
+
+            fees = settlement.allocate_fee([(player, chips) for player, chips, _, _ in parsed], max(service_fee, 0))
+            settled = []
+            for (player, chips, final_chips, rec), fee in zip(parsed, fees):
+                expected = chips - fee
+                if abs(final_chips - expected) > FINAL_CHIPS_TOLERANCE_CENTS:
+                    errors.append(f"{player}: FinalChips {settlement.format_cents(final_chips)} != "
+                                  f"{settlement.format_cents(expected)}")
+                settled.append((rec, expected))
+            if not errors:
+                # Store the exact allocation (older clients rounded each share in floats)
+                for rec, expected in settled:
+                    rec['FinalChips'] = settlement.format_cents(expected)
+
+            results.append({
+                'date': date,
+                'accepted': not errors,
+                'errors': errors,
+                'duplicate': duplicate,
+                'recordCount': len(day['records'])
+            })
+        return results
+
     def read_csv_file(self, filename):
         """Read CSV file and return as list of dictionaries"""
-        file_path = self.get_file_path(filename)
-        if not os.path.exists(file_path):
-            logging.warning(f"CSV file not found: {file_path}")
-            return []
-            
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                return list(reader)
-        except Exception as e:
-            logging.error(f"Error reading CSV file {filename}: {str(e)}")
-            raise
+        return read_csv_file(filename)
     
     def write_csv_file(self, filename, data):
         """Write list of dictionaries to CSV file"""
-        if not data:
-            logging.warning(f"⚠️ No data to write to {filename}")
-            return
-            
-        file_path = self.get_file_path(filename)
-        backup_path = f"{file_path}.bak"
+        return write_csv_file(filename, data)
+    
+    def get_file_path(self, filename):
+        """Get absolute path for a file relative to the data directory."""
+        return get_file_path(filename)
+    
+    def calculate_player_statistics(self, game_records):
+        """Update player statistics based on baseline file and all dated game records."""
+        return calculate_player_statistics(game_records)
+    
+def get_file_path(filename):
+    """Get absolute path for a file relative to the data directory."""
+    return os.path.join(DATA_DIR, filename)
+
+def read_csv_file(filename):
+    """Read CSV file from the data directory and return as list of dictionaries"""
+    file_path = get_file_path(filename)
+    if not os.path.exists(file_path):
+        logging.warning(f"CSV file not found: {file_path}")
+        return []
         
-        logging.debug(f"   → Writing {len(data)} records to {file_path}")
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            return list(reader)
+    except Exception as e:
+        logging.error(f"Error reading CSV file {filename}: {str(e)}")
+        raise
+
+def write_csv_file(filename, data):
+    """Write list of dictionaries to CSV file"""
+    if not data:
+        logging.warning(f"⚠️ No data to write to {filename}")
+        return
         
+    file_path = get_file_path(filename)
+    
+    logging.debug(f"   → Writing {len(data)} records to {file_path}")
+    
+    # No .bak copy: commits are protected by the write-ahead log (commit_log.py)
+    try:
+        fieldnames = data[0].keys()
+        
+        # Write to a temporary file first
+        temp_path = f"{file_path}.tmp"
         try:
-            fieldnames = data[0].keys()
+            with open(temp_path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(data)
+                # Make the content durable before it replaces the original
+                file.flush()
+                os.fsync(file.fileno())
             
-            # Create backup of existing file
-            if os.path.exists(file_path):
-                try:
-                    # Use shutil.copy2 to preserve permissions and metadata
-                    import shutil
-                    original_size = os.path.getsize(file_path)
-                    shutil.copy2(file_path, backup_path)
-                    logging.debug(f"   → Created backup: {backup_path} ({original_size} bytes)")
-                    
-                    # Ensure backup has correct permissions
-                    os.chmod(backup_path, 0o664)
-                except (IOError, OSError, PermissionError) as e:
-                    logging.warning(f"⚠️ Failed to create backup for {filename}: {str(e)}")
-                    # Continue anyway - backup failure shouldn't stop the write
+            # Set correct permissions before moving
+            os.chmod(temp_path, 0o664)
+            
+            # Atomically replace the original file
+            os.replace(temp_path, file_path)
+            
+            # Ensure final file has correct permissions
+            os.chmod(file_path, 0o664)
+            
+            # Get file stats
+            final_size = os.path.getsize(file_path)
+            file_owner = os.stat(file_path)
+            logging.debug(f"   → File written successfully: {final_size} bytes, owner: {file_owner.st_uid}:{file_owner.st_gid}")
             
-            # Write to a temporary file first
-            temp_path = f"{file_path}.tmp"
-            try:
-                with open(temp_path, 'w', newline='', encoding='utf-8') as file:
-                    writer = csv.DictWriter(file, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(data)
-                
-                # Set correct permissions before moving
-                os.chmod(temp_path, 0o664)
-                
-                # Atomically replace the original file
-                os.replace(temp_path, file_path)
-                
-                # Ensure final file has correct permissions
-                os.chmod(file_path, 0o664)
-                
-                # Get file stats
-                final_size = os.path.getsize(file_path)
-                file_owner = os.stat(file_path)
-                logging.debug(f"   → File written successfully: {final_size} bytes, owner: {file_owner.st_uid}:{file_owner.st_gid}")
-                
-            except (IOError, OSError, PermissionError) as e:
-                logging.error(f"❌ Error writing to CSV file {filename}: {str(e)}")
-                logging.error(f"   → File path: {file_path}")
-                logging.error(f"   → Process UID: {os.getuid()}, GID: {os.getgid()}")
-                # Clean up temp file if it exists
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-                raise
-                
-        except PermissionError as e:
-            logging.error(f"❌ Permission denied writing to {filename}: {str(e)}")
-            logging.error(f"   → File path: {file_path}")
-            logging.error(f"   → Current process UID: {os.getuid()}, GID: {os.getgid()}")
-            if os.path.exists(file_path):
-                stat_info = os.stat(file_path)
-                logging.error(f"   → File owner: {stat_info.st_uid}:{stat_info.st_gid}, permissions: {oct(stat_info.st_mode)}")
-            raise
         except Exception as e:
-            logging.error(f"❌ Unexpected error writing to CSV file {filename}: {str(e)}")
+            logging.error(f"❌ Error writing to CSV file {filename}: {str(e)}")
+            logging.error(f"   → File path: {file_path}")
+            logging.error(f"   → Process UID: {os.getuid()}, GID: {os.getgid()}")
+            # Clean up temp file on any failure (including bad rows), never leave it behind
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except:
+                    pass
             raise
-    
-    def get_file_path(self, filename):
-        """Get absolute path for a file relative to the server directory."""
-        server_dir = os.path.dirname(os.path.abspath(__file__))
-        return os.path.join(server_dir, filename)
-    
-    def calculate_player_statistics(self, game_records):
-        """Update player statistics based on baseline file and all dated game records.
+            
+    except PermissionError as e:
+        logging.error(f"❌ Permission denied writing to {filename}: {str(e)}")
+        logging.error(f"   → File path: {file_path}")
+        logging.error(f"   → Current process UID: {os.getuid()}, GID: {os.getgid()}")
+        if os.path.exists(file_path):
+            stat_info = os.stat(file_path)
+            logging.error(f"   → File owner: {stat_info.st_uid}:{stat_info.st_gid}, permissions: {oct(stat_info.st_mode)}")
+        raise
+    except Exception as e:
+        logging.error(f"❌ Unexpected error writing to CSV file {filename}: {str(e)}")
+        raise
 
-        - Baseline: load from player_statistics_251029.csv.
-        - Aggregate across ALL records that have a valid YYYY-MM-DD Time.
-        - Use 'Chips' for updates, recompute rates, add Date (latest), round WinChips, and rank.
-        """
+def read_game_records():
+    """Read and normalize team_building_record.csv; return ``(history, quarantined)``.
 
-        def extract_date_str(time_str):
-            s = str(time_str or '').strip()
-            return s if re.fullmatch(r"\d{4}-\d{2}-\d{2}", s) else None
-
-        # 1) Build stats map from baseline file
-        stats_map = {}
-        baseline_records = self.read_csv_file('player_statistics_251029.csv')
-        for row in baseline_records:
-            player_name = row.get('Player')
-            if not player_name:
-                continue
-            try:
-                win_chips = float(row.get('WinChips', 0) or 0)
-            except (ValueError, TypeError):
-                win_chips = 0
-            def _to_int(value):
-                try:
-                    return int(float(value))
-                except (ValueError, TypeError):
-                    return 0
-            stats_map[player_name] = {
-                'Player': player_name,
-                'WinChips': win_chips,
-                'AttendCount': _to_int(row.get('AttendCount')),
-                'WinCount': _to_int(row.get('WinCount')),
-                'LoseCount': _to_int(row.get('LoseCount')),
-                'PeaceCount': _to_int(row.get('PeaceCount')),
-            }
-
-        # 2) Determine max date, and the set of records with valid dates
-        date_strs = [extract_date_str(rec.get('Time')) for rec in game_records]
-        date_strs = [ds for ds in date_strs if ds is not None]
-        latest_date_str = max(date_strs) if date_strs else None
-        logging.info(f"Latest update date (server): {latest_date_str}")
-
-        # 3) Aggregate all records with valid dates (or all if none have a date)
-        if date_strs:
-            records_to_apply = [rec for rec in game_records if extract_date_str(rec.get('Time')) is not None]
+    ``history`` is a ``record_archive.History``: the sealed quarters in
+    ``archive/`` (read lazily) followed by the normalized hot rows.
+    """
+    raw_rows = read_csv_file('team_building_record.csv')
+    rows, quarantined = record_normalize.normalize_records(raw_rows)
+    for item in quarantined:
+        logging.warning(f"⚠️ Quarantined record row {item['row'] + 2}: {'; '.join(item['reasons'])}")
+    fieldnames = list(raw_rows[0].keys()) if raw_rows else None
+    return record_archive.load_history(DATA_DIR, rows, fieldnames), quarantined
+
+def quarantine_records(quarantined):
+    """Append rows that failed normalization, with their reasons, to the quarantine file."""
+    if not quarantined:
+        return
+    file_path = get_file_path(record_normalize.QUARANTINE_FILE)
+    exists = os.path.exists(file_path) and os.path.getsize(file_path) > 0
+    if exists:
+        # Keep the columns of the existing file
+        with open(file_path, 'r', encoding='utf-8') as file:
+            fieldnames = next(csv.reader(file), [])
+    else:
+        fieldnames = list(RECORD_FIELDS)
+        for item in quarantined:
+            fieldnames.extend(field for field in item['record'] if field not in fieldnames)
+        fieldnames.append(record_normalize.REASON_FIELD)
+    with open(file_path, 'a', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
+        if not exists:
+            writer.writeheader()
+        for item in quarantined:
+            writer.writerow({**item['record'], record_normalize.REASON_FIELD: '; '.join(item['reasons'])})
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(file_path, 0o664)
+    logging.warning(f"⚠️ Moved {len(quarantined)} unparseable record row(s) to {file_path}")
+
+def quarantine_entry(quarantined):
+    """The write-ahead log entry for a quarantine append: the file size before it and the rows."""
+    if not quarantined:
+        return None
+    file_path = get_file_path(record_normalize.QUARANTINE_FILE)
+    size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    return {'size': size, 'items': list(quarantined)}
+
+def restore_quarantine(pending, quarantined):
+    """Undo the quarantine appends of interrupted commits; return the rows to quarantine.
+
+    The quarantine file is cut back to its size before the first pending
+    commit, then every logged row is quarantined again exactly once: logged
+    rows still present in the records file (the commit stopped before
+    rewriting it) are matched against ``quarantined`` instead of being added
+    twice, and only rows the log does not know about are added to them.
+    """
+    logged = [txn['quarantine'] for txn in pending if txn.get('quarantine')]
+    if not logged:
+        return quarantined
+    file_path = get_file_path(record_normalize.QUARANTINE_FILE)
+    if os.path.exists(file_path) and os.path.getsize(file_path) > logged[0]['size']:
+        with open(file_path, 'r+b') as file:
+            file.truncate(logged[0]['size'])
+            file.flush()
+            os.fsync(file.fileno())
+        logging.info(f"   → Cut {record_normalize.QUARANTINE_FILE} back to {logged[0]['size']} bytes")
+    items = [item for entry in logged for item in entry['items']]
+    unmatched = [item['record'] for item in items]
+    for item in quarantined:
+        if item['record'] in unmatched:
+            unmatched.remove(item['record'])
         else:
-            records_to_apply = game_records[:]
+            items.append(item)
+    return items
+
+def calculate_player_statistics(game_records):
+    """Update player statistics based on baseline file and all dated game records.
 
-        # 4) Apply updates using 'Chips'
-        for record in records_to_apply:
-            player_name = record.get('Player')
-            if not player_name:
-                continue
+    - Baseline: load from player_statistics_251029.csv.
+    - Aggregate across ALL records that have a valid YYYY-MM-DD Time.
+    - Sum FinalChips in integer cents, recompute rates, add Date (latest), round WinChips once, and rank.
+    """
+
+    # 1) Build stats map from baseline file
+    stats_map = {}
+    baseline_records = read_csv_file('player_statistics_251029.csv')
+    for row in baseline_records:
+        player_name = row.get('Player')
+        if not player_name:
+            continue
+        try:
+            win_chips = settlement.to_cents(row.get('WinChips', 0) or 0)
+        except ValueError:
+            win_chips = 0
+        def _to_int(value):
             try:
-                chips = float(record.get('FinalChips', 0) or 0)
+                return int(float(value))
             except (ValueError, TypeError):
-                logging.warning(f"Invalid FinalChips value for player {player_name}: {record.get('Chips')}")
-                chips = 0
-
-            if player_name not in stats_map:
-                stats_map[player_name] = {
-                    'Player': player_name,
-                    'WinChips': 0,
-                    'AttendCount': 0,
-                    'WinCount': 0,
-                    'LoseCount': 0,
-                    'PeaceCount': 0,
-                    'WinningRate': 0,
-                    'Ranking': 0
-                }
+                return 0
+        stats_map[player_name] = {
+            'Player': player_name,
+            'WinChips': win_chips,
+            'AttendCount': _to_int(row.get('AttendCount')),
+            'WinCount': _to_int(row.get('WinCount')),
+            'LoseCount': _to_int(row.get('LoseCount')),
+            'PeaceCount': _to_int(row.get('PeaceCount')),
+        }
 
-            player_stat = stats_map[player_name]
+    # 2) Sealed quarters contribute their stored per-player totals and are not read;
+    #    the hot rows are already normalized dicts and are summed directly (FinalChips in cents)
+    if isinstance(game_records, record_archive.History):
+        totals = game_records.archive.player_totals()
+        latest_date_str = game_records.latest_date()
+        game_records = game_records.hot
+    else:
+        totals = {}
+        latest_date_str = max((record['Time'] for record in game_records if record.get('Time')), default=None)
+    logging.info(f"Latest update date (server): {latest_date_str}")
 
-            player_stat['WinChips'] = float(player_stat.get('WinChips', 0) or 0) + chips
-            player_stat['AttendCount'] = int(player_stat.get('AttendCount', 0) or 0) + 1
+    # 3) Aggregate FinalChips per player over records with valid dates (or all if none have a date)
+    for player_name, values in record_archive.player_totals(game_records).items():
+        total = totals.setdefault(player_name, [0, 0, 0, 0, 0])
+        for i, value in enumerate(values):
+            total[i] += value
+    for player_name, (cents, attend, wins, losses, peaces) in totals.items():
+        if not player_name:
+            continue
+        player_stat = stats_map.setdefault(player_name, {
+            'Player': player_name,
+            'WinChips': 0,
+            'AttendCount': 0,
+            'WinCount': 0,
+            'LoseCount': 0,
+            'PeaceCount': 0
+        })
+        player_stat['WinChips'] += cents
+        player_stat['AttendCount'] += attend
+        player_stat['WinCount'] += wins
+        player_stat['LoseCount'] += losses
+        player_stat['PeaceCount'] += peaces
 
-            if chips > 0:
-                player_stat['WinCount'] = int(player_stat.get('WinCount', 0) or 0) + 1
-            elif chips < 0:
-                player_stat['LoseCount'] = int(player_stat.get('LoseCount', 0) or 0) + 1
-            else:
-                player_stat['PeaceCount'] = int(player_stat.get('PeaceCount', 0) or 0) + 1
-
-        # 5) Build list, compute rate, round WinChips, add Date
-        player_stats = []
-        for _, stat in stats_map.items():
-            attend = int(stat.get('AttendCount', 0) or 0)
-            wins = int(stat.get('WinCount', 0) or 0)
-            win_rate = (wins / attend) * 100 if attend > 0 else 0
-            stat['WinChips'] = round(float(stat.get('WinChips', 0) or 0), 1)
-            stat['WinningRate'] = f"{win_rate:.2f}%"
-            stat['Date'] = latest_date_str
-            player_stats.append(stat)
-
-        # 6) Sort and rank
-        player_stats.sort(key=lambda x: float(x.get('WinChips', 0) or 0), reverse=True)
-        for i, stat in enumerate(player_stats):
-            stat['Ranking'] = i + 1
-            logging.info(f"Player {stat['Player']} ranking (server): {stat['Ranking']}")
-
-        return player_stats
+    # 4) Build list, compute rate, round WinChips (cents until here), add Date
+    player_stats = []
+    for _, stat in stats_map.items():
+        attend = int(stat.get('AttendCount', 0) or 0)
+        wins = int(stat.get('WinCount', 0) or 0)
+        win_rate = (wins / attend) * 100 if attend > 0 else 0
+        stat['WinChips'] = settlement.round_cents(stat['WinChips'])
+        stat['WinningRate'] = f"{win_rate:.2f}%"
+        stat['Date'] = latest_date_str
+        player_stats.append(stat)
+
+    # 5) Sort and rank (same order as the ranking index: WinChips descending, ties by name)
+    player_stats.sort(key=ranking_index.rank_key)
+    for i, stat in enumerate(player_stats):
+        stat['Ranking'] = i + 1
+        logging.info(f"Player {stat['Player']} ranking (server): {stat['Ranking']}")
+
+    return player_stats
+
+def attach_ratings(player_stats, rating_state):
+    """Add the skill Rating column next to Ranking."""
+    for stat in player_stats:
+        stat['Rating'] = skill_rating.rating_of(rating_state, stat['Player'])
+
+def seal_closed_periods(game_records=None):
+    """Move quarters that have ended from team_building_record.csv into the archive.
+
+    Non-critical: on failure the rows simply stay hot. Without ``game_records``
+    the records are read first, and nothing is sealed while unparseable rows
+    are waiting to be quarantined by the next commit. Returns the new segments.
+    """
+    if not ARCHIVE_ENABLED:
+        return []
+    try:
+        if game_records is None:
+            game_records, quarantined = read_game_records()
+            if quarantined:
+                logging.warning(f"⚠️ Not sealing closed quarters: {len(quarantined)} record row(s) wait for quarantine")
+                return []
+        return game_records.seal()
+    except Exception as e:
+        logging.warning(f"⚠️ Sealing closed quarters failed (non-critical): {str(e)}")
+        return []
+
+def backup_data_files(version):
+    """Take a deduplicated backup snapshot of DATA_DIR and apply the retention policy."""
+    if not BACKUP_ENABLED:
+        return
+    try:
+        store = backup_store.BackupStore(BACKUP_DIR)
+        store.snapshot(DATA_DIR, f"v{version}")
+        store.prune(backup_store.parse_retention(BACKUP_KEEP))
+    except Exception as e:
+        logging.warning(f"⚠️ Backup snapshot failed (non-critical): {str(e)}")
+
+
+def commit_data_files(dates, new_records, game_records, player_stats, rating_state, period_state=None, quarantined=None,
+                      pair_state=None):
+    """Write the data files for a commit, protected by the write-ahead log.
+
+    The new records are logged (fsynced) first, then each file is replaced
+    atomically, and the log is checkpointed once the directory is synced. If
+    anything fails in between, ``recover_pending_commits`` replays the log.
+    Rows quarantined while reading the records are moved to the quarantine
+    file before the records file is rewritten without them. The data version
+    is bumped last, with the appended records and changed statistics rows in
+    its change log; returns the new version.
+    """
+    old_stats = read_csv_file('player_statistics.csv')
+    version_path = get_file_path(data_version.VERSION_FILE)
+    version_state = data_version.load(version_path)
+
+    wal = commit_log.CommitLog(get_file_path(commit_log.WAL_FILE))
+    wal.begin(dates, new_records, quarantine_entry(quarantined))
+    quarantine_records(quarantined)
+    write_csv_file('team_building_record.csv', game_records.hot)
+    write_csv_file('player_statistics.csv', player_stats)
+    if rating_state is not None:
+        skill_rating.save_ratings(get_file_path(skill_rating.RATINGS_FILE), rating_state)
+    if period_state is not None:
+        period_stats.save_state(get_file_path(period_stats.PERIODS_FILE), period_state)
+    if pair_state is not None:
+        pair_stats.save_state(get_file_path(pair_stats.PAIRS_FILE), pair_state)
+    version = data_version.record_commit(version_state, dates, new_records, old_stats, player_stats)
+    data_version.save(version_path, version_state)
+    commit_log.fsync_dir(DATA_DIR)
+    wal.checkpoint()
+    return version
+
+def recover_pending_commits():
+    """Replay commits left in the write-ahead log and remove stray temp files.
+
+    Record files are replaced atomically, so a logged game day is either fully
+    present in team_building_record.csv (or the archive) or absent. Absent days are appended from
+    the log; statistics and ratings are then recomputed from the records. The
+    quarantine file is only appended to: it is restored from the log
+    (``restore_quarantine``) so replaying never quarantines a row twice.
+    Stray temp files are removed from the data directory and archive/.
+    Returns the number of replayed commits.
+    """
+    for directory in (DATA_DIR, os.path.join(DATA_DIR, record_archive.ARCHIVE_DIR)):
+        commit_log.cleanup_temp_files(directory)
+    wal = commit_log.CommitLog(get_file_path(commit_log.WAL_FILE))
+    pending = wal.pending()
+    if not pending:
+        if wal.has_pending():
+            wal.checkpoint()
+        return 0
+
+    logging.warning(f"⚠️ Recovering {len(pending)} interrupted commit(s): {[txn.get('txn') for txn in pending]}")
+    game_records, quarantined = read_game_records()
+    quarantined = restore_quarantine(pending, quarantined)
+    fieldnames = game_records.fieldnames
+    stored_dates = game_records.dates()
+    for txn in pending:
+        # Logged records were normalized when they were submitted
+        missing = [rec for rec in txn.get('records', []) if rec.get('Time') not in stored_dates]
+        if missing:
+            game_records.extend({field: rec.get(field, '') for field in fieldnames} for rec in missing)
+            logging.info(f"   → Replayed {len(missing)} record(s) of {txn.get('txn')} for {txn.get('dates')}")
+        else:
+            logging.info(f"   → Records of {txn.get('txn')} already stored, recomputing derived files")
+        stored_dates.update(txn.get('dates', []))
+
+    player_stats = calculate_player_statistics(game_records)
+    rating_state = skill_rating.rebuild_from_records(game_records)
+    attach_ratings(player_stats, rating_state)
+    quarantine_records(quarantined)
+    write_csv_file('team_building_record.csv', game_records.hot)
+    write_csv_file('player_statistics.csv', player_stats)
+    skill_rating.save_ratings(get_file_path(skill_rating.RATINGS_FILE), rating_state)
+    period_stats.save_state(get_file_path(period_stats.PERIODS_FILE), period_stats.rebuild_from_records(game_records))
+    pair_stats.save_state(get_file_path(pair_stats.PAIRS_FILE), pair_stats.rebuild_from_records(game_records))
+    # The interrupted commit's diff is unknown: make every client reload in full
+    version_path = get_file_path(data_version.VERSION_FILE)
+    version_state = data_version.load(version_path)
+    data_version.reset(version_state, 'commit recovery')
+    data_version.save(version_path, version_state)
+    commit_log.fsync_dir(DATA_DIR)
+    wal.checkpoint()
+    logging.info(f"✓ Recovery complete: {len(game_records)} records, {len(player_stats)} players")
+    return len(pending)
+
+def reload_data_files():
+    """Re-read the data files after a hand edit and rebuild the derived files (SIGHUP).
+
+    The records and the baseline are normalized, aggregated and rated in memory
+    first; if a record row cannot be parsed the reload is refused and the
+    current files stay in place. The derived files are then replaced behind the
+    write-ahead log and the data version is reset so every client reloads in
+    full. Returns the new version.
+    """
+    logging.info("=" * 80)
+    logging.info("🔄 RELOAD: re-reading data files")
+    logging.info("=" * 80)
+    started = time.perf_counter()
+    recover_pending_commits()
+
+    game_records, quarantined = read_game_records()
+    if quarantined:
+        first = quarantined[0]
+        raise ValueError(f"{len(quarantined)} record row(s) cannot be parsed (row {first['row'] + 2}: "
+                         f"{'; '.join(first['reasons'])}); fix team_building_record.csv and reload again")
+    player_stats = calculate_player_statistics(game_records)
+    rating_state = skill_rating.rebuild_from_records(game_records)
+    attach_ratings(player_stats, rating_state)
+    period_state = period_stats.rebuild_from_records(game_records)
+    pair_state = pair_stats.rebuild_from_records(game_records)
+    # Encode once so a row that cannot be rendered fails here, not in a later response
+    json.dumps(leaderboard_response(player_stats, 0))
+    logging.info(f"   → Rebuilt statistics for {len(player_stats)} players from {len(game_records)} records")
+
+    version_path = get_file_path(data_version.VERSION_FILE)
+    version_state = data_version.load(version_path)
+    wal = commit_log.CommitLog(get_file_path(commit_log.WAL_FILE))
+    # An empty commit: if interrupted, recovery recomputes the derived files the same way
+    wal.begin([], [])
+    write_csv_file('player_statistics.csv', player_stats)
+    skill_rating.save_ratings(get_file_path(skill_rating.RATINGS_FILE), rating_state)
+    period_stats.save_state(get_file_path(period_stats.PERIODS_FILE), period_state)
+    pair_stats.save_state(get_file_path(pair_stats.PAIRS_FILE), pair_state)
+    # Records may have been edited anywhere, not appended: clients must reload in full
+    version = data_version.reset(version_state, 'reload')
+    data_version.save(version_path, version_state)
+    commit_log.fsync_dir(DATA_DIR)
+    wal.checkpoint()
+    backup_data_files(version)
+    logging.info(f"✓ Reload complete in {(time.perf_counter() - started) * 1000:.0f} ms (data version v{version})")
+    return version
+
+def is_cached_route(route):
+    """True for the GET endpoints whose responses go through RESPONSE_CACHE (``route``: path without query)."""
+    return (route in CACHED_ROUTES or route.startswith('/rank/')
+            or (route.startswith('/player/') and route.endswith('/versus')))
+
+def leaderboard_response(stats, version):
+    """Build the full /leaderboard response body from player_statistics rows."""
+    # Determine last update date from Date column (max string YYYY-MM-DD)
+    dates = [str(row.get('Date')).strip() for row in stats if row.get('Date')]
+    return {
+        'success': True,
+        'version': version,
+        'full': True,
+        'lastUpdate': max(dates) if dates else None,
+        'playerStats': stats
+    }
+
+def publish_snapshot(path):
+    """Render the leaderboard and the change log into the shared snapshot.
+
+    The snapshot version is the data version.
+    """
+    version_state = data_version.load(get_file_path(data_version.VERSION_FILE))
+    version = version_state['version']
+    stats = read_csv_file('player_statistics.csv')
+
+    leaderboard_snapshot.write_snapshot(path, version, {
+        'leaderboard': json.dumps(leaderboard_response(stats, version)).encode('utf-8'),
+        'data_version': leaderboard_snapshot.encode_json(version_state)
+    })
+    return version
 
 def get_ip_address():
     """Get the server's IP address to display in the startup message."""
@@ -507,8 +1551,11 @@ def get_ip_address():
         return "unknown"
 
 def run(server_class=HTTPServer, handler_class=CustomHandler, port=PORT):
+    # Profiles go outside the served directory, the X-Profile token comes from AIRANKING_PROFILE_TOKEN
+    request_profiler.configure(os.path.dirname(os.path.abspath(__file__)))
     server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
+    # In pre-fork mode the master binds the socket itself and hands it to the workers
+    httpd = server_class(server_address, handler_class) if WORKERS <= 0 else None
     
     ip_address = get_ip_address()
     
@@ -521,13 +1568,15 @@ def run(server_class=HTTPServer, handler_class=CustomHandler, port=PORT):
     logging.info(f"Process UID: {os.getuid()}, GID: {os.getgid()}")
     logging.info(f"Working Directory: {os.getcwd()}")
     logging.info(f"Codebase Path: {CODEBASE_PATH}")
+    logging.info(f"Data Directory: {DATA_DIR}")
+    logging.info(f"Workers: {WORKERS if WORKERS > 0 else 'single process'}")
     logging.info(f"Log File: {os.path.abspath(LOG_FILE)}")
     
     # Check file permissions
     csv_files = ['team_building_record.csv', 'player_statistics.csv', 'player_statistics_251029.csv']
     logging.info("Checking CSV files:")
     for csv_file in csv_files:
-        file_path = os.path.join(os.getcwd(), csv_file)
+        file_path = os.path.join(DATA_DIR, csv_file)
         if os.path.exists(file_path):
             stat_info = os.stat(file_path)
             size = os.path.getsize(file_path)
@@ -545,6 +1594,28 @@ def run(server_class=HTTPServer, handler_class=CustomHandler, port=PORT):
     else:
         logging.warning(f"   ⚠️ Codebase directory NOT FOUND: {CODEBASE_PATH}")
     
+    # Replay commits interrupted by a crash and clean up temp files before serving
+    try:
+        recovered = recover_pending_commits()
+        if recovered:
+            logging.info(f"✓ Recovered {recovered} interrupted commit(s)")
+    except Exception as e:
+        logging.error(f"❌ Crash recovery failed, data files may be stale: {str(e)}")
+
+    # Build the period buckets and the pair matrix once if they do not exist yet (first start after upgrade)
+    for module, filename, label in ((period_stats, period_stats.PERIODS_FILE, 'period buckets'),
+                                    (pair_stats, pair_stats.PAIRS_FILE, 'pair matrix')):
+        try:
+            state_path = get_file_path(filename)
+            if module.load_state(state_path) is None:
+                module.save_state(state_path, module.rebuild_from_records(read_game_records()[0]))
+                logging.info(f"✓ Built {label} -> {state_path}")
+        except Exception as e:
+            logging.warning(f"⚠️ Failed to build {label}: {str(e)}")
+
+    # Seal quarters that ended while the server was down
+    seal_closed_periods()
+    
     logging.info("=" * 80)
     logging.info("✓ Server ready to accept connections")
     logging.info("=" * 80)
@@ -552,11 +1623,38 @@ def run(server_class=HTTPServer, handler_class=CustomHandler, port=PORT):
     print(f"🚀 AIRankingX Server Started")
     print(f"   Server: {ip_address}:{port}")
     print(f"   Logs: {LOG_FILE}")
-    print(f"   Press Ctrl+C to stop")
+    print(f"   Press Ctrl+C to stop (SIGHUP reloads the data files, SIGTERM drains and stops)")
     print("")
+
+    # Low-priority consistency check, polled by the process that owns the data files
+    tasks = []
+    if VERIFY_INTERVAL > 0:
+        tasks.append(stats_verifier.BackgroundVerifier(DATA_DIR, VERIFY_INTERVAL, VERIFY_WORKERS).poll)
+        logging.info(f"Statistics verification every {VERIFY_INTERVAL:g}s ({VERIFY_WORKERS} worker(s))")
     
+    if WORKERS > 0:
+        snapshot_path = leaderboard_snapshot.default_path(port)
+        try:
+            prefork_server.serve(
+                handler_class, port, WORKERS,
+                lambda: leaderboard_snapshot.SnapshotReader(snapshot_path),
+                lambda: publish_snapshot(snapshot_path),
+                reload_data_files,
+                tasks
+            )
+        finally:
+            # Only the master returns from serve(); the snapshot lives in /dev/shm
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+        return
+
     try:
-        httpd.serve_forever()
+        lifecycle = server_lifecycle.Lifecycle(reload_data_files, tasks=tasks)
+        lifecycle.install()
+        lifecycle.serve(httpd)
+        logging.info("=" * 80)
+        logging.info("🛑 Server stopped (SIGTERM)")
+        logging.info("=" * 80)
     except KeyboardInterrupt:
         logging.info("=" * 80)
         logging.info("🛑 Server shutdown initiated by user")
@@ -137,13 +137,10 @@ async function loadGameRecords() {
                 console.log("Parsed CSV data, row count:", results.data.length);
                 console.log("Sample CSV headers:", results.meta.fields);
                 
-                // 过滤掉没有Time或Player的记录
-                gameRecords = results.data.filter(record => record.Time && record.Player);
+                // 过滤掉没有Time或Player的记录，并在加载时统一日期和输赢格式
+                gameRecords = normalizeGameRecords(results.data);
                 console.log("Filtered records count:", gameRecords.length);
                 
-                // 保留原始格式，不进行格式转换
-                // 如果后续需要日期比较，再根据需要转换
-                
                 // 加载完游戏记录后立即更新最新记录时间
                 updateLatestRecordTime();
             }
@@ -301,7 +298,7 @@ function switchSection(sectionId) {
 }
 
 // Validate game data
-function validateGameData() {
+async function validateGameData() {
     const date = document.getElementById("game-date").value;
     const serviceFee = parseFloat(document.getElementById("service-fee").value);
     
@@ -370,23 +367,14 @@ function validateGameData() {
         validationMessage.textContent = `检验通过，当前Chips总和为0!`;
     }
     
-    // Calculate total win chips (sum of all positive chips)
-    const totalWinChips = attendingPlayers
-        .filter(player => player.chips > 0)
-        .reduce((sum, player) => sum + player.chips, 0);
+    // Only winners pay the service fee, proportional to their winnings; the server
+    // allocates it in exact integer cents so the shares always add up to the fee
+    const settlement = await settleGameDay(serviceFee, attendingPlayers);
     
-    // Calculate service fee for each player
-    attendingPlayers.forEach(player => {
-        let playerServiceFee = 0;
-        
-        // Only winners (chips > 0) pay service fee, proportional to their winnings
-        if (player.chips > 0) {
-            playerServiceFee = (player.chips / totalWinChips) * serviceFee;
-        }
-        
-        // Final chips is original chips minus service fee
-        player.finalChips = player.chips - playerServiceFee;
-        player.serviceFee = playerServiceFee;
+    // Final chips is original chips minus service fee (players come back in the same order)
+    attendingPlayers.forEach((player, i) => {
+        player.serviceFee = settlement.players[i].ServiceFeeCents / 100;
+        player.finalChips = settlement.players[i].FinalChipsCents / 100;
     });
     
     // Store current game data
@@ -400,6 +388,56 @@ function validateGameData() {
     showValidationSuccess(attendingPlayers);
 }
 
+// Allocate the service fee of a game day on the server (/settle), locally when it is unreachable
+async function settleGameDay(serviceFee, players) {
+    try {
+        const response = await fetch('/settle', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                ServiceFee_Rate: serviceFee,
+                players: players.map(player => ({ Player: player.playerName, Chips: player.chips }))
+            })
+        });
+        const result = await response.json();
+        if (!response.ok || !result.success) {
+            throw new Error(result.message || `Server responded with ${response.status}`);
+        }
+        return result;
+    } catch (error) {
+        console.warn("Failed to settle game day on the server, allocating locally:", error);
+        return settleLocally(serviceFee, players);
+    }
+}
+
+// Same allocation as settlement.allocate_fee, in integer cents: each winner gets the
+// floor of the exact share, the cents left over go to the largest remainders
+// (ties: more chips, then player name)
+function settleLocally(serviceFee, players) {
+    const fee = Math.round(serviceFee * 100);
+    const chips = players.map(player => player.chips * 100);
+    const total = chips.reduce((sum, amount) => amount > 0 ? sum + amount : sum, 0);
+    const fees = chips.map(() => 0);
+    if (total > 0) {
+        const remainders = [];
+        chips.forEach((amount, i) => {
+            if (amount > 0) {
+                fees[i] = Math.floor(fee * amount / total);
+                remainders.push({ remainder: fee * amount - fees[i] * total, amount, player: players[i].playerName, i });
+            }
+        });
+        remainders.sort((a, b) => b.remainder - a.remainder || b.amount - a.amount ||
+            (a.player < b.player ? -1 : a.player > b.player ? 1 : 0));
+        const left = fee - fees.reduce((sum, value) => sum + value, 0);
+        remainders.slice(0, left).forEach(({ i }) => { fees[i] += 1; });
+    }
+    return {
+        players: chips.map((amount, i) => ({ ServiceFeeCents: fees[i], FinalChipsCents: amount - fees[i] }))
+    };
+}
+
 // Show validation error
 function showValidationError(message) {
     validationResult.classList.remove("hidden", "validation-success");
@@ -560,6 +598,7 @@ function updateLeaderboard() {
         row.className = colorClass;
         row.innerHTML = `
             <td class="ranking-cell">${index + 1}</td>
+            <td>${player.Rating || '-'}</td>
             <td class="player-name-cell">${player.Player}</td>
             <td>${player.WinningRate}</td>
             <td>${Math.round(player.WinChips)}</td>
@@ -576,7 +615,7 @@ function updateLeaderboard() {
             const waterLineRow = document.createElement("tr");
             waterLineRow.className = "water-line-row";
             waterLineRow.innerHTML = `
-                <td colspan="8" style="text-align: center; font-weight: bold; color: #2c3e50;">
+                <td colspan="9" style="text-align: center; font-weight: bold; color: #2c3e50;">
                     Water Line
                 </td>
             `;
@@ -672,8 +711,23 @@ function convertChineseDateFormat(chineseDate) {
     return chineseDate; // Return original if no match
 }
 
+// Normalize records once when they are loaded: yyyy-MM-dd Time and Win/Lose/Peace labels
+function normalizeGameRecords(records) {
+    return (records || [])
+        .filter(record => record.Time && record.Player)
+        .map(record => {
+            let winOrLose = record.WinOrLose;
+            if (winOrLose === "水上") {
+                winOrLose = "Win";
+            } else if (winOrLose === "水下") {
+                winOrLose = "Lose";
+            }
+            return { ...record, Time: convertChineseDateFormat(record.Time), WinOrLose: winOrLose };
+        });
+}
+
 // Search history records by date
-function searchHistoryRecords() {
+async function searchHistoryRecords() {
     const selectedDate = historyDateInput.value;
     
     if (!selectedDate) {
@@ -685,9 +739,20 @@ function searchHistoryRecords() {
     const formattedDate = formatDate(selectedDate);
     
     // Using standard format (yyyy-MM-dd) for comparison
-    const recordsOnDate = gameRecords.filter(record => 
-        convertChineseDateFormat(record.Time) === formattedDate
-    );
+    let recordsOnDate = gameRecords.filter(record => record.Time === formattedDate);
+    
+    // team_building_record.csv only holds the open quarter; older dates are in the server archive
+    if (recordsOnDate.length === 0) {
+        try {
+            recordsOnDate = await fetchArchivedRecords(formattedDate);
+        } catch (error) {
+            // Do not report "no records" for a date the archive could not be asked about
+            console.error("Failed to load archived records:", error);
+            historyResult.classList.add("hidden");
+            alert(`Failed to load archived records: ${error.message}`);
+            return;
+        }
+    }
     
     // Display results
     historyResult.classList.remove("hidden");
@@ -711,17 +776,9 @@ function searchHistoryRecords() {
     recordsOnDate.forEach(record => {
         const row = document.createElement("tr");
         
-        // Convert Chinese Win/Lose status and set class accordingly
-        let winLoseStatus = record.WinOrLose;
-        let winLoseClass = "";
-        
-        if (winLoseStatus === "Win" || winLoseStatus === "水上") {
-            winLoseStatus = "Win";
-            winLoseClass = "win";
-        } else if (winLoseStatus === "Lose" || winLoseStatus === "水下") {
-            winLoseStatus = "Lose";
-            winLoseClass = "lose";
-        }
+        // WinOrLose was normalized when the records were loaded
+        const winLoseStatus = record.WinOrLose;
+        const winLoseClass = winLoseStatus === "Win" ? "win" : (winLoseStatus === "Lose" ? "lose" : "");
         
         row.innerHTML = `
             <td class="player-name-cell">${record.Player}</td>
@@ -735,6 +792,21 @@ function searchHistoryRecords() {
     });
 }
 
+// Load the records of one date from the server archive (/records?from=&to=); throws on failure
+async function fetchArchivedRecords(date) {
+    const response = await fetch(`/records?from=${date}&to=${date}`);
+    if (!response.ok) {
+        throw new Error(`Server responded with ${response.status}`);
+    }
+    // Without the proxy location the web server answers with index.html
+    const contentType = response.headers.get("Content-Type") || "";
+    if (!contentType.includes("application/json")) {
+        throw new Error("/records did not return JSON (is it proxied to the Python server?)");
+    }
+    const result = await response.json();
+    return normalizeGameRecords(result.records || []);
+}
+
 // Helper function to calculate service fee from record
 function calculateServiceFee(record) {
     const chips = parseFloat(record.Chips || 0);
@@ -837,7 +909,7 @@ async function updateLeaderboardWithNewData() {
                 
                 if (result.success) {
                     // Update local data with server response
-                    gameRecords = result.gameRecords;
+                    gameRecords = normalizeGameRecords(result.gameRecords);
                     playerStats = result.playerStats;
                     
                     // Update UI to reflect new data
@@ -877,10 +949,7 @@ async function reloadGameRecords() {
             Papa.parse(csvData, {
                 header: true,
                 complete: (results) => {
-                    gameRecords = results.data.filter(record => record.Time && record.Player); // Filter out empty rows
-                    
-                    // 保留原始格式，不进行格式转换
-                    // 如果后续需要日期比较，再根据需要转换
+                    gameRecords = normalizeGameRecords(results.data); // Filter out empty rows and normalize once
                     
                     // 重新加载游戏记录后更新最新记录时间
                     updateLatestRecordTime();
@@ -1026,6 +1095,12 @@ function updateLatestRecordTime() {
             latestUpdateTimeElement.textContent = "No records found";
         }
     } else {
+        // At the start of a quarter every record may be archived; player_statistics.csv keeps the latest date
+        const statDates = playerStats.map(player => player.Date).filter(Boolean).sort();
+        if (statDates.length > 0) {
+            latestUpdateTimeElement.textContent = statDates[statDates.length - 1];
+            return;
+        }
         console.warn("No game records found");
         latestUpdateTimeElement.textContent = "No records found";
     }
@@ -0,0 +1,359 @@
+"""Deduplicated, compressed, content-addressed backups of the data files.
+
+Each file is cut into pieces at line ends and at the ``}, `` / ``], ``
+separators of single-line JSON (``period_stats.json``, ``pair_stats.json``,
+``data_version.json``). Pieces are grouped into segments at content-defined
+boundaries (after a piece whose CRC32 is divisible by SEGMENT_DIVISOR, or
+after MAX_SEGMENT_PIECES pieces). Appending game days therefore leaves every earlier segment unchanged,
+so a snapshot after a commit stores only the new tail. Segments are
+zlib-compressed and named by the SHA-256 of their content::
+
+    backups/
+      objects/ab/ab12...ef        zlib(segment)
+      snapshots/20260203T210501-commit.json
+      .lock
+
+A snapshot manifest lists, per file, its size, SHA-256 and segment hashes.
+Sealed record segments (``archive/``) never change, so every snapshot after
+the first one references them without storing anything.
+The server takes a snapshot after every commit (``AIRANKING_BACKUP``) and
+applies the retention policy; the CLI lists, restores, verifies and prunes::
+
+    python3 backup_store.py snapshot [--label LABEL]
+    python3 backup_store.py list
+    python3 backup_store.py restore 2026-02-03 [--to DIR] [--file NAME ...]
+    python3 backup_store.py verify
+    python3 backup_store.py prune [--keep last=20,daily=30,weekly=12,monthly=24]
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+import record_archive
+
+# Data files captured by a snapshot (missing ones are skipped)
+DATA_FILES = (
+    'team_building_record.csv',
+    'player_statistics.csv',
+    'player_statistics_251029.csv',
+    'player_ratings.json',
+    'period_stats.json',
+    'pair_stats.json',
+    'data_version.json',
+    'seasons.json',
+    'record_quarantine.csv'
+)
+SEGMENT_DIVISOR = 32
+MAX_SEGMENT_PIECES = 256
+DEFAULT_RETENTION = 'last=20,daily=30,weekly=12,monthly=24'
+
+# Piece ends: line breaks and json.dump item separators after an object or list
+_PIECE_END = re.compile(rb"\n|[}\]], ")
+_SNAPSHOT_ID = re.compile(r"(\d{8}T\d{6})(?:-(\d+))?")
+
+
+def _snapshot_order(snapshot_id):
+    match = _SNAPSHOT_ID.fullmatch(snapshot_id)
+    return match.group(1), int(match.group(2) or 0)
+
+
+def split_segments(data):
+    """Split ``data`` (bytes) into content-defined segments aligned to piece boundaries."""
+    segments = []
+    start = 0
+    pieces = 0
+    pos = 0
+    for match in _PIECE_END.finditer(data):
+        end = match.end()
+        pieces += 1
+        if zlib.crc32(data[pos:end]) % SEGMENT_DIVISOR == 0 or pieces >= MAX_SEGMENT_PIECES:
+            segments.append(data[start:end])
+            start = end
+            pieces = 0
+        pos = end
+    if start < len(data):
+        segments.append(data[start:])
+    return segments
+
+
+def parse_retention(text):
+    """Parse ``last=N,daily=N,weekly=N,monthly=N`` into a dict."""
+    policy = {}
+    for part in str(text or '').split(','):
+        if not part.strip():
+            continue
+        key, _, value = part.partition('=')
+        key = key.strip()
+        if key not in ('last', 'daily', 'weekly', 'monthly'):
+            raise ValueError(f"Unknown retention rule: {key}")
+        policy[key] = int(value)
+    return policy
+
+
+class BackupStore:
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        with open(os.path.join(self.root, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _put_object(self, segment):
+        """Store one segment unless it is already present; return (digest, bytes written)."""
+        digest = hashlib.sha256(segment).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(segment, 9)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(compressed)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+        return digest, len(compressed)
+
+    def _get_object(self, digest):
+        with open(self._object_path(digest), 'rb') as file:
+            segment = zlib.decompress(file.read())
+        if hashlib.sha256(segment).hexdigest() != digest:
+            raise ValueError(f"segment {digest[:12]} is corrupt")
+        return segment
+
+    def snapshot(self, data_dir, label='manual', files=None):
+        """Capture ``files`` (default: DATA_FILES and the sealed record archive) from ``data_dir``; return the manifest."""
+        if files is None:
+            files = DATA_FILES + tuple(record_archive.Archive(data_dir).files())
+        with self.locked():
+            now = datetime.now()
+            snapshot_id = now.strftime('%Y%m%dT%H%M%S')
+            suffix = 1
+            while os.path.exists(self._manifest_path(snapshot_id)):
+                snapshot_id = f"{now.strftime('%Y%m%dT%H%M%S')}-{suffix}"
+                suffix += 1
+            manifest = {'id': snapshot_id, 'time': now.isoformat(timespec='seconds'), 'label': label, 'files': {}}
+            written = 0
+            for name in files:
+                path = os.path.join(data_dir, name)
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'rb') as file:
+                    data = file.read()
+                digests = []
+                for segment in split_segments(data):
+                    digest, size = self._put_object(segment)
+                    digests.append(digest)
+                    written += size
+                manifest['files'][name] = {
+                    'size': len(data),
+                    'sha256': hashlib.sha256(data).hexdigest(),
+                    'segments': digests
+                }
+            manifest['storedBytes'] = written
+            temp_path = f"{self._manifest_path(snapshot_id)}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(manifest, file, indent=1)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self._manifest_path(snapshot_id))
+        logging.info(f"🗄️ Backup snapshot {snapshot_id} ({label}): {len(manifest['files'])} files, {written} new bytes")
+        return manifest
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+
+    def snapshots(self):
+        """Return all manifests, oldest first."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.snapshots_dir)
+               if name.endswith('.json') and _SNAPSHOT_ID.fullmatch(name[:-5])]
+        manifests = []
+        for snapshot_id in sorted(ids, key=_snapshot_order):
+            with open(self._manifest_path(snapshot_id), 'r', encoding='utf-8') as file:
+                manifests.append(json.load(file))
+        return manifests
+
+    def find(self, selector):
+        """Return the snapshot with id ``selector``, or the latest one taken on or before a date."""
+        manifests = self.snapshots()
+        for manifest in manifests:
+            if manifest['id'] == selector:
+                return manifest
+        day = str(selector).replace('-', '')
+        if re.fullmatch(r"\d{8}", day):
+            candidates = [m for m in manifests if m['id'][:8] <= day]
+            if candidates:
+                return candidates[-1]
+        raise KeyError(f"No snapshot matches {selector}")
+
+    def restore(self, selector, target_dir, names=None):
+        """Write the files of a snapshot into ``target_dir``; return the manifest."""
+        manifest = self.find(selector)
+        os.makedirs(target_dir, exist_ok=True)
+        for name, entry in manifest['files'].items():
+            if names and name not in names:
+                continue
+            data = b''.join(self._get_object(digest) for digest in entry['segments'])
+            if hashlib.sha256(data).hexdigest() != entry['sha256']:
+                raise ValueError(f"{name} does not match its checksum in {manifest['id']}")
+            path = os.path.join(target_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.chmod(temp_path, 0o664)
+            os.replace(temp_path, path)
+        return manifest
+
+    def verify(self):
+        """Check every referenced segment and file checksum; return a list of problems.
+
+        Each distinct file content is checked once, however many snapshots share it.
+        """
+        problems = []
+        verified = set()
+        for manifest in self.snapshots():
+            for name, entry in manifest['files'].items():
+                if entry['sha256'] in verified:
+                    continue
+                digest_file = hashlib.sha256()
+                size = 0
+                try:
+                    for digest in entry['segments']:
+                        segment = self._get_object(digest)
+                        digest_file.update(segment)
+                        size += len(segment)
+                except (OSError, ValueError, zlib.error) as e:
+                    problems.append(f"{manifest['id']} {name}: {str(e)}")
+                    continue
+                if size != entry['size'] or digest_file.hexdigest() != entry['sha256']:
+                    problems.append(f"{manifest['id']} {name}: content does not match its checksum")
+                else:
+                    verified.add(entry['sha256'])
+        return problems
+
+    def prune(self, policy):
+        """Delete snapshots outside the retention policy and unreferenced segments.
+
+        Keeps the newest ``last`` snapshots plus the newest snapshot of each of
+        the last ``daily`` days, ``weekly`` ISO weeks and ``monthly`` months.
+        Returns ``(removed snapshot ids, removed segment count)``.
+        """
+        with self.locked():
+            manifests = self.snapshots()
+            keep = {m['id'] for m in manifests[-policy.get('last', 0):]} if policy.get('last') else set()
+            for rule, key in (('daily', lambda t: t.strftime('%Y-%m-%d')),
+                              ('weekly', lambda t: '%d-W%02d' % t.isocalendar()[:2]),
+                              ('monthly', lambda t: t.strftime('%Y-%m'))):
+                buckets = []
+                for manifest in reversed(manifests):
+                    bucket = key(datetime.fromisoformat(manifest['time']))
+                    if bucket in buckets:
+                        continue
+                    if len(buckets) >= policy.get(rule, 0):
+                        break
+                    buckets.append(bucket)
+                    keep.add(manifest['id'])
+
+            removed = [m['id'] for m in manifests if m['id'] not in keep]
+            for snapshot_id in removed:
+                os.remove(self._manifest_path(snapshot_id))
+
+            referenced = {digest for m in manifests if m['id'] in keep
+                          for entry in m['files'].values() for digest in entry['segments']}
+            removed_objects = 0
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for name in os.listdir(prefix_dir):
+                    if name not in referenced:
+                        os.remove(os.path.join(prefix_dir, name))
+                        removed_objects += 1
+        if removed:
+            logging.info(f"🗄️ Pruned {len(removed)} backup snapshot(s), {removed_objects} segment(s)")
+        return removed, removed_objects
+
+    def disk_usage(self):
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+        return total
+
+
+def main(argv=None):
+    base_dir = os.environ.get('AIRANKING_DATA_DIR') or os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="AIRanking backup store")
+    parser.add_argument('--data-dir', default=base_dir, help="data directory (default: AIRANKING_DATA_DIR or script dir)")
+    parser.add_argument('--store', default=None, help="backup store directory (default: AIRANKING_BACKUP_DIR or <data-dir>/backups)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    snap = sub.add_parser('snapshot', help="capture the data files")
+    snap.add_argument('--label', default='manual')
+    sub.add_parser('list', help="list snapshots")
+    restore = sub.add_parser('restore', help="restore a snapshot by id or date (latest on or before)")
+    restore.add_argument('selector')
+    restore.add_argument('--to', default=None, help="target directory (default: restored/<id>)")
+    restore.add_argument('--file', action='append', help="restore only this file (repeatable)")
+    sub.add_parser('verify', help="check all segments and checksums")
+    prune = sub.add_parser('prune', help="apply a retention policy")
+    prune.add_argument('--keep', default=os.environ.get('AIRANKING_BACKUP_KEEP', DEFAULT_RETENTION))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    store = BackupStore(args.store or os.environ.get('AIRANKING_BACKUP_DIR') or os.path.join(args.data_dir, 'backups'))
+
+    if args.command == 'snapshot':
+        manifest = store.snapshot(args.data_dir, args.label)
+        print(f"{manifest['id']}: {len(manifest['files'])} files, {manifest['storedBytes']} new bytes stored")
+    elif args.command == 'list':
+        for manifest in store.snapshots():
+            size = sum(entry['size'] for entry in manifest['files'].values())
+            print(f"{manifest['id']}  {manifest['time']}  {manifest.get('label', ''):<10} "
+                  f"{len(manifest['files'])} files  {size} bytes  (+{manifest.get('storedBytes', 0)} stored)")
+        print(f"Store size: {store.disk_usage()} bytes")
+    elif args.command == 'restore':
+        try:
+            manifest = store.find(args.selector)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            return 1
+        target = args.to or os.path.join('restored', manifest['id'])
+        store.restore(manifest['id'], target, args.file)
+        print(f"Restored {manifest['id']} to {target}")
+    elif args.command == 'verify':
+        problems = store.verify()
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"{len(store.snapshots())} snapshots checked, {len(problems)} problem(s)")
+        return 1 if problems else 0
+    elif args.command == 'prune':
+        removed, objects = store.prune(parse_retention(args.keep))
+        print(f"Removed {len(removed)} snapshot(s) and {objects} segment(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
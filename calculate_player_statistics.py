@@ -9,6 +9,12 @@ import logging
 import re
 import pandas as pd
 
+import ranking_index
+import record_archive
+import record_normalize
+import settlement
+import skill_rating
+
 base_player_statistics_file = 'player_statistics_251029.csv'
 
 def calculate_player_statistics(game_records):
@@ -16,18 +22,13 @@ def calculate_player_statistics(game_records):
 
     Rules:
     - Baseline: load from base_player_statistics_file.
-    - Latest date: directly use Time formatted as YYYY-MM-DD.
-    - Update using FinalChips for scoring and counts (Win/Lose/Peace).
-    - Recompute WinningRate and Ranking.
+    - Records must be normalized (record_normalize): Time is an ISO YYYY-MM-DD string.
+    - Update using FinalChips for scoring and counts (Win/Lose/Peace), summed in integer cents.
+    - Recompute WinningRate and Ranking; WinChips is rounded once, as the server does.
     Returns: (player_stats: list[dict], latest_date: str|None)
     """
 
-    def extract_date_str(time_str):
-        """Return YYYY-MM-DD if Time matches that format; otherwise None."""
-        s = (time_str or "").strip()
-        return s if re.fullmatch(r"\d{4}-\d{2}-\d{2}", s) else None
-
-    # 1) Build stats map from baseline file
+    # 1) Build stats map from baseline file (WinChips in cents)
     stats_map = {}
     baseline_records = read_csv_file(base_player_statistics_file)
     for row in baseline_records:
@@ -35,8 +36,8 @@ def calculate_player_statistics(game_records):
         if not player_name:
             continue
         try:
-            win_chips = float(row.get('WinChips', 0) or 0)
-        except (ValueError, TypeError):
+            win_chips = settlement.to_cents(row.get('WinChips', 0) or 0)
+        except ValueError:
             win_chips = 0
         def _to_int(value):
             try:
@@ -52,70 +53,44 @@ def calculate_player_statistics(game_records):
             'PeaceCount': _to_int(row.get('PeaceCount')),
         }
 
-    # 2) Determine latest date among provided game records using direct YYYY-MM-DD strings
-    date_strs = [extract_date_str(rec.get('Time')) for rec in game_records]
-    date_strs = [ds for ds in date_strs if ds is not None]
-    latest_date_str = max(date_strs) if date_strs else None
+    # 2) Determine latest date; normalized Time strings compare in date order
+    latest_date_str = max((rec['Time'] for rec in game_records), default=None)
     logging.info(f"Latest update date: {latest_date_str}")
 
-    # 3) Choose records to apply: include all dated records (multiple dates supported)
-    if date_strs:
-        records_to_apply = [rec for rec in game_records if extract_date_str(rec.get('Time')) is not None]
-    else:
-        records_to_apply = game_records[:]
-
-    # 4) Apply updates from all selected records using 'Chips'
-    for record in records_to_apply:
-        player_name = record.get('Player')
+    # 3) Apply all records (rows without a valid date were quarantined at load) using
+    #    'FinalChips' (after the service fee, as the server does), in integer cents
+    for player_name, (cents, attend, wins, losses, peaces) in record_archive.player_totals(game_records).items():
         if not player_name:
             continue
-        try:
-            chips = float(record.get('Chips', 0) or 0)
-        except (ValueError, TypeError):
-            logging.warning(f"Invalid Chips value for player {player_name}: {record.get('Chips')}")
-            chips = 0
-
-        if player_name not in stats_map:
-            stats_map[player_name] = {
-                'Player': player_name,
-                'WinChips': 0,
-                'AttendCount': 0,
-                'WinCount': 0,
-                'LoseCount': 0,
-                'PeaceCount': 0,
-                'WinningRate': 0,
-                'Ranking': 0
-            }
-            
-        player_stat = stats_map[player_name]
-
-        # New total chips
-        player_stat['WinChips'] = float(player_stat.get('WinChips', 0) or 0) + chips
-        # Attend count increments for any participation in the latest event day
-        player_stat['AttendCount'] = int(player_stat.get('AttendCount', 0) or 0) + 1
-
-        if chips > 0:
-            player_stat['WinCount'] = int(player_stat.get('WinCount', 0) or 0) + 1
-        elif chips < 0:
-            player_stat['LoseCount'] = int(player_stat.get('LoseCount', 0) or 0) + 1
-        else:
-            player_stat['PeaceCount'] = int(player_stat.get('PeaceCount', 0) or 0) + 1
-
-    # 5) Convert map to list and compute winning rate; also add Date and round WinChips
+        player_stat = stats_map.setdefault(player_name, {
+            'Player': player_name,
+            'WinChips': 0,
+            'AttendCount': 0,
+            'WinCount': 0,
+            'LoseCount': 0,
+            'PeaceCount': 0
+        })
+        player_stat['WinChips'] += cents
+        player_stat['AttendCount'] += attend
+        player_stat['WinCount'] += wins
+        player_stat['LoseCount'] += losses
+        player_stat['PeaceCount'] += peaces
+
+    # 4) Convert map to list and compute winning rate; also add Date and round WinChips (cents until here)
     player_stats = []
     for _, stat in stats_map.items():
         attend = int(stat.get('AttendCount', 0) or 0)
         wins = int(stat.get('WinCount', 0) or 0)
         win_rate = (wins / attend) * 100 if attend > 0 else 0
-        # Round WinChips to one decimal place
-        stat['WinChips'] = round(float(stat.get('WinChips', 0) or 0), 1)
+        # Round WinChips to one decimal place, half away from zero
+        stat['WinChips'] = settlement.round_cents(stat['WinChips'])
         stat['WinningRate'] = f"{win_rate:.2f}%"
         # Add Date for this ranking update
         stat['Date'] = latest_date_str
         player_stats.append(stat)
 
-    # 6) Sort by WinChips and assign ranking
-    player_stats.sort(key=lambda x: float(x.get('WinChips', 0) or 0), reverse=True)
+    # 5) Sort by WinChips (ties by name, as the server does) and assign ranking
+    player_stats.sort(key=ranking_index.rank_key)
     for i, stat in enumerate(player_stats):
         stat['Ranking'] = i + 1
         logging.info(f"Player {stat['Player']} ranking: {stat['Ranking']}")
@@ -146,7 +121,6 @@ def write_csv_file(filename, data):
         return
         
     file_path = get_file_path(filename)
-    backup_path = f"{file_path}.bak"
     temp_path = f"{file_path}.tmp"
     
     try:
@@ -155,19 +129,6 @@ def write_csv_file(filename, data):
         if dir_name and not os.path.exists(dir_name):
             os.makedirs(dir_name, mode=0o775, exist_ok=True)
 
-        # Create backup of existing file
-        if os.path.exists(file_path):
-            try:
-                import shutil
-                shutil.copy2(file_path, backup_path)
-                logging.info(f"Created backup of {filename} at {backup_path}")
-                
-                # Ensure backup has correct permissions
-                os.chmod(backup_path, 0o664)
-            except (IOError, OSError, PermissionError) as e:
-                logging.error(f"Failed to create backup for {filename}: {str(e)}")
-                # Continue anyway - backup failure shouldn't stop the write
-
         # Write to a temporary file first
         try:
             df = pd.DataFrame(data)
@@ -183,7 +144,7 @@ def write_csv_file(filename, data):
             os.chmod(file_path, 0o664)
             
             logging.info(f"Successfully wrote {len(data)} records to {filename}")
-        except (IOError, OSError, PermissionError) as e:
+        except Exception as e:
             logging.error(f"Error writing to CSV file {filename}: {str(e)}")
             # Clean up temp file if it exists
             if os.path.exists(temp_path):
@@ -210,13 +171,25 @@ def get_file_path(filename):
 if __name__ == "__main__":
     # 读取CSV文件
     # Read existing game records
-    game_records = read_csv_file('team_building_record.csv')
-    logging.info(f"Read {len(game_records)} existing records")
+    game_records, quarantined = record_normalize.normalize_records(read_csv_file('team_building_record.csv'))
+    # Sealed quarters in archive/ come first, in history order
+    archive = record_archive.Archive(os.path.dirname(os.path.abspath(__file__)))
+    game_records = list(archive.rows()) + game_records
+    logging.info(f"Read {len(game_records)} existing records ({len(archive)} archived)")
+    for item in quarantined:
+        logging.warning(f"Skipping unparseable record row {item['row'] + 2}: {'; '.join(item['reasons'])}")
 
     # Calculate player statistics and get latest date for backup naming
     player_stats, latest_date = calculate_player_statistics(game_records)
     logging.info(f"Calculated statistics for {len(player_stats)} players on latest date: {latest_date}")
     
+    # Rebuild skill ratings from the full history and show them next to Ranking
+    rating_state = skill_rating.rebuild_from_csv(get_file_path('team_building_record.csv'))
+    skill_rating.save_ratings(get_file_path(skill_rating.RATINGS_FILE), rating_state)
+    for stat in player_stats:
+        stat['Rating'] = skill_rating.rating_of(rating_state, stat['Player'])
+    logging.info(f"Rebuilt skill ratings from {rating_state['games']} games")
+
     # Save updated player statistics
     write_csv_file('player_statistics.csv', player_stats)
     logging.info("Saved updated player statistics")
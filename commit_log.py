@@ -0,0 +1,126 @@
+"""Write-ahead log for /update_leaderboard commits.
+
+Before any data file is touched, the game days being committed (dates and the
+raw records) are appended to ``commit.wal`` and fsynced. The data files are
+then replaced atomically one by one, and the log is truncated once they are
+durable (the checkpoint). Anything left in the log at startup is a commit that
+did not finish; the server replays it (see ``airankingx.recover_pending_commits``).
+
+One JSON object per line::
+
+    {"txn": "20260203T210501-1234", "time": "...", "dates": [...], "records": [...]}
+
+A commit that moves unparseable rows to the quarantine file also logs
+``"quarantine": {"size": <bytes before the append>, "items": [...]}``: the
+quarantine file is appended to, not replaced, so recovery truncates it back
+to ``size`` and appends the rows once (see ``airankingx.restore_quarantine``).
+
+A torn last line (crash while appending) belongs to a commit that never
+touched the data files and is ignored.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+WAL_FILE = 'commit.wal'
+# Suffixes of temporary files left behind by interrupted atomic writes (archive segments included)
+TEMP_SUFFIXES = ('.csv.tmp', '.json.tmp', '.wal.tmp', '.csv.z.tmp')
+
+
+def fsync_dir(directory):
+    """Persist renames in ``directory`` (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class CommitLog:
+    def __init__(self, path):
+        self.path = path
+
+    def begin(self, dates, records, quarantine=None):
+        """Durably record a commit before the data files change; return its id.
+
+        ``quarantine`` is ``{'size', 'items'}`` when the commit appends rows to
+        the quarantine file.
+        """
+        txn_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{int(time.monotonic() * 1000) % 100000}"
+        entry = {
+            'txn': txn_id,
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'dates': list(dates),
+            'records': list(records)
+        }
+        if quarantine:
+            entry['quarantine'] = quarantine
+        created = not os.path.exists(self.path)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        if created:
+            os.chmod(self.path, 0o664)
+            fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+        logging.info(f"   → WAL: begin {txn_id} for {entry['dates']}")
+        return txn_id
+
+    def checkpoint(self):
+        """Mark everything in the log as applied by truncating it."""
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.flush()
+            os.fsync(file.fileno())
+        logging.info("   → WAL: checkpoint")
+
+    def has_pending(self):
+        try:
+            return os.path.getsize(self.path) > 0
+        except OSError:
+            return False
+
+    def pending(self):
+        """Return the logged commits that were not checkpointed, oldest first."""
+        if not self.has_pending():
+            return []
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as file:
+            lines = file.read().split('\n')
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if index >= len(lines) - 2:
+                    logging.warning("⚠️ WAL: ignoring torn last entry (commit never reached the data files)")
+                else:
+                    logging.error(f"❌ WAL: unreadable entry at line {index + 1}, skipping")
+        return entries
+
+
+def cleanup_temp_files(directory):
+    """Remove temp files left behind by interrupted writes; return their names."""
+    removed = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return removed
+    for name in names:
+        if name.endswith(TEMP_SUFFIXES):
+            try:
+                os.remove(os.path.join(directory, name))
+                removed.append(name)
+            except OSError as e:
+                logging.warning(f"⚠️ Failed to remove stray temp file {name}: {str(e)}")
+    if removed:
+        logging.info(f"🧹 Removed stray temp files: {removed}")
+    return removed
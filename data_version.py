@@ -0,0 +1,161 @@
+"""Monotonic data version and bounded change log for incremental client sync.
+
+Every commit bumps ``version`` and appends one change entry holding the
+records it appended and the player_statistics rows it changed (compared
+without the global ``Date`` column, which is reported as ``lastUpdate``).
+Clients send ``?since=<version>`` and receive only what changed after it.
+The log keeps the last MAX_CHANGES entries; older versions, and anything
+after a reset (crash recovery, reload of hand-edited files), get a full
+snapshot instead.
+
+Stored as ``data_version.json`` next to ``player_statistics.csv``.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+
+VERSION_FILE = 'data_version.json'
+MAX_CHANGES = 200
+# Columns that change for every player on every commit and are sent separately
+IGNORED_STAT_FIELDS = ('Date',)
+
+# path -> ((st_ino, st_mtime_ns, st_size), state) for load_cached
+_loaded = {}
+
+
+def new_state():
+    return {'version': 0, 'changes': []}
+
+
+def load(path):
+    """Load the version state (a fresh state if the file is missing or unreadable)."""
+    if not os.path.exists(path):
+        return new_state()
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        state.setdefault('changes', [])
+        return state
+    except (IOError, ValueError) as e:
+        logging.warning(f"⚠️ Failed to read data version {path}: {str(e)}, starting a new change log")
+        return new_state()
+
+
+def load_cached(path):
+    """``load`` for the request path: the file is only parsed again after it was replaced.
+
+    Costs one ``os.stat`` per call while the file is unchanged (``save`` always
+    replaces it, so the inode changes). The returned state is shared and must
+    not be modified.
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return load(path)
+    key = (info.st_ino, info.st_mtime_ns, info.st_size)
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    state = load(path)
+    _loaded[path] = (key, state)
+    return state
+
+
+def save(path, state):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(temp_path, 0o664)
+    os.replace(temp_path, path)
+
+
+def _as_csv(row):
+    """Return ``row`` with values as they read back from the CSV files."""
+    return {k: '' if v is None else str(v) for k, v in row.items()}
+
+
+def _comparable(row):
+    return {k: v for k, v in _as_csv(row).items() if k not in IGNORED_STAT_FIELDS}
+
+
+def diff_stats(old_rows, new_rows):
+    """Return the new rows whose values differ from the old ones (ignoring Date)."""
+    old_by_player = {row.get('Player'): _comparable(row) for row in old_rows}
+    return [_as_csv(row) for row in new_rows if old_by_player.get(row.get('Player')) != _comparable(row)]
+
+
+def stats_changes(old_rows, new_rows):
+    """Field-level differences between two statistics tables (ignoring Date).
+
+    Returns ``[{'Player', 'added', 'changes': {field: [old, new]}}]`` for every
+    player whose row is new or changed.
+    """
+    old_by_player = {row.get('Player'): _comparable(row) for row in old_rows}
+    result = []
+    for row in new_rows:
+        new = _comparable(row)
+        old = old_by_player.get(row.get('Player'))
+        if old == new:
+            continue
+        old = old or {}
+        changes = {field: [old.get(field), value] for field, value in new.items()
+                   if field != 'Player' and old.get(field) != value}
+        result.append({'Player': row.get('Player'), 'added': not old, 'changes': changes})
+    return result
+
+
+def record_commit(state, dates, new_records, old_stats, new_stats):
+    """Bump the version for a commit and log what it changed; return the new version."""
+    state['version'] += 1
+    last_update = max((str(row.get('Date')) for row in new_stats if row.get('Date')), default=None)
+    state['changes'].append({
+        'version': state['version'],
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'dates': list(dates),
+        'lastUpdate': last_update,
+        'records': [_as_csv(record) for record in new_records],
+        'stats': diff_stats(old_stats, new_stats)
+    })
+    del state['changes'][:-MAX_CHANGES]
+    return state['version']
+
+
+def reset(state, reason):
+    """Bump the version without a diff so every client reloads in full."""
+    state['version'] += 1
+    state['changes'] = []
+    logging.info(f"   → Data version reset to v{state['version']} ({reason})")
+    return state['version']
+
+
+def changes_since(state, since):
+    """Merge the changes after ``since``.
+
+    Returns ``{'records', 'stats', 'dates', 'lastUpdate'}``, or None when the
+    change log no longer covers ``since`` and a full snapshot is needed.
+    """
+    if since < 0 or since > state['version']:
+        return None
+    entries = [entry for entry in state['changes'] if entry['version'] > since]
+    if len(entries) != state['version'] - since:
+        return None
+    records = []
+    stats_by_player = {}
+    dates = []
+    last_update = None
+    for entry in entries:
+        records.extend(entry['records'])
+        dates.extend(entry['dates'])
+        for row in entry['stats']:
+            stats_by_player[row.get('Player')] = row
+        last_update = entry.get('lastUpdate') or last_update
+    return {
+        'records': records,
+        'stats': list(stats_by_player.values()),
+        'dates': dates,
+        'lastUpdate': last_update
+    }
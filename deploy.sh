@@ -77,6 +77,23 @@ log "仅同步固定的代码文件到目标目录..."
 
 FILES_TO_SYNC="
 airankingx.py
+backup_store.py
+commit_log.py
+data_version.py
+leaderboard_snapshot.py
+pair_stats.py
+period_stats.py
+prefork_server.py
+ranking_index.py
+record_archive.py
+record_normalize.py
+request_body.py
+request_profiler.py
+response_cache.py
+server_lifecycle.py
+settlement.py
+skill_rating.py
+stats_verifier.py
 airanking.service
 app.js
 styles.css
@@ -103,6 +120,16 @@ for file in $FILES_TO_SYNC; do
 done
 log "指定代码文件同步完成"
 
+# 已归档季度的记录分段（与 team_building_record.csv 配套，分段文件只读）
+if [ -d "$SOURCE_DIR/archive" ]; then
+    rsync -avz "$SOURCE_DIR/archive/" "$DEST_DIR/archive/"
+    if [ $? -ne 0 ]; then
+        error "归档目录 archive/ 同步失败"
+        exit 1
+    fi
+    log "归档分段同步完成"
+fi
+
 # 3. 设置权限
 log "设置文件权限..."
 chown -R www-data:www-data "$DEST_DIR"
@@ -0,0 +1,117 @@
+"""Versioned read-only snapshots shared between server processes.
+
+The writer encodes named sections (pre-rendered response bodies and indexes)
+into one file and atomically replaces it; readers ``mmap`` the file and serve
+sections as ``memoryview`` slices without copying or parsing. A reader notices
+a new snapshot with a single ``os.stat`` per lookup.
+
+File layout (little endian)::
+
+    b'AIRSNAP1' | version:u64 | count:u32 | count * (name_len:u16, name, offset:u64, length:u64) | data
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+MAGIC = b'AIRSNAP1'
+_HEADER = struct.Struct('<8sQI')
+_ENTRY = struct.Struct('<QQ')
+_NAME_LEN = struct.Struct('<H')
+
+
+def default_path(port):
+    """Snapshot location: tmpfs when available so readers map memory, not disk."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+    return os.path.join(base, f"airanking_snapshot_{port}.bin")
+
+
+def write_snapshot(path, version, sections):
+    """Atomically write ``sections`` ({name: bytes}) as snapshot ``version``."""
+    names = list(sections)
+    table_size = _HEADER.size + sum(_NAME_LEN.size + len(n.encode('utf-8')) + _ENTRY.size for n in names)
+    parts = [_HEADER.pack(MAGIC, version, len(names))]
+    offset = table_size
+    for name in names:
+        encoded = name.encode('utf-8')
+        parts.append(_NAME_LEN.pack(len(encoded)) + encoded + _ENTRY.pack(offset, len(sections[name])))
+        offset += len(sections[name])
+    parts.extend(sections[name] for name in names)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        for part in parts:
+            file.write(part)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+    logging.info(f"📸 Published snapshot v{version} ({offset} bytes, sections: {names}) -> {path}")
+
+
+def encode_json(value):
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+class SnapshotReader:
+    """Attach to the snapshot file and follow replacements by the writer."""
+
+    def __init__(self, path):
+        self.path = path
+        self._identity = None
+        self._mmap = None
+        self._sections = {}
+        self._decoded = {}
+        self.version = None
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if identity == self._identity:
+            return True
+        try:
+            with open(self.path, 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = _HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC:
+                raise ValueError("bad snapshot magic")
+            pos = _HEADER.size
+            sections = {}
+            view = memoryview(mapped)
+            for _ in range(count):
+                (name_len,) = _NAME_LEN.unpack_from(mapped, pos)
+                pos += _NAME_LEN.size
+                name = bytes(mapped[pos:pos + name_len]).decode('utf-8')
+                pos += name_len
+                offset, length = _ENTRY.unpack_from(mapped, pos)
+                pos += _ENTRY.size
+                sections[name] = view[offset:offset + length]
+        except (OSError, ValueError, struct.error) as e:
+            logging.warning(f"⚠️ Cannot attach snapshot {self.path}: {str(e)}")
+            return False
+        # Older mappings stay alive while a response still holds one of their views
+        self._mmap = mapped
+        self._sections = sections
+        self._decoded = {}
+        self._identity = identity
+        self.version = version
+        return True
+
+    def section(self, name):
+        """Return the current bytes of ``name`` as a memoryview, or None."""
+        if not self._refresh():
+            return None
+        return self._sections.get(name)
+
+    def json_section(self, name):
+        """Return the decoded JSON of ``name`` (shared until the snapshot changes), or None."""
+        view = self.section(name)
+        if view is None:
+            return None
+        if name not in self._decoded:
+            self._decoded[name] = json.loads(bytes(view).decode('utf-8'))
+        return self._decoded[name]
@@ -0,0 +1,334 @@
+"""Load-test harness for the airankingx.py HTTP endpoints.
+
+Starts the server (as a subprocess or in-process) against a temporary copy of
+the data files, drives a weighted mix of requests at a target concurrency and
+prints a JSON report with throughput, p50/p95/p99 latency and error rates.
+
+Usage:
+    python3 load_test.py --concurrency 20 --duration 30
+    python3 load_test.py --mix leaderboard=70,static=25,update=5 --output report.json
+    python3 load_test.py --mode inprocess --requests 2000
+    python3 load_test.py --workers 4 --concurrency 50    # pre-fork serving mode
+    python3 load_test.py --url http://127.0.0.1:8888   # existing server, no setup
+
+Never point ``--url`` with ``update`` in the mix at production: every update
+commits a synthetic game day.
+"""
+
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILES = ['team_building_record.csv', 'player_statistics.csv', 'player_statistics_251029.csv']
+STATIC_FILES = ['index.html', 'app.js', 'styles.css', 'player_statistics.csv', 'team_building_record.csv']
+DEFAULT_MIX = 'leaderboard=80,static=15,update=5'
+SYNTHETIC_PLAYERS = ['LoadA', 'LoadB', 'LoadC', 'LoadD', 'LoadE', 'LoadF']
+# Synthetic game days start far in the future so they never clash with real dates
+SYNTHETIC_START_DATE = datetime.date(2900, 1, 1)
+
+
+def parse_mix(mix):
+    """Parse ``leaderboard=80,static=15,update=5`` into a weight dict."""
+    weights = {}
+    for part in mix.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('leaderboard', 'static', 'update'):
+            raise ValueError(f"Unknown request kind in mix: {name}")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError("Request mix must have a positive total weight")
+    return weights
+
+
+def prepare_data_dir(data_dir):
+    """Copy the data and static files into ``data_dir``."""
+    for filename in set(DATA_FILES + STATIC_FILES):
+        source = os.path.join(SERVER_DIR, filename)
+        if os.path.exists(source):
+            shutil.copy2(source, os.path.join(data_dir, filename))
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(host, port, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not start within {timeout}s")
+
+
+def start_subprocess_server(data_dir, port, extra_env=None):
+    """Run airankingx.py as a subprocess serving ``data_dir``."""
+    env = dict(os.environ)
+    env['AIRANKING_DATA_DIR'] = data_dir
+    env['AIRANKING_CODEBASE_PATH'] = os.path.join(data_dir, 'codebase')
+    env.update(extra_env or {})
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, 'airankingx.py'), str(port)],
+        cwd=data_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_server('127.0.0.1', port)
+    return process
+
+
+def start_inprocess_server(data_dir, port):
+    """Run the server in a background thread of this process."""
+    # airankingx configures its log file relative to the working directory on import
+    os.chdir(data_dir)
+    os.environ['AIRANKING_DATA_DIR'] = data_dir
+    os.environ['AIRANKING_CODEBASE_PATH'] = os.path.join(data_dir, 'codebase')
+    sys.path.insert(0, SERVER_DIR)
+    import airankingx
+    from http.server import HTTPServer
+
+    airankingx.DATA_DIR = data_dir
+    airankingx.CODEBASE_PATH = os.environ['AIRANKING_CODEBASE_PATH']
+    httpd = HTTPServer(('127.0.0.1', port), airankingx.CustomHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    wait_for_server('127.0.0.1', port)
+    return httpd
+
+
+def synthetic_game_day(date):
+    """Build a zero-sum game day whose FinalChips match the fee allocation."""
+    players = random.sample(SYNTHETIC_PLAYERS, 4)
+    chips = [random.randint(1, 50) * 10 for _ in range(2)]
+    chips += [-chips[0], -chips[1]]
+    service_fee = 20.0
+    total_win = sum(c for c in chips if c > 0)
+    records = []
+    for player, chip in zip(players, chips):
+        fee = chip / total_win * service_fee if chip > 0 else 0
+        records.append({
+            'Time': date,
+            'ServiceFee_Rate': f"{service_fee:.2f}",
+            'Player': player,
+            'Chips': chip,
+            'WinOrLose': 'Win' if chip > 0 else 'Lose',
+            'Value': chip,
+            'FinalChips': f"{chip - fee:.2f}"
+        })
+    return {'newRecords': records}
+
+
+class LoadRunner:
+    """Drive a weighted request mix against ``base_url`` from worker threads."""
+
+    def __init__(self, base_url, weights, concurrency, duration=None, total_requests=None, timeout=30.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.kinds = list(weights)
+        self.weights = [weights[k] for k in self.kinds]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.total_requests = total_requests
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.date_counter = itertools.count()
+        self.samples = {kind: [] for kind in self.kinds}
+        self.errors = {kind: 0 for kind in self.kinds}
+        self.error_samples = []
+
+    def next_date(self):
+        with self.lock:
+            offset = next(self.date_counter)
+        return (SYNTHETIC_START_DATE + datetime.timedelta(days=offset)).isoformat()
+
+    def claim(self, deadline):
+        """Reserve one request slot; False when the run is over."""
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        with self.lock:
+            if self.total_requests is not None and self.issued >= self.total_requests:
+                return False
+            self.issued += 1
+        return True
+
+    def request(self, kind):
+        if kind == 'leaderboard':
+            method, path, body = 'GET', '/leaderboard', None
+        elif kind == 'static':
+            method, path, body = 'GET', '/' + random.choice(STATIC_FILES), None
+        else:
+            method, path = 'POST', '/update_leaderboard'
+            body = json.dumps(synthetic_game_day(self.next_date())).encode('utf-8')
+
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            ok = response.status < 400
+            if ok and kind == 'update':
+                ok = bool(json.loads(payload.decode('utf-8')).get('success'))
+            return ok, None if ok else f"{kind}: HTTP {response.status}"
+        finally:
+            conn.close()
+
+    def worker(self, deadline):
+        while self.claim(deadline):
+            kind = random.choices(self.kinds, weights=self.weights)[0]
+            start = time.perf_counter()
+            try:
+                ok, error = self.request(kind)
+            except Exception as e:
+                ok, error = False, f"{kind}: {type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.samples[kind].append(elapsed)
+                if not ok:
+                    self.errors[kind] += 1
+                    if len(self.error_samples) < 20:
+                        self.error_samples.append(error)
+
+    def run(self):
+        start = time.perf_counter()
+        deadline = start + self.duration if self.duration else None
+        threads = [threading.Thread(target=self.worker, args=(deadline,), daemon=True)
+                   for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': count,
+        'errors': errors,
+        'errorRate': round(errors / count, 4) if count else 0.0,
+        'throughputRps': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        'latencyMs': {
+            'p50': to_ms(percentile(latencies, 50)),
+            'p95': to_ms(percentile(latencies, 95)),
+            'p99': to_ms(percentile(latencies, 99)),
+            'max': to_ms(latencies[-1] if latencies else None),
+            'mean': to_ms(sum(latencies) / count if count else None)
+        }
+    }
+
+
+def build_report(runner, elapsed, config):
+    all_latencies = [value for kind in runner.kinds for value in runner.samples[kind]]
+    report = {
+        'config': config,
+        'elapsedSec': round(elapsed, 3),
+        'overall': summarize(all_latencies, sum(runner.errors.values()), elapsed),
+        'byKind': {kind: summarize(runner.samples[kind], runner.errors[kind], elapsed) for kind in runner.kinds},
+        'errorSamples': runner.error_samples
+    }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the airankingx.py HTTP endpoints")
+    parser.add_argument('--mode', choices=['subprocess', 'inprocess'], default='subprocess',
+                        help="How to start the server under test (ignored with --url)")
+    parser.add_argument('--url', help="Test an already running server instead of starting one")
+    parser.add_argument('--port', type=int, default=0, help="Port for the started server (default: free port)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Start the subprocess server in pre-fork mode with this many readers")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=None, help="Seconds to run (default 10 unless --requests)")
+    parser.add_argument('--requests', type=int, default=None, help="Total number of requests to send")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Weighted request mix (default: {DEFAULT_MIX})")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--keep-data', action='store_true', help="Keep the temporary data directory")
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    duration = args.duration if args.duration or args.requests else 10.0
+
+    data_dir = None
+    server = None
+    try:
+        if args.url:
+            base_url = args.url
+        else:
+            data_dir = tempfile.mkdtemp(prefix='airanking_load_')
+            prepare_data_dir(data_dir)
+            port = args.port or free_port()
+            if args.mode == 'subprocess':
+                extra_env = {'AIRANKING_WORKERS': str(args.workers)} if args.workers else None
+                server = start_subprocess_server(data_dir, port, extra_env)
+            else:
+                server = start_inprocess_server(data_dir, port)
+            base_url = f"http://127.0.0.1:{port}"
+
+        runner = LoadRunner(base_url, weights, args.concurrency, duration=duration,
+                            total_requests=args.requests, timeout=args.timeout)
+        elapsed = runner.run()
+        config = {
+            'target': base_url,
+            'mode': 'external' if args.url else args.mode,
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'duration': duration,
+            'requests': args.requests,
+            'mix': weights
+        }
+        report = build_report(runner, elapsed, config)
+    finally:
+        if isinstance(server, subprocess.Popen):
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        elif server is not None:
+            server.shutdown()
+            server.server_close()
+        if data_dir and not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    return 0 if report['overall']['errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Head-to-head and co-attendance statistics as a sparse pair matrix.
+
+For every game day, each pair of players at the table updates two cells,
+``(A, B)`` and ``(B, A)``; the cost of a day is proportional to the square of
+its player count, never to the history. Cell ``[A][B]`` describes how A did
+on the days B was also playing::
+
+    [Games, WinChips, WinCount, LoseCount, PeaceCount, AheadCount, BehindCount]
+
+``WinChips`` (integer cents) and the win/lose/peace counts use A's FinalChips
+for the day (summed over A's rows of that date, counted by sign as in
+``calculate_player_statistics``); ``AheadCount`` / ``BehindCount`` count the
+days A finished above / below B. ``totals[A]`` holds the same first five
+figures over all of A's days, as a baseline for the per-opponent figures.
+
+Only dated game records are counted; the pre-2025-10-29 baseline in
+``player_statistics_251029.csv`` has no per-day data. State is stored in
+``pair_stats.json`` next to ``player_statistics.csv`` and kept up to date like
+``period_stats.json``.
+"""
+
+import heapq
+import json
+import logging
+import os
+
+import settlement
+import skill_rating
+
+PAIRS_FILE = 'pair_stats.json'
+
+GAMES, WIN_CHIPS, WINS, LOSSES, PEACES, AHEAD, BEHIND = range(7)
+
+
+def new_state():
+    # games / lastGame are the sync marker checked by skill_rating.is_synced
+    return {'version': 3, 'games': 0, 'lastGame': None, 'totals': {}, 'players': {}}
+
+
+def _day_results(records):
+    """Sum FinalChips (cents) per player for one game day."""
+    results = {}
+    for record in records:
+        player = record.get('Player')
+        if not player:
+            continue
+        results[player] = results.get(player, 0) + settlement.final_cents(record)
+    return results
+
+
+def _count(entry, chips):
+    entry[GAMES] += 1
+    entry[WIN_CHIPS] += chips
+    if chips > 0:
+        entry[WINS] += 1
+    elif chips < 0:
+        entry[LOSSES] += 1
+    else:
+        entry[PEACES] += 1
+
+
+def apply_game(state, date, records):
+    """Add one game day to the pair matrix in place."""
+    results = _day_results(records)
+    for player, chips in results.items():
+        _count(state['totals'].setdefault(player, [0, 0, 0, 0, 0]), chips)
+        row = state['players'].setdefault(player, {})
+        for other, other_chips in results.items():
+            if other == player:
+                continue
+            entry = row.setdefault(other, [0, 0, 0, 0, 0, 0, 0])
+            _count(entry, chips)
+            if chips > other_chips:
+                entry[AHEAD] += 1
+            elif chips < other_chips:
+                entry[BEHIND] += 1
+    state['games'] += 1
+    state['lastGame'] = date
+
+
+def rebuild_from_records(records):
+    state = new_state()
+    for date, game in skill_rating.iter_games(records):
+        apply_game(state, date, game)
+    return state
+
+
+def load_state(path):
+    """Load the pair matrix, or None if the file is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('version') == 2:
+            # Version 2 listed every applied date; only the count and the last one are needed
+            dates = state.pop('appliedDates', [])
+            state.update(version=3, games=len(dates), lastGame=dates[-1] if dates else None)
+        if state.get('version') != 3:
+            logging.warning(f"Unsupported pair state version in {path}")
+            return None
+        return state
+    except (IOError, ValueError) as e:
+        logging.warning(f"Failed to read pair state {path}: {str(e)}")
+        return None
+
+
+def save_state(path, state):
+    """Write the pair matrix atomically."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(temp_path, 0o664)
+    os.replace(temp_path, path)
+
+
+def update_pairs(path, game_records, new_games, save=True):
+    """Add ``new_games`` to the stored matrix, or rebuild it if it is out of sync.
+
+    Same contract as ``skill_rating.update_ratings``.
+    """
+    state = load_state(path)
+    if skill_rating.is_synced(state, game_records, [date for date, _ in new_games]):
+        for date, records in new_games:
+            apply_game(state, date, records)
+        logging.info(f"Pair stats: added {len(new_games)} game day(s) to the pair matrix")
+    else:
+        state = rebuild_from_records(game_records)
+        logging.info(f"Pair stats: rebuilt pair matrix from {state['games']} game day(s)")
+
+    if save:
+        save_state(path, state)
+    return state
+
+
+def _rate(wins, games):
+    return f"{(wins / games) * 100 if games > 0 else 0:.2f}%"
+
+
+def versus(state, player):
+    """Return ``(overall, opponents)`` for ``player``; raise KeyError if unknown.
+
+    Opponents are sorted by games together (most first), then name.
+    """
+    total = state['totals'].get(player)
+    if total is None:
+        raise KeyError(f"Unknown player: {player}")
+    overall = {
+        'Games': total[GAMES],
+        'WinChips': settlement.round_cents(total[WIN_CHIPS]),
+        'AvgChips': round(total[WIN_CHIPS] / total[GAMES] / 100, 1) if total[GAMES] else 0,
+        'WinCount': total[WINS],
+        'LoseCount': total[LOSSES],
+        'PeaceCount': total[PEACES],
+        'WinningRate': _rate(total[WINS], total[GAMES])
+    }
+    opponents = []
+    for other, entry in state['players'].get(player, {}).items():
+        opponents.append({
+            'Player': other,
+            'Games': entry[GAMES],
+            'WinChips': settlement.round_cents(entry[WIN_CHIPS]),
+            'AvgChips': round(entry[WIN_CHIPS] / entry[GAMES] / 100, 1),
+            'WinCount': entry[WINS],
+            'LoseCount': entry[LOSSES],
+            'PeaceCount': entry[PEACES],
+            'WinningRate': _rate(entry[WINS], entry[GAMES]),
+            'AheadCount': entry[AHEAD],
+            'BehindCount': entry[BEHIND]
+        })
+    opponents.sort(key=lambda x: (-x['Games'], x['Player']))
+    return overall, opponents
+
+
+def top_pairs(state, top):
+    """The ``top`` player pairs that played together most often."""
+    pairs = ((entry[GAMES], player, other)
+             for player, row in state['players'].items()
+             for other, entry in row.items() if player < other)
+    best = heapq.nsmallest(top, pairs, key=lambda x: (-x[0], x[1], x[2]))
+    return [{'Players': [player, other], 'Games': games} for games, player, other in best]
+
+
+class PairCache:
+    """Per-process pair matrix, reloaded when the data version changes.
+
+    Encoded /pairs and /versus bodies are cached by the server's response cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = None
+        self.state = None
+
+    def get(self, version):
+        """Return the pair matrix at ``version``."""
+        if version != self.version:
+            self.state = load_state(self.path) or new_state()
+            self.version = version
+        return self.state
@@ -0,0 +1,246 @@
+"""Pre-aggregated per-player buckets for monthly, quarterly and seasonal leaderboards.
+
+Every game day adds each player's result to two buckets: the day bucket and
+the month bucket (``[WinChips, AttendCount, WinCount, LoseCount, PeaceCount]``,
+WinChips in integer cents, counted by the sign of ``FinalChips`` as in
+``calculate_player_statistics``).
+A date window is answered by merging the month buckets it fully covers plus
+the day buckets of the partial months at its edges, never by rescanning
+``team_building_record.csv``.
+
+Windows only cover dated game records; the pre-2025-10-29 baseline in
+``player_statistics_251029.csv`` has no dates and is not part of any period.
+
+State is stored as JSON in ``period_stats.json`` next to
+``player_statistics.csv`` and kept up to date like ``player_ratings.json``.
+Named seasons are read from ``seasons.json``::
+
+    {"S1": {"start": "2025-10-29", "end": "2026-01-31"}}
+"""
+
+import calendar
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+
+import ranking_index
+import record_normalize
+import settlement
+import skill_rating
+
+PERIODS_FILE = 'period_stats.json'
+SEASONS_FILE = 'seasons.json'
+# Cached window results per process
+CACHE_SIZE = 64
+
+WIN_CHIPS, ATTEND, WINS, LOSSES, PEACES = range(5)
+
+
+def new_state():
+    # games / lastGame are the sync marker checked by skill_rating.is_synced
+    return {'version': 3, 'games': 0, 'lastGame': None, 'days': {}, 'months': {}}
+
+
+def _add(bucket, player, chips):
+    entry = bucket.setdefault(player, [0, 0, 0, 0, 0])
+    entry[WIN_CHIPS] += chips
+    entry[ATTEND] += 1
+    if chips > 0:
+        entry[WINS] += 1
+    elif chips < 0:
+        entry[LOSSES] += 1
+    else:
+        entry[PEACES] += 1
+
+
+def apply_game(state, date, records):
+    """Add one game day to its day and month buckets in place."""
+    day = state['days'].setdefault(date, {})
+    month = state['months'].setdefault(date[:7], {})
+    for record in records:
+        player = record.get('Player')
+        if not player:
+            continue
+        chips = settlement.final_cents(record)
+        _add(day, player, chips)
+        _add(month, player, chips)
+    state['games'] += 1
+    state['lastGame'] = date
+
+
+def rebuild_from_records(records):
+    state = new_state()
+    for date, game in skill_rating.iter_games(records):
+        apply_game(state, date, game)
+    return state
+
+
+def load_state(path):
+    """Load the bucket state, or None if the file is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('version') == 2:
+            # Version 2 listed every applied date; only the count and the last one are needed
+            dates = state.pop('appliedDates', [])
+            state.update(version=3, games=len(dates), lastGame=dates[-1] if dates else None)
+        if state.get('version') != 3:
+            logging.warning(f"Unsupported period state version in {path}")
+            return None
+        return state
+    except (IOError, ValueError) as e:
+        logging.warning(f"Failed to read period state {path}: {str(e)}")
+        return None
+
+
+def save_state(path, state):
+    """Write the bucket state atomically."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(temp_path, 0o664)
+    os.replace(temp_path, path)
+
+
+def update_buckets(path, game_records, new_games, save=True):
+    """Add ``new_games`` to the stored buckets, or rebuild them if they are out of sync.
+
+    Same contract as ``skill_rating.update_ratings``.
+    """
+    state = load_state(path)
+    if skill_rating.is_synced(state, game_records, [date for date, _ in new_games]):
+        for date, records in new_games:
+            apply_game(state, date, records)
+        logging.info(f"Period stats: added {len(new_games)} game day(s) to buckets")
+    else:
+        state = rebuild_from_records(game_records)
+        logging.info(f"Period stats: rebuilt buckets from {state['games']} game day(s)")
+
+    if save:
+        save_state(path, state)
+    return state
+
+
+def parse_period(value):
+    """Return ``(start, end)`` for ``YYYY-MM``, ``YYYY-Qn`` or ``YYYY``; raise ValueError otherwise."""
+    value = str(value or '').strip()
+    match = re.fullmatch(r"(\d{4})-(\d{2})", value)
+    if match:
+        year, month = int(match.group(1)), int(match.group(2))
+        if not 1 <= month <= 12:
+            raise ValueError(f"Invalid period: {value}")
+        first, last = month, month
+    else:
+        match = re.fullmatch(r"(\d{4})-?[Qq]([1-4])", value)
+        if match:
+            year, quarter = int(match.group(1)), int(match.group(2))
+            first, last = quarter * 3 - 2, quarter * 3
+        elif re.fullmatch(r"\d{4}", value):
+            year, first, last = int(value), 1, 12
+        else:
+            raise ValueError(f"Invalid period: {value} (expected YYYY-MM, YYYY-Qn or YYYY)")
+    end_day = calendar.monthrange(year, last)[1]
+    return f"{year:04d}-{first:02d}-01", f"{year:04d}-{last:02d}-{end_day:02d}"
+
+
+def parse_season(value, seasons_path):
+    """Return ``(start, end)`` for a season name in ``seasons.json`` or a ``START..END`` range.
+
+    Raises KeyError for an unknown season name and ValueError for a bad range.
+    """
+    value = str(value or '').strip()
+    if '..' in value:
+        start, end = (part.strip() for part in value.split('..', 1))
+    else:
+        seasons = {}
+        if os.path.exists(seasons_path):
+            with open(seasons_path, 'r', encoding='utf-8') as file:
+                seasons = json.load(file)
+        if value not in seasons:
+            raise KeyError(f"Unknown season: {value}")
+        start, end = seasons[value].get('start'), seasons[value].get('end')
+    start_day, end_day = record_normalize.normalize_time(start), record_normalize.normalize_time(end)
+    if start_day is None or end_day is None or start_day[1] > end_day[1]:
+        raise ValueError(f"Invalid season range: {start}..{end}")
+    return start_day[0], end_day[0]
+
+
+def window_totals(state, start, end):
+    """Merge the buckets covering ``start``..``end`` (inclusive) into per-player totals.
+
+    Returns ``(totals, last_date)``.
+    """
+    totals = {}
+    full_months = set()
+    for month in state['months']:
+        month_start = f"{month}-01"
+        month_end = f"{month}-{calendar.monthrange(int(month[:4]), int(month[5:7]))[1]:02d}"
+        if start <= month_start and month_end <= end:
+            full_months.add(month)
+    buckets = [state['months'][month] for month in full_months]
+    dates = [date for date in state['days'] if start <= date <= end]
+    buckets.extend(state['days'][date] for date in dates if date[:7] not in full_months)
+
+    for bucket in buckets:
+        for player, entry in bucket.items():
+            total = totals.setdefault(player, [0, 0, 0, 0, 0])
+            for i, value in enumerate(entry):
+                total[i] += value
+    return totals, (max(dates) if dates else None)
+
+
+def window_stats(state, start, end):
+    """Return player_statistics-style rows (ranked by WinChips, ties by name) for a date window."""
+    totals, last_date = window_totals(state, start, end)
+    player_stats = []
+    for player, total in totals.items():
+        attend = total[ATTEND]
+        win_rate = (total[WINS] / attend) * 100 if attend > 0 else 0
+        player_stats.append({
+            'Player': player,
+            'WinChips': settlement.round_cents(total[WIN_CHIPS]),
+            'AttendCount': attend,
+            'WinCount': total[WINS],
+            'LoseCount': total[LOSSES],
+            'PeaceCount': total[PEACES],
+            'WinningRate': f"{win_rate:.2f}%",
+            'Date': last_date
+        })
+    # Same order as the all-time leaderboard: WinChips descending, ties by name
+    player_stats.sort(key=ranking_index.rank_key)
+    for i, stat in enumerate(player_stats):
+        stat['Ranking'] = i + 1
+    return player_stats, last_date
+
+
+class WindowCache:
+    """Per-process LRU of encoded window leaderboards, dropped when the data version changes."""
+
+    def __init__(self, path, size=CACHE_SIZE):
+        self.path = path
+        self.size = size
+        self.version = None
+        self.state = None
+        self.results = OrderedDict()
+
+    def get(self, version, start, end, build):
+        """Return the cached result for ``start``..``end``, calling ``build(state)`` on a miss."""
+        if version != self.version:
+            self.state = load_state(self.path) or new_state()
+            self.version = version
+            self.results.clear()
+        key = (start, end)
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key]
+        result = build(self.state)
+        self.results[key] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+        return result
@@ -0,0 +1,221 @@
+"""Pre-fork multi-process serving for airankingx.py.
+
+The master opens the public listening socket once and forks:
+
+- one *writer* process, the only process that modifies data files. It serves
+  POST requests on a private Unix socket and republishes the shared snapshot
+  after every commit;
+- N *reader* processes accepting on the shared public socket. They answer
+  GET requests (``/leaderboard`` straight from the mmap'd snapshot) and
+  forward POST requests to the writer.
+
+The master restarts any worker that exits. SIGHUP is forwarded to the writer,
+which reloads the data files and republishes the snapshot while the readers
+keep serving the previous one. On SIGTERM/SIGINT the master stops the readers
+first (each drains its queued connections, forwarding POSTs to the still
+running writer), then the writer, and exits; workers still running after
+twice the drain timeout are killed. Linux only (``os.fork``).
+"""
+
+import http.client
+import logging
+import os
+import select
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import time
+from http.server import HTTPServer
+
+import server_lifecycle
+
+# Delay before restarting a worker that exited, doubled while it keeps crashing
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 30.0
+# A worker that stayed up this long resets the backoff
+STABLE_UPTIME = 60.0
+# Longest wait for the writer's first snapshot before the readers start anyway
+WRITER_READY_TIMEOUT = 120.0
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket, used for reader -> writer forwarding."""
+
+    def get_request(self):
+        request, _ = self.socket.accept()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ('writer-socket', 0)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def writer_socket_path(port):
+    return os.path.join(tempfile.gettempdir(), f"airanking_writer_{port}.sock")
+
+
+def _run_reader(listen_sock, handler_class, writer_path, snapshot_reader):
+    handler_class.writer_socket = writer_path
+    handler_class.snapshot = snapshot_reader
+    httpd = HTTPServer(listen_sock.getsockname(), handler_class, bind_and_activate=False)
+    httpd.socket.close()
+    httpd.socket = listen_sock
+    # handle_request() waits min(socket timeout, httpd.timeout): a timeout of 0
+    # (plain non-blocking) would make the idle loop spin. A timed accept still
+    # gives up when another reader won the connection.
+    listen_sock.settimeout(server_lifecycle.POLL_INTERVAL)
+    lifecycle = server_lifecycle.Lifecycle()
+    lifecycle.install()
+    logging.info(f"📖 Reader worker {os.getpid()} serving")
+    lifecycle.serve(httpd)
+
+
+def _run_writer(listen_sock, handler_class, writer_path, publish, reload, tasks, ready_fd=None):
+    listen_sock.close()
+    if os.path.exists(writer_path):
+        os.remove(writer_path)
+    handler_class.writer_socket = None
+    handler_class.snapshot_publisher = staticmethod(publish)
+    httpd = UnixHTTPServer(writer_path, handler_class)
+    os.chmod(writer_path, 0o600)
+    publish()
+    if ready_fd is not None:
+        # Tell the master the first snapshot is published and the socket accepts
+        os.write(ready_fd, b'1')
+        os.close(ready_fd)
+
+    def reload_and_publish():
+        reload()
+        publish()
+
+    lifecycle = server_lifecycle.Lifecycle(reload_and_publish if reload is not None else None, tasks=tasks)
+    lifecycle.install()
+    logging.info(f"✍️ Writer worker {os.getpid()} serving on {writer_path}")
+    lifecycle.serve(httpd)
+
+
+def serve(handler_class, port, workers, snapshot_reader_factory, publish, reload=None, tasks=()):
+    """Run the master loop until SIGTERM/SIGINT.
+
+    ``snapshot_reader_factory()`` builds a reader's snapshot attachment,
+    ``publish()`` (re)writes the snapshot and ``reload()`` rebuilds the data
+    files on SIGHUP; all are called in the workers. ``tasks`` are polled by
+    the writer between requests.
+    """
+    listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listen_sock.bind(('', port))
+    listen_sock.listen(128)
+    # Readers race for each connection; a non-blocking accept lets the losers go
+    # back to polling (and notice SIGTERM) instead of blocking in accept()
+    listen_sock.setblocking(False)
+    writer_path = writer_socket_path(port)
+
+    children = {}
+    backoff = {'writer': RESTART_BACKOFF, 'reader': RESTART_BACKOFF}
+    state = {'stopping': False}
+
+    def spawn(role, ready_fd=None):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: drop the master's handlers; the worker's lifecycle installs its own
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+            code = 0
+            try:
+                if role == 'writer':
+                    _run_writer(listen_sock, handler_class, writer_path, publish, reload, tasks, ready_fd)
+                else:
+                    _run_reader(listen_sock, handler_class, writer_path, snapshot_reader_factory())
+            except SystemExit as e:
+                code = e.code or 0
+            except BaseException as e:
+                logging.error(f"❌ {role} worker {os.getpid()} crashed: {type(e).__name__}: {str(e)}")
+                code = 1
+            finally:
+                logging.shutdown()
+            os._exit(code)
+        children[pid] = (role, time.monotonic())
+        logging.info(f"   → Started {role} worker pid {pid}")
+
+    def signal_workers(roles, signum):
+        for pid, (role, _) in list(children.items()):
+            if role in roles:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def stop(signum, frame):
+        if not state['stopping']:
+            logging.info(f"🛑 Master received signal {signum}, draining {len(children)} workers (readers first)")
+            state['stopping'] = True
+            signal.alarm(int(server_lifecycle.DRAIN_TIMEOUT * 2) + 1)
+        # Readers forward POSTs to the writer, so the writer stops after them
+        readers_left = any(role == 'reader' for role, _ in children.values())
+        signal_workers(('reader',) if readers_left else ('writer',), signal.SIGTERM)
+
+    def forward_reload(signum, frame):
+        logging.info("🔄 Master received SIGHUP, asking the writer to reload the data files")
+        signal_workers(('writer',), signal.SIGHUP)
+
+    def force_stop(signum, frame):
+        logging.warning(f"⚠️ Workers still running after the drain timeout, killing {list(children)}")
+        signal_workers(('writer', 'reader'), signal.SIGKILL)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, forward_reload)
+    signal.signal(signal.SIGALRM, force_stop)
+
+    logging.info(f"🧵 Pre-fork mode: 1 writer + {workers} reader workers on port {port}")
+    # Readers attach to the snapshot the writer publishes first: wait for its ready byte
+    ready_read, ready_write = os.pipe()
+    spawn('writer', ready_write)
+    os.close(ready_write)
+    readable, _, _ = select.select([ready_read], [], [], WRITER_READY_TIMEOUT)
+    # EOF (writer died before publishing) is readable too and reads as b''
+    if not readable or not os.read(ready_read, 1):
+        logging.warning("⚠️ Writer did not publish the first snapshot, starting readers anyway")
+    os.close(ready_read)
+    for _ in range(workers):
+        if not state['stopping']:
+            spawn('reader')
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        role, started = children.pop(pid, (None, None))
+        if state['stopping']:
+            if role == 'reader' and not any(r == 'reader' for r, _ in children.values()):
+                signal_workers(('writer',), signal.SIGTERM)
+            continue
+        if role is None:
+            continue
+        uptime = time.monotonic() - started
+        logging.warning(f"⚠️ {role} worker {pid} exited (status {status}) after {uptime:.1f}s, restarting")
+        if uptime >= STABLE_UPTIME:
+            backoff[role] = RESTART_BACKOFF
+        time.sleep(backoff[role])
+        backoff[role] = min(backoff[role] * 2, MAX_RESTART_BACKOFF)
+        if not state['stopping']:
+            spawn(role)
+
+    listen_sock.close()
+    if os.path.exists(writer_path):
+        os.remove(writer_path)
+    logging.info("🛑 All workers stopped")
@@ -0,0 +1,216 @@
+"""Ordered ranking index for top-N, paging and rank lookups.
+
+``RankingIndex`` keeps the player_statistics rows in ranking order in an
+indexable skip list: every link stores how many positions it spans, so
+inserting, removing, finding a player's rank and jumping to the row at a
+given rank all take O(log n). A page of ``k`` rows then costs O(log n + k)
+instead of sorting every player.
+
+The order is ``rank_key``: WinChips descending, ties by player name. The
+server ranks ``player_statistics.csv`` with the same key, so an index rank
+is the stored ``Ranking``.
+
+``LiveIndex`` keeps one index per process in step with the data version:
+after a commit it re-keys only the players in the ``data_version`` change
+log (their WinChips changed), and rebuilds from the full table when the log
+no longer covers its version (reload, crash recovery).
+"""
+
+import logging
+import random
+
+import data_version
+
+# Enough levels for about 2**20 players
+MAX_LEVEL = 20
+
+
+def rank_key(row):
+    """Sort key of a player_statistics row: WinChips descending, then name."""
+    try:
+        chips = float(row.get('WinChips', 0) or 0)
+    except (ValueError, TypeError):
+        chips = 0.0
+    return (-chips, str(row.get('Player') or ''))
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # Positions spanned by each link (1 = the next node)
+        self.width = [1] * level
+
+
+class RankingIndex:
+    """Player rows in ranking order with O(log n) rank and select."""
+
+    def __init__(self, seed=None):
+        self._head = _Node(None, MAX_LEVEL)
+        self._random = random.Random(seed)
+        self._keys = {}
+        self._rows = {}
+        self.last_update = None
+
+    @classmethod
+    def from_rows(cls, rows, last_update=None):
+        index = cls()
+        for row in rows:
+            index.update(row)
+        index.last_update = last_update
+        return index
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, player):
+        return player in self._keys
+
+    def _random_level(self):
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _insert(self, key):
+        update = [None] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node = self._head
+        position = 0
+        for i in reversed(range(MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+            update[i] = node
+            positions[i] = position
+        new = _Node(key, self._random_level())
+        for i in range(MAX_LEVEL):
+            prev = update[i]
+            if i < len(new.next):
+                # The new node lands at position + 1; everything after it shifts by one
+                new.next[i] = prev.next[i]
+                new.width[i] = prev.width[i] - (position - positions[i])
+                prev.next[i] = new
+                prev.width[i] = position + 1 - positions[i]
+            else:
+                prev.width[i] += 1
+
+    def _remove(self, key):
+        update = [None] * MAX_LEVEL
+        node = self._head
+        for i in reversed(range(MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+        target = node.next[0]
+        for i in range(MAX_LEVEL):
+            prev = update[i]
+            if i < len(target.next) and prev.next[i] is target:
+                prev.width[i] += target.width[i] - 1
+                prev.next[i] = target.next[i]
+            else:
+                prev.width[i] -= 1
+
+    def _select(self, rank):
+        """Return the node at 1-based ``rank``."""
+        node = self._head
+        position = 0
+        for i in reversed(range(MAX_LEVEL)):
+            while node.next[i] is not None and position + node.width[i] <= rank:
+                position += node.width[i]
+                node = node.next[i]
+        return node
+
+    def update(self, row):
+        """Insert or replace a player's row, moving it only if its rank key changed."""
+        player = row.get('Player')
+        if not player:
+            return
+        key = rank_key(row)
+        old_key = self._keys.get(player)
+        if old_key != key:
+            if old_key is not None:
+                self._remove(old_key)
+            self._insert(key)
+            self._keys[player] = key
+        self._rows[player] = row
+
+    def remove(self, player):
+        key = self._keys.pop(player, None)
+        if key is not None:
+            self._remove(key)
+            del self._rows[player]
+
+    def rank_of(self, player):
+        """1-based rank of ``player``, or None."""
+        key = self._keys.get(player)
+        if key is None:
+            return None
+        node = self._head
+        position = 0
+        for i in reversed(range(MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                position += node.width[i]
+                node = node.next[i]
+        return position
+
+    def page(self, offset, limit):
+        """Rows ranked ``offset + 1`` .. ``offset + limit``, with Ranking and Date filled in.
+
+        Values keep the CSV string form of the full /leaderboard, Ranking included.
+        """
+        rows = []
+        if limit <= 0 or offset >= len(self):
+            return rows
+        node = self._select(offset + 1)
+        rank = offset + 1
+        while node is not None and len(rows) < limit:
+            player = node.key[1]
+            rows.append({**self._rows[player], 'Ranking': str(rank), 'Date': self.last_update})
+            node = node.next[0]
+            rank += 1
+        return rows
+
+    def around(self, player, radius):
+        """Return ``(rank, rows)`` for ``player`` and up to ``radius`` players on each side."""
+        rank = self.rank_of(player)
+        if rank is None:
+            raise KeyError(f"Unknown player: {player}")
+        offset = max(rank - 1 - radius, 0)
+        return rank, self.page(offset, rank + radius - offset)
+
+
+class LiveIndex:
+    """A process's ranking index, kept at the current data version."""
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+
+    def get(self, version, load_state, load_rows):
+        """Return the index at ``version``.
+
+        ``load_state()`` returns the data version state (change log) and
+        ``load_rows()`` the full player_statistics rows.
+        """
+        if self.index is not None and self.version == version:
+            return self.index
+        if self.index is not None and self.version < version:
+            state = load_state()
+            delta = data_version.changes_since(state, self.version)
+            if delta is not None:
+                for row in delta['stats']:
+                    self.index.update(row)
+                self.index.last_update = delta['lastUpdate'] or self.index.last_update
+                logging.info(f"   → Ranking index v{self.version}→v{state['version']}: updated {len(delta['stats'])} player row(s)")
+                self.version = state['version']
+                return self.index
+        rows = load_rows()
+        dates = [str(row.get('Date')).strip() for row in rows if row.get('Date')]
+        self.index = RankingIndex.from_rows(rows, max(dates) if dates else None)
+        self.version = version
+        logging.info(f"   → Ranking index v{version}: built from {len(rows)} players")
+        return self.index
+
@@ -0,0 +1,437 @@
+"""Tiered storage of game records: sealed quarters plus a hot tail.
+
+``team_building_record.csv`` only holds the open period. Once a quarter has
+ended, its game days are moved out of it into an immutable, zlib-compressed
+CSV segment under ``archive/`` together with per-player totals (FinalChips in
+cents, attend/win/lose/peace counts), listed in ``archive/index.json``:
+
+- the leaderboard adds the segment totals to the hot rows and never reads
+  archived rows;
+- incremental ratings / buckets / pair matrix only need the sequence of game
+  dates, which the index keeps per segment;
+- a history or player query (``/records?from=&to=&player=``) decompresses only
+  the segments overlapping that range (or containing that player);
+- full rebuilds (reload, crash recovery) stream every segment in order.
+
+Sealing only ever takes a *prefix* of the hot file (whole game days, up to the
+first day of a quarter that is still open), so the global order of game days
+never changes and the stored ratings stay valid. A day backfilled into a
+sealed quarter is simply appended to the hot file.
+
+A seal writes the segment files, then the index, then the shorter hot file.
+If it is interrupted after the index, the hot file still starts with the rows
+just sealed; ``load_history`` recognizes them by checksum and skips them until
+the next seal rewrites the file.
+
+``python3 record_archive.py list|seal|verify|export`` manages the archive by hand.
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime
+
+import record_normalize
+import settlement
+
+ARCHIVE_DIR = 'archive'
+INDEX_FILE = 'index.json'
+RECORDS_FILE = 'team_building_record.csv'
+FIELDS = ('Time', 'ServiceFee_Rate', 'Player', 'Chips', 'WinOrLose', 'Value', 'FinalChips')
+# Decompressed segments kept per process (segments are immutable, keyed by checksum)
+CACHE_SIZE = 4
+
+_SEGMENT_CACHE = OrderedDict()
+
+
+def quarter_of(day):
+    """``'YYYY-MM-DD'`` -> ``'YYYY-Qn'``."""
+    return f"{day[:4]}-Q{(int(day[5:7]) - 1) // 3 + 1}"
+
+
+def quarter_start(day):
+    """First day (ISO) of the quarter containing ``day`` (a ``date`` or ISO string)."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return date(day.year, (day.month - 1) // 3 * 3 + 1, 1).isoformat()
+
+
+def _game_days(records):
+    """Yield ``(date, rows)`` for each run of consecutive rows with the same Time.
+
+    Same grouping as ``skill_rating.iter_games``; stops at a row without a date.
+    """
+    current_date = None
+    current = []
+    for record in records:
+        day = record.get('Time')
+        if not day:
+            break
+        if day != current_date and current:
+            yield current_date, current
+            current = []
+        current_date = day
+        current.append(record)
+    if current:
+        yield current_date, current
+
+
+def _csv_text(fieldnames, rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(temp_path, 0o664)
+    os.replace(temp_path, path)
+
+
+def write_records(path, fieldnames, rows):
+    """Write the hot records file atomically (a header only when ``rows`` is empty)."""
+    _write_atomic(path, _csv_text(fieldnames, rows).encode('utf-8'))
+
+
+def player_totals(rows):
+    """Sum FinalChips (cents) and count attend/win/lose/peace per player of normalized ``rows``.
+
+    Only dated rows count when any row is dated. Returns
+    ``{player: [cents, attend, wins, losses, peaces]}``.
+    """
+    dated_only = any(row.get('Time') for row in rows)
+    totals = {}
+    for row in rows:
+        if dated_only and not row.get('Time'):
+            continue
+        cents = settlement.final_cents(row)
+        total = totals.get(row.get('Player'))
+        if total is None:
+            total = totals[row.get('Player')] = [0, 0, 0, 0, 0]
+        total[0] += cents
+        total[1] += 1
+        total[2 if cents > 0 else 3 if cents < 0 else 4] += 1
+    return totals
+
+
+class Archive:
+    """The sealed segments of one data directory."""
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, ARCHIVE_DIR)
+        self.index_path = os.path.join(self.path, INDEX_FILE)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {'version': 1, 'fieldnames': None, 'segments': []}
+        with open(self.index_path, 'r', encoding='utf-8') as file:
+            index = json.load(file)
+        if index.get('version') != 1:
+            raise ValueError(f"Unsupported archive index version in {self.index_path}")
+        return index
+
+    @property
+    def segments(self):
+        return self.index['segments']
+
+    def __len__(self):
+        return sum(segment['rows'] for segment in self.segments)
+
+    def files(self):
+        """Paths of the archive files relative to the data directory."""
+        if not self.segments:
+            return []
+        return [f"{ARCHIVE_DIR}/{INDEX_FILE}"] + [f"{ARCHIVE_DIR}/{segment['file']}" for segment in self.segments]
+
+    def game_dates(self):
+        return [day for segment in self.segments for day in segment['dates']]
+
+    def dates(self):
+        return {day for segment in self.segments for day in segment['dates']}
+
+    def latest_date(self):
+        return max((segment['end'] for segment in self.segments), default=None)
+
+    def player_totals(self):
+        """``{player: [cents, attend, wins, losses, peaces]}`` over all segments."""
+        totals = {}
+        for segment in self.segments:
+            for player, values in segment['totals'].items():
+                total = totals.setdefault(player, [0, 0, 0, 0, 0])
+                for i, value in enumerate(values):
+                    total[i] += value
+        return totals
+
+    def read_segment(self, segment):
+        """Decompress one segment into CSV-style dicts (checked against its checksum)."""
+        cached = _SEGMENT_CACHE.get(segment['sha256'])
+        if cached is not None:
+            _SEGMENT_CACHE.move_to_end(segment['sha256'])
+            return cached
+        with open(os.path.join(self.path, segment['file']), 'rb') as file:
+            data = file.read()
+        if hashlib.sha256(data).hexdigest() != segment['sha256']:
+            raise ValueError(f"Archive segment {segment['file']} does not match its checksum")
+        rows = list(csv.DictReader(io.StringIO(zlib.decompress(data).decode('utf-8'))))
+        _SEGMENT_CACHE[segment['sha256']] = rows
+        if len(_SEGMENT_CACHE) > CACHE_SIZE:
+            _SEGMENT_CACHE.popitem(last=False)
+        return rows
+
+    def rows(self, start=None, end=None, player=None):
+        """Yield archived rows in history order, opening only the segments that can match."""
+        for segment in self.segments:
+            if (start and segment['end'] < start) or (end and segment['start'] > end):
+                continue
+            if player is not None and player not in segment['totals']:
+                continue
+            for row in self.read_segment(segment):
+                if (start and row['Time'] < start) or (end and row['Time'] > end):
+                    continue
+                if player is not None and row.get('Player') != player:
+                    continue
+                yield row
+
+    def seal(self, hot, before, fieldnames):
+        """Seal the leading game days of ``hot`` in quarters that ended before ``before``.
+
+        Consecutive days of the same quarter become one segment. Returns
+        ``(segments, remaining)``; the caller rewrites the hot file with
+        ``remaining``.
+        """
+        cutoff = quarter_start(before)
+        groups = []
+        for day, rows in _game_days(hot):
+            if day >= cutoff:
+                break
+            period = quarter_of(day)
+            if not groups or groups[-1][0] != period:
+                groups.append((period, []))
+            groups[-1][1].append((day, rows))
+        if not groups:
+            return [], hot
+
+        os.makedirs(self.path, mode=0o775, exist_ok=True)
+        sealed = []
+        count = 0
+        for period, days in groups:
+            rows = [row for _, day_rows in days for row in day_rows]
+            data = zlib.compress(_csv_text(fieldnames, rows).encode('utf-8'), 9)
+            name = f"records-{len(self.segments) + 1:04d}-{period}.csv.z"
+            _write_atomic(os.path.join(self.path, name), data)
+            dates = [day for day, _ in days]
+            segment = {
+                'file': name,
+                'period': period,
+                'start': min(dates),
+                'end': max(dates),
+                'rows': len(rows),
+                'dates': dates,
+                'bytes': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'sealed': datetime.now().isoformat(timespec='seconds'),
+                'totals': player_totals(rows)
+            }
+            self.segments.append(segment)
+            sealed.append(segment)
+            count += len(rows)
+        self.index['fieldnames'] = list(fieldnames)
+        self.index['lastSeal'] = {
+            'rows': count,
+            'first': hot[0]['Time'],
+            'sha256': hashlib.sha256(_csv_text(fieldnames, hot[:count]).encode('utf-8')).hexdigest()
+        }
+        _write_atomic(self.index_path, json.dumps(self.index, ensure_ascii=False, indent=1).encode('utf-8'))
+        return sealed, hot[count:]
+
+    def verify(self):
+        """Check every segment's checksum, row count and totals; return a list of problems."""
+        problems = []
+        for segment in self.segments:
+            try:
+                rows = self.read_segment(segment)
+            except (IOError, ValueError, zlib.error) as e:
+                problems.append(f"{segment['file']}: {str(e)}")
+                continue
+            if len(rows) != segment['rows']:
+                problems.append(f"{segment['file']}: {len(rows)} rows, index says {segment['rows']}")
+            if [day for day, _ in _game_days(rows)] != segment['dates']:
+                problems.append(f"{segment['file']}: game dates differ from the index")
+            if player_totals(rows) != segment['totals']:
+                problems.append(f"{segment['file']}: player totals differ from the index")
+        return problems
+
+
+class History:
+    """The full record history: archived segments followed by the hot rows.
+
+    Iterates like the list of records it replaces (archived rows are read
+    lazily); ``extend`` appends to the hot rows.
+    """
+
+    def __init__(self, archive, hot, fieldnames, records_path, stale=False):
+        self.archive = archive
+        self.hot = hot
+        self.fieldnames = list(fieldnames)
+        self.records_path = records_path
+        # The hot file still holds rows that are already sealed (interrupted seal)
+        self.stale = stale
+
+    def __iter__(self):
+        yield from self.archive.rows()
+        yield from self.hot
+
+    def __len__(self):
+        return len(self.archive) + len(self.hot)
+
+    def extend(self, records):
+        self.hot.extend(records)
+
+    def game_tail(self, count):
+        """``skill_rating.game_tail`` over the whole history, without opening segments."""
+        archived = self.archive.game_dates()
+        hot = [day for day, _ in _game_days(self.hot)]
+        dates = (archived + hot if len(hot) < count else hot)[-count:] if count else []
+        return len(archived) + len(hot), dates
+
+    def dates(self):
+        return self.archive.dates() | {record['Time'] for record in self.hot}
+
+    def latest_date(self):
+        latest = [day for day in (self.archive.latest_date(), max((r['Time'] for r in self.hot), default=None)) if day]
+        return max(latest) if latest else None
+
+    def rows(self, start=None, end=None, player=None):
+        """Records between ``start`` and ``end`` (ISO, inclusive), optionally of one player."""
+        rows = list(self.archive.rows(start, end, player))
+        rows.extend(record for record in self.hot
+                    if (not start or record['Time'] >= start) and (not end or record['Time'] <= end)
+                    and (player is None or record.get('Player') == player))
+        return rows
+
+    def seal(self, before=None):
+        """Move closed quarters (before the quarter of ``before``, default today) into the archive.
+
+        Returns the new segments.
+        """
+        segments, remaining = self.archive.seal(self.hot, before or date.today(), self.fieldnames)
+        if segments or self.stale:
+            write_records(self.records_path, self.fieldnames, remaining)
+            self.hot = remaining
+            self.stale = False
+        for segment in segments:
+            logging.info(f"🧊 Sealed {segment['period']} ({segment['start']}..{segment['end']}, {segment['rows']} rows, "
+                         f"{segment['bytes']} bytes) -> {ARCHIVE_DIR}/{segment['file']}")
+        return segments
+
+
+def load_history(data_dir, hot, fieldnames):
+    """Combine the archive of ``data_dir`` with the normalized hot rows."""
+    archive = Archive(data_dir)
+    fieldnames = fieldnames or archive.index.get('fieldnames') or list(FIELDS)
+    stale = False
+    last = archive.index.get('lastSeal')
+    if last and len(hot) >= last['rows'] and hot[0].get('Time') == last['first']:
+        text = _csv_text(fieldnames, hot[:last['rows']])
+        if hashlib.sha256(text.encode('utf-8')).hexdigest() == last['sha256']:
+            logging.warning(f"⚠️ {RECORDS_FILE} still holds the {last['rows']} rows sealed last (interrupted seal), skipping them")
+            hot = hot[last['rows']:]
+            stale = True
+    return History(archive, hot, fieldnames, os.path.join(data_dir, RECORDS_FILE), stale)
+
+
+def read_history(data_dir):
+    """Read and normalize the hot file of ``data_dir``; return ``(History, quarantined)``."""
+    path = os.path.join(data_dir, RECORDS_FILE)
+    rows = []
+    fieldnames = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            rows = list(reader)
+            fieldnames = reader.fieldnames
+    hot, quarantined = record_normalize.normalize_records(rows)
+    return load_history(data_dir, hot, fieldnames), quarantined
+
+
+def copy_archive(data_dir, target_dir):
+    """Copy the archive into ``target_dir`` (segments only when missing: they never change)."""
+    archive = Archive(data_dir)
+    if not archive.segments:
+        return 0
+    target = os.path.join(target_dir, ARCHIVE_DIR)
+    if not os.path.isdir(target):
+        # Only the archive directory itself is created, never ``target_dir``
+        os.mkdir(target, 0o775)
+    copied = 0
+    for segment in archive.segments:
+        if not os.path.exists(os.path.join(target, segment['file'])):
+            with open(os.path.join(archive.path, segment['file']), 'rb') as file:
+                _write_atomic(os.path.join(target, segment['file']), file.read())
+            copied += 1
+    with open(archive.index_path, 'rb') as file:
+        _write_atomic(os.path.join(target, INDEX_FILE), file.read())
+    return copied
+
+
+def main(argv=None):
+    base_dir = os.environ.get('AIRANKING_DATA_DIR') or os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="AIRanking record archive")
+    parser.add_argument('--data-dir', default=base_dir, help="data directory (default: AIRANKING_DATA_DIR or script dir)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="list sealed segments")
+    seal = sub.add_parser('seal', help="seal quarters that ended before --before (default today)")
+    seal.add_argument('--before', default=None, help="YYYY-MM-DD; quarters ending before its quarter are sealed")
+    sub.add_parser('verify', help="check segment checksums and totals")
+    export = sub.add_parser('export', help="write records of a date range as CSV")
+    export.add_argument('--from', dest='start', default=None)
+    export.add_argument('--to', dest='end', default=None)
+    export.add_argument('--player', default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.command == 'list':
+        archive = Archive(args.data_dir)
+        for segment in archive.segments:
+            print(f"{segment['file']}  {segment['period']}  {segment['start']}..{segment['end']}  "
+                  f"{len(segment['dates'])} days  {segment['rows']} rows  {segment['bytes']} bytes")
+        print(f"{len(archive.segments)} segment(s), {len(archive)} archived rows")
+    elif args.command == 'seal':
+        history, quarantined = read_history(args.data_dir)
+        if quarantined:
+            print(f"❌ {len(quarantined)} record row(s) cannot be parsed; start the server once to quarantine them")
+            return 1
+        segments = history.seal(date.fromisoformat(args.before) if args.before else None)
+        print(f"Sealed {len(segments)} segment(s), {len(history.hot)} rows left in {RECORDS_FILE}")
+    elif args.command == 'verify':
+        archive = Archive(args.data_dir)
+        problems = archive.verify()
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"{len(archive.segments)} segment(s) checked, {len(problems)} problem(s)")
+        return 1 if problems else 0
+    elif args.command == 'export':
+        history, _ = read_history(args.data_dir)
+        writer = csv.DictWriter(sys.stdout, fieldnames=history.fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(history.rows(args.start, args.end, args.player))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
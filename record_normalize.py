@@ -0,0 +1,131 @@
+"""Ingest-time normalization of game records.
+
+Every record enters the system through ``normalize_record`` exactly once:
+when ``team_building_record.csv`` is read and when ``/update_leaderboard``
+decodes a submitted row. It canonicalizes
+
+- ``Time`` to ISO ``YYYY-MM-DD`` (also accepting ``yyyy年M月d日`` and
+  ``YYYY/M/D``), validated as a calendar date;
+- ``WinOrLose`` to an ``Outcome`` (``Win``/``水上``, ``Lose``/``水下``, ``Peace``);
+- ``Chips``, ``FinalChips`` and ``ServiceFee_Rate`` to checked numbers (the
+  text is kept as written).
+
+Downstream code (statistics, ratings, period buckets, validation) compares
+the canonical strings directly and never re-parses dates or labels. Rows that
+cannot be normalized are returned separately with their reasons; the server
+moves them from ``team_building_record.csv`` into ``record_quarantine.csv``.
+"""
+
+import re
+from datetime import date
+from enum import Enum
+
+QUARANTINE_FILE = 'record_quarantine.csv'
+REASON_FIELD = 'Reason'
+
+_DATE_RE = re.compile(r"(\d{4})(?:-|/|年)(\d{1,2})(?:-|/|月)(\d{1,2})日?")
+
+
+class Outcome(str, Enum):
+    WIN = 'Win'
+    LOSE = 'Lose'
+    PEACE = 'Peace'
+
+
+# Accepted WinOrLose labels (English labels are matched case-insensitively)
+OUTCOME_LABELS = {
+    'win': Outcome.WIN,
+    '水上': Outcome.WIN,
+    'lose': Outcome.LOSE,
+    '水下': Outcome.LOSE,
+    'peace': Outcome.PEACE,
+    '平': Outcome.PEACE,
+    '持平': Outcome.PEACE
+}
+
+
+def normalize_time(value):
+    """Return ``(iso, ordinal)`` for a supported date string, or None."""
+    match = _DATE_RE.fullmatch(str(value or '').strip())
+    if not match:
+        return None
+    try:
+        day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+    return day.isoformat(), day.toordinal()
+
+
+def normalize_outcome(value):
+    """Return the ``Outcome`` for a WinOrLose label, or None."""
+    label = str(value or '').strip()
+    return OUTCOME_LABELS.get(label.lower(), OUTCOME_LABELS.get(label))
+
+
+def _is_number(value, allow_empty=False):
+    if allow_empty and (value is None or str(value).strip() == ''):
+        return True
+    try:
+        float(value)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def normalize_record(record, default_time=None):
+    """Normalize one record in place; return the list of reasons it cannot be used.
+
+    ``default_time`` fills a missing ``Time`` (rows of a submitted game day).
+    An empty ``WinOrLose`` is derived from the sign of ``FinalChips``.
+    """
+    if not isinstance(record, dict):
+        return ["expected an object"]
+    reasons = []
+    if not str(record.get('Player') or '').strip():
+        reasons.append("missing Player")
+
+    time_value = record.get('Time')
+    if (time_value is None or str(time_value).strip() == '') and default_time is not None:
+        time_value = default_time
+    normalized = normalize_time(time_value)
+    if normalized is None:
+        reasons.append(f"unparseable Time {time_value!r}")
+    else:
+        record['Time'] = normalized[0]
+
+    for field in ('Chips', 'FinalChips'):
+        if not _is_number(record.get(field)):
+            reasons.append(f"{field} is not a number: {record.get(field)!r}")
+    if not _is_number(record.get('ServiceFee_Rate'), allow_empty=True):
+        reasons.append(f"ServiceFee_Rate is not a number: {record.get('ServiceFee_Rate')!r}")
+
+    label = record.get('WinOrLose')
+    if label is None or str(label).strip() == '':
+        if _is_number(record.get('FinalChips')):
+            chips = float(record.get('FinalChips'))
+            record['WinOrLose'] = (Outcome.WIN if chips > 0 else Outcome.LOSE if chips < 0 else Outcome.PEACE).value
+    else:
+        outcome = normalize_outcome(label)
+        if outcome is None:
+            reasons.append(f"unknown WinOrLose {label!r}")
+        else:
+            record['WinOrLose'] = outcome.value
+    return reasons
+
+
+def normalize_records(records):
+    """Normalize stored rows; return ``(rows, quarantined)``.
+
+    ``quarantined`` holds ``{'row': line index, 'record': original row, 'reasons': [...]}``
+    for the rows that could not be normalized.
+    """
+    rows = []
+    quarantined = []
+    for index, record in enumerate(records):
+        original = dict(record)
+        reasons = normalize_record(record)
+        if reasons:
+            quarantined.append({'row': index, 'record': original, 'reasons': reasons})
+        else:
+            rows.append(record)
+    return rows, quarantined
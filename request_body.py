@@ -0,0 +1,222 @@
+"""Bounded, streaming request-body reading for CustomHandler.
+
+``iter_body`` yields the raw body in chunks, from either ``Content-Length`` or
+``Transfer-Encoding: chunked``, enforcing a maximum size, a per-read socket
+timeout and an overall deadline so slow clients cannot hold the server.
+
+``parse_json_object`` decodes a top-level JSON object from those chunks. The
+elements of the configured array keys (``newRecords`` / ``gameDays``) are
+decoded one at a time and handed to a callback as soon as they are complete,
+so a bad row aborts the upload without reading or decoding the rest.
+"""
+
+import codecs
+import json
+import socket
+import time
+
+CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_LINE = 1024
+# Characters that can continue a JSON number ("1" + "2", "1e" + "3", "1." + "5")
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+class RequestBodyError(Exception):
+    """Request body could not be read; ``status_code`` is the HTTP status to send."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def iter_body(handler, max_bytes, read_timeout, total_timeout, counter=None):
+    """Yield the request body of ``handler`` in chunks of at most CHUNK_SIZE bytes.
+
+    ``counter`` (a dict) receives the running byte count under ``'bytes'``.
+    """
+    counter = counter if counter is not None else {}
+    counter['bytes'] = 0
+    deadline = time.monotonic() + total_timeout
+    rfile = handler.rfile
+
+    def arm():
+        # A read may block only until the deadline, so the whole body takes at most total_timeout
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise RequestBodyError(408, f"Request body not received within {total_timeout:g}s")
+        handler.connection.settimeout(min(read_timeout, left))
+
+    def read_exact(size):
+        # Read ``size`` bytes using at most one socket read per loop
+        remaining = size
+        while remaining > 0:
+            arm()
+            data = rfile.read1(min(remaining, CHUNK_SIZE))
+            if not data:
+                raise RequestBodyError(400, "Connection closed before the request body was complete")
+            remaining -= len(data)
+            counter['bytes'] += len(data)
+            if counter['bytes'] > max_bytes:
+                raise RequestBodyError(413, f"Request body exceeds {max_bytes} bytes")
+            yield data
+
+    def read_line():
+        arm()
+        line = rfile.readline(MAX_CHUNK_LINE + 1)
+        if len(line) > MAX_CHUNK_LINE or not line.endswith(b'\n'):
+            raise RequestBodyError(400, "Malformed chunked encoding")
+        return line.strip()
+
+    transfer_encoding = (handler.headers.get('Transfer-Encoding') or '').lower()
+    content_length = handler.headers.get('Content-Length')
+    try:
+        if 'chunked' in transfer_encoding:
+            while True:
+                size_field = read_line().split(b';', 1)[0]
+                try:
+                    size = int(size_field, 16)
+                except ValueError:
+                    raise RequestBodyError(400, "Malformed chunk size")
+                if size == 0:
+                    # Skip trailers up to the terminating blank line
+                    while read_line():
+                        pass
+                    return
+                if counter['bytes'] + size > max_bytes:
+                    raise RequestBodyError(413, f"Request body exceeds {max_bytes} bytes")
+                yield from read_exact(size)
+                if read_line():
+                    raise RequestBodyError(400, "Malformed chunked encoding")
+        else:
+            if content_length is None:
+                raise RequestBodyError(411, "Content-Length or Transfer-Encoding: chunked required")
+            try:
+                length = int(content_length)
+            except ValueError:
+                raise RequestBodyError(400, f"Invalid Content-Length: {content_length}")
+            if length < 0:
+                raise RequestBodyError(400, f"Invalid Content-Length: {content_length}")
+            if length > max_bytes:
+                raise RequestBodyError(413, f"Request body exceeds {max_bytes} bytes")
+            yield from read_exact(length)
+    except socket.timeout:
+        if time.monotonic() >= deadline:
+            raise RequestBodyError(408, f"Request body not received within {total_timeout:g}s")
+        raise RequestBodyError(408, f"No request body data for {read_timeout:g}s")
+    finally:
+        # The response is written with the plain per-read timeout, not what was left of the deadline
+        handler.connection.settimeout(read_timeout)
+
+
+class _JSONStream:
+    """Incrementally decoded text with a cursor, refilled from byte chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+            text = self.decoder.decode(chunk)
+        except StopIteration:
+            text = self.decoder.decode(b'', final=True)
+            self.eof = True
+        except UnicodeDecodeError as e:
+            raise RequestBodyError(400, f"Request body is not valid UTF-8: {str(e)}")
+        # Drop the consumed prefix so the buffer only holds undecoded text
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character ('' at end of input)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode one complete JSON value at the cursor."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+                # A number is only complete once a character that cannot continue it follows
+                scan = end
+                if type(value) in (int, float):
+                    while scan < len(self.buf) and self.buf[scan] in NUMBER_CHARS:
+                        scan += 1
+                if scan < len(self.buf) or self.eof or type(value) not in (int, float):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the pending text geometrically so a long value is re-scanned O(log n) times
+            pending = len(self.buf) - self.pos
+            while self.fill() and len(self.buf) - self.pos < 2 * pending:
+                pass
+
+
+def parse_json_object(chunks, stream_keys=(), on_item=None):
+    """Decode a top-level JSON object from byte ``chunks``.
+
+    Arrays under ``stream_keys`` are decoded element by element; each element
+    is passed to ``on_item(key, index, item)`` (which may raise to abort) and
+    collected into the returned dict.
+    """
+    stream = _JSONStream(chunks)
+    result = {}
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.pos += 1
+    else:
+        while True:
+            if stream.peek() != '"':
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", stream.buf, stream.pos)
+            key = stream.value()
+            stream.expect(':')
+            if key in stream_keys and stream.peek() == '[':
+                stream.pos += 1
+                items = []
+                if stream.peek() == ']':
+                    stream.pos += 1
+                else:
+                    while True:
+                        item = stream.value()
+                        if on_item is not None:
+                            on_item(key, len(items), item)
+                        items.append(item)
+                        separator = stream.peek()
+                        stream.pos += 1
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise json.JSONDecodeError("Expecting ',' delimiter", stream.buf, stream.pos - 1)
+                result[key] = items
+            else:
+                result[key] = stream.value()
+            separator = stream.peek()
+            stream.pos += 1
+            if separator == '}':
+                break
+            if separator != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", stream.buf, stream.pos - 1)
+    if stream.peek() != '':
+        raise json.JSONDecodeError("Extra data", stream.buf, stream.pos)
+    return result
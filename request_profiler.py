@@ -0,0 +1,170 @@
+"""Opt-in per-request profiling for CustomHandler.
+
+Profiling is enabled either for selected paths through the environment, or per
+request by an admin sending the ``X-Profile`` header with the profiling token:
+
+    AIRANKING_PROFILE=/update_leaderboard,/leaderboard   # path prefixes, or "all"
+    AIRANKING_PROFILE_TOKEN=<secret>  # enables the X-Profile header (unset: header ignored)
+    AIRANKING_PROFILE_MEMORY=1        # also trace allocations with tracemalloc
+    AIRANKING_PROFILE_DIR=/var/tmp/airanking_profiles    # output directory
+    AIRANKING_PROFILE_KEEP=50         # number of profiled requests to keep
+    AIRANKING_PROFILE_TOP=30          # rows in the text summary
+
+    curl -H 'X-Profile: <secret>' -H 'X-Profile-Memory: 1' .../leaderboard
+
+The output directory defaults to ``airanking_profiles`` in the system temp
+directory; it must not be inside the web root, profiles show source paths and
+timings.
+
+Each profiled request writes ``<timestamp>_<method>_<path>.pstats`` (load with
+``python3 -m pstats``) and a ``.txt`` top-N summary. When no path is configured
+and the header is absent, a request costs one header lookup and nothing else.
+"""
+
+import cProfile
+import functools
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urlparse
+
+PROFILE_HEADER = 'X-Profile'
+MEMORY_HEADER = 'X-Profile-Memory'
+
+_config = {
+    'paths': (),
+    'memory': False,
+    'directory': os.path.join(tempfile.gettempdir(), 'airanking_profiles'),
+    'keep': 50,
+    'top': 30,
+    'admin_token': None
+}
+
+
+def configure(web_root, env=None):
+    """Load the profiling settings from the environment.
+
+    ``web_root`` is the directory served by the web server; an output
+    directory inside it is refused.
+    """
+    env = os.environ if env is None else env
+    paths = [p.strip() for p in env.get('AIRANKING_PROFILE', '').split(',') if p.strip()]
+    if any(p.lower() in ('1', 'all', '*') for p in paths):
+        paths = ['/']
+    _config['memory'] = env.get('AIRANKING_PROFILE_MEMORY', '') not in ('', '0')
+    directory = os.path.abspath(env.get('AIRANKING_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'airanking_profiles'))
+    root = os.path.abspath(web_root)
+    if os.path.commonpath([directory, root]) == root:
+        logging.warning(f"⚠️ AIRANKING_PROFILE_DIR {directory} is inside the web root {root}, profiling disabled")
+        paths = []
+        token = None
+    else:
+        token = env.get('AIRANKING_PROFILE_TOKEN') or None
+    _config['paths'] = tuple(paths)
+    _config['directory'] = directory
+    _config['keep'] = int(env.get('AIRANKING_PROFILE_KEEP', 50))
+    _config['top'] = int(env.get('AIRANKING_PROFILE_TOP', 30))
+    _config['admin_token'] = token
+    if paths:
+        logging.info(f"Request profiling enabled for {list(paths)} -> {_config['directory']}")
+    return dict(_config)
+
+
+def _requested(handler):
+    """Return (profile, memory) for the current request."""
+    header = handler.headers.get(PROFILE_HEADER)
+    if header is not None:
+        token = _config['admin_token']
+        if token is None or not hmac.compare_digest(header.encode('utf-8'), token.encode('utf-8')):
+            logging.warning(f"Ignoring {PROFILE_HEADER} header with wrong token from {handler.address_string()}")
+            return False, False
+        return True, _config['memory'] or handler.headers.get(MEMORY_HEADER, '') not in ('', '0')
+    path = urlparse(handler.path).path
+    return any(path.startswith(prefix) for prefix in _config['paths']), _config['memory']
+
+
+def profiled(method):
+    """Decorate a ``do_*`` handler method so chosen requests are profiled."""
+    @functools.wraps(method)
+    def wrapper(handler):
+        if not _config['paths'] and PROFILE_HEADER not in handler.headers:
+            return method(handler)
+        enabled, memory = _requested(handler)
+        if not enabled:
+            return method(handler)
+        return _run_profiled(handler, method, memory)
+    return wrapper
+
+
+def _run_profiled(handler, method, memory):
+    label = f"{handler.command} {urlparse(handler.path).path}"
+    started_tracemalloc = False
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        started_tracemalloc = True
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        return method(handler)
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = None
+        peak = None
+        if memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracemalloc:
+                tracemalloc.stop()
+        try:
+            write_profile(label, profiler, elapsed, snapshot, peak)
+        except Exception as e:
+            logging.warning(f"⚠️ Failed to write profile for {label}: {str(e)}")
+
+
+def write_profile(label, profiler, elapsed, snapshot=None, peak=None):
+    """Write the .pstats file and the text summary, then apply retention."""
+    directory = _config['directory']
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_') or 'request'
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{slug}"
+    stats_path = os.path.join(directory, f"{name}.pstats")
+    summary_path = os.path.join(directory, f"{name}.txt")
+
+    profiler.dump_stats(stats_path)
+
+    out = io.StringIO()
+    out.write(f"{label}\nWall time: {elapsed * 1000:.1f} ms\n\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(_config['top'])
+    if snapshot is not None:
+        out.write(f"\nPeak traced memory: {peak / 1024:.1f} KiB\n")
+        out.write(f"Top {_config['top']} allocation sites:\n")
+        for stat in snapshot.statistics('lineno')[:_config['top']]:
+            out.write(f"  {stat}\n")
+    with open(summary_path, 'w', encoding='utf-8') as file:
+        file.write(out.getvalue())
+
+    logging.info(f"🔬 Profiled {label} in {elapsed * 1000:.1f} ms -> {stats_path}")
+    prune(directory, _config['keep'])
+    return stats_path
+
+
+def prune(directory, keep):
+    """Delete all but the newest ``keep`` profiled requests."""
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(directory)
+                    if f.endswith('.pstats') or f.endswith('.txt')})
+    for name in names[:max(0, len(names) - keep)]:
+        for ext in ('.pstats', '.txt'):
+            path = os.path.join(directory, name + ext)
+            if os.path.exists(path):
+                os.remove(path)
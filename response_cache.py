@@ -0,0 +1,105 @@
+"""Per-process cache of encoded GET responses for the derived query endpoints.
+
+The body of ``/leaderboard`` (with ``?top=`` / ``?period=`` ...), ``/rank/``,
+``/player/<name>/versus``, ``/pairs`` and ``/records`` is a function of the
+request URL and the data version only, and the data only changes when
+``/update_leaderboard`` commits or a reload runs - both bump the version.
+Entries are tagged with the version they were built at, and the first
+request that sees a newer version drops the whole cache; nothing is ever
+invalidated piece by piece.
+
+Keys are normalized (percent-decoding, repeated or trailing slashes, query
+parameters ordered by name, the cache-busting ``_`` parameter dropped) so
+equivalent URLs share one entry. Memory is bounded by the total body size
+(least recently used entries are evicted first); a body larger than a
+quarter of the budget is never cached.
+"""
+
+import re
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Query parameters that never change the response
+IGNORED_PARAMS = ('_',)
+
+_SLASHES_RE = re.compile(r"/{2,}")
+
+
+def normalize_key(path):
+    """``'/rank/A%20B/?neighbours=3&_=17'`` -> ``'/rank/A B?neighbours=3'``."""
+    parts = urlsplit(path)
+    route = _SLASHES_RE.sub('/', unquote(parts.path)).rstrip('/') or '/'
+    # A stable sort keeps repeated parameters in order: endpoints read the first value
+    params = sorted((item for item in parse_qsl(parts.query) if item[0] not in IGNORED_PARAMS),
+                    key=lambda item: item[0])
+    return f"{route}?{urlencode(params)}" if params else route
+
+
+class ResponseCache:
+    """Byte-bounded LRU of response bodies, all built at the same data version."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, version, key):
+        """Return the body cached for ``key`` at ``version``, or None."""
+        if version != self.version:
+            self.invalidate(version)
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, version, key, body):
+        """Store ``body`` (bytes) built at ``version``; return False if it was not cached."""
+        if not self.enabled or len(body) > self.max_bytes // 4:
+            return False
+        if version != self.version:
+            self.invalidate(version)
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+        self.entries[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, version=None):
+        """Drop every entry; later entries belong to ``version``."""
+        if self.entries:
+            self.invalidations += 1
+        self.entries.clear()
+        self.bytes = 0
+        self.version = version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'version': self.version,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'maxBytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
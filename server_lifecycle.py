@@ -0,0 +1,96 @@
+"""SIGHUP data reload and SIGTERM drain for a serving process.
+
+``systemctl reload airanking`` (``ExecReload=/bin/kill -HUP $MAINPID``) asks
+the server to re-read its data files without a restart. The signal handler
+only sets a flag; the reload itself runs between two requests in the process
+that owns the data files (the single process, or the pre-fork writer), so it
+never interleaves with a commit. The reload callback builds and validates
+everything before it replaces a file: if it raises, the current files and the
+published snapshot stay in place and serving continues on the old data.
+
+SIGTERM (``systemctl stop`` / ``restart``) stops accepting new connections,
+lets the request in progress finish, serves the connections already waiting
+in the listen backlog (for up to DRAIN_TIMEOUT seconds) and then returns from
+``serve``.
+
+Periodic background work (``tasks``) is polled from the same loop, between
+requests, so it needs no thread and never runs during a commit.
+"""
+
+import logging
+import os
+import signal
+import time
+
+# Seconds spent serving queued connections after SIGTERM
+DRAIN_TIMEOUT = float(os.environ.get('AIRANKING_DRAIN_TIMEOUT', 20))
+# How often the serve loop checks for signals while idle
+POLL_INTERVAL = 0.5
+
+
+class Lifecycle:
+    """Signal flags and the serve loop of one process."""
+
+    def __init__(self, reload=None, drain_timeout=DRAIN_TIMEOUT, tasks=()):
+        self.reload = reload
+        self.drain_timeout = drain_timeout
+        # Callables polled after every request and every idle POLL_INTERVAL
+        self.tasks = list(tasks)
+        self.reload_requested = False
+        self.stopping = False
+
+    def install(self):
+        """Route SIGTERM (and SIGHUP when a reload callback is set) to this lifecycle."""
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGHUP, self._request_reload if self.reload is not None else signal.SIG_IGN)
+
+    def _request_stop(self, signum, frame):
+        # Handlers only set flags: the serve loop acts on them between requests
+        self.stopping = True
+
+    def _request_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def serve(self, httpd):
+        """Handle requests until SIGTERM, running requested reloads in between, then drain."""
+        httpd.timeout = POLL_INTERVAL
+        while not self.stopping:
+            httpd.handle_request()
+            if self.reload_requested and not self.stopping:
+                self.reload_requested = False
+                self.run_reload()
+            self.run_tasks()
+        self.drain(httpd)
+
+    def run_reload(self):
+        try:
+            self.reload()
+        except Exception as e:
+            logging.error(f"❌ Reload failed, still serving the previous data: {str(e)}")
+
+    def run_tasks(self):
+        for task in self.tasks:
+            try:
+                task()
+            except Exception as e:
+                logging.error(f"❌ Background task failed: {str(e)}")
+
+    def drain(self, httpd):
+        """Serve the connections already queued on the listening socket, then close it."""
+        logging.info(f"🛑 Process {os.getpid()} received SIGTERM, draining queued connections")
+        httpd.socket.setblocking(False)
+        deadline = time.monotonic() + self.drain_timeout
+        drained = 0
+        while time.monotonic() < deadline:
+            try:
+                request, client_address = httpd.get_request()
+            except OSError:
+                break
+            try:
+                httpd.process_request(request, client_address)
+            except Exception:
+                httpd.handle_error(request, client_address)
+                httpd.shutdown_request(request)
+            drained += 1
+        httpd.server_close()
+        logging.info(f"🛑 Process {os.getpid()} stopped after draining {drained} connection(s)")
@@ -0,0 +1,167 @@
+"""Exact service-fee settlement of a game day, in integer cents.
+
+A game day is a list of players with their raw ``Chips`` (summing to zero)
+and one ``ServiceFee_Rate`` - despite the name, the total fee in chips for
+the table. Only winners pay, in proportion to their winnings::
+
+    fee(p) = ServiceFee_Rate * Chips(p) / totalWinChips     (Chips(p) > 0)
+    FinalChips(p) = Chips(p) - fee(p)
+
+All amounts are fixed-point integers in cents. Each winner first gets the
+floor of the exact share; the cents left over go one each to the largest
+remainders (ties: more chips, then player name). The fees therefore always
+add up to the table fee exactly, and the result does not depend on the order
+the players are listed in. A table without winners pays no fee.
+
+app.js used to do the same allocation in floats and round each share with
+``toFixed(2)``, so the fees of a day could miss the table fee by a cent or
+two; ``POST /settle`` in airankingx.py serves this module instead.
+
+::
+
+    python3 settlement.py 10 Peter=100 Anton=-60 West=-40
+"""
+
+import sys
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+def to_cents(value):
+    """Parse an amount (number or decimal string) into integer cents, rounding half away from zero."""
+    if isinstance(value, bool):
+        raise ValueError(f"not a number: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    text = str(value).strip()
+    # At most two decimals and well within float precision (every stored FinalChips):
+    # the float product is within half a cent of the exact one, so rounding is exact
+    point = text.find('.')
+    if len(text) < 16 and (point < 0 or len(text) - point <= 3) and 'e' not in text.lower():
+        try:
+            return int(round(float(text) * 100))
+        except (ValueError, OverflowError):
+            pass
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"not a number: {value!r}")
+    return int((amount * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents):
+    """``-1234`` -> ``'-12.34'``."""
+    sign = '-' if cents < 0 else ''
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def round_cents(cents, digits=1):
+    """Round integer cents to ``digits`` (0-2) decimals, half away from zero, as a float."""
+    step = 10 ** (2 - digits)
+    rounded = (abs(cents) + step // 2) // step
+    return (-rounded if cents < 0 else rounded) / 10 ** digits
+
+
+def final_cents(record):
+    """FinalChips of a game record in cents (0 when missing or not a number)."""
+    try:
+        return to_cents(record.get('FinalChips', 0) or 0)
+    except ValueError:
+        return 0
+
+
+def allocate_fee(chips, fee):
+    """Split ``fee`` cents over the winners of ``chips`` (``[(player, cents), ...]``).
+
+    Returns the fee of every entry, in input order, in cents.
+    """
+    total = sum(amount for _, amount in chips if amount > 0)
+    fees = [0] * len(chips)
+    if total == 0:
+        return fees
+    remainders = []
+    for i, (player, amount) in enumerate(chips):
+        if amount > 0:
+            fees[i], remainder = divmod(fee * amount, total)
+            remainders.append((-remainder, -amount, player, i))
+    # Fewer cents are left than there are winners: each gets at most one
+    left = fee - sum(fees)
+    for _, _, _, i in sorted(remainders)[:left]:
+        fees[i] += 1
+    return fees
+
+
+def settle(players, service_fee):
+    """Settle one game day; raise ValueError on invalid input.
+
+    ``players`` is a list of ``{'Player', 'Chips'}`` dicts. Returns
+    ``{'ServiceFee_Rate', 'totalWinChips', 'players'}`` where every player entry
+    has ``Chips``, ``WinOrLose``, ``ServiceFee`` and ``FinalChips`` (two-decimal
+    strings) plus ``ServiceFeeCents`` / ``FinalChipsCents``.
+    """
+    if not isinstance(players, list) or not players:
+        raise ValueError("players must be a non-empty list")
+    fee = to_cents(service_fee if service_fee not in (None, '') else 0)
+    if fee < 0:
+        raise ValueError("ServiceFee_Rate must not be negative")
+
+    chips = []
+    seen = set()
+    for i, entry in enumerate(players):
+        if not isinstance(entry, dict):
+            raise ValueError(f"players[{i}]: expected an object")
+        player = str(entry.get('Player') or '').strip()
+        if not player:
+            raise ValueError(f"players[{i}]: missing Player")
+        if player in seen:
+            raise ValueError(f"duplicate player {player}")
+        seen.add(player)
+        try:
+            chips.append((player, to_cents(entry.get('Chips'))))
+        except ValueError:
+            raise ValueError(f"{player}: Chips is not a number: {entry.get('Chips')!r}")
+    chips_sum = sum(amount for _, amount in chips)
+    if chips_sum != 0:
+        raise ValueError(f"Chips sum is {format_cents(chips_sum)}, expected 0")
+
+    fees = allocate_fee(chips, fee)
+    result = []
+    for (player, amount), player_fee in zip(chips, fees):
+        final = amount - player_fee
+        result.append({
+            'Player': player,
+            'Chips': amount // 100 if amount % 100 == 0 else format_cents(amount),
+            'WinOrLose': 'Win' if amount > 0 else 'Lose' if amount < 0 else 'Peace',
+            'ServiceFee': format_cents(player_fee),
+            'FinalChips': format_cents(final),
+            'ServiceFeeCents': player_fee,
+            'FinalChipsCents': final
+        })
+    return {
+        'ServiceFee_Rate': format_cents(fee),
+        'totalWinChips': format_cents(sum(amount for _, amount in chips if amount > 0)),
+        'players': result
+    }
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) < 2 or any('=' not in arg for arg in args[1:]):
+        print("usage: settlement.py SERVICE_FEE PLAYER=CHIPS ...", file=sys.stderr)
+        return 2
+    players = [dict(zip(('Player', 'Chips'), arg.rsplit('=', 1))) for arg in args[1:]]
+    try:
+        result = settle(players, args[0])
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"ServiceFee_Rate {result['ServiceFee_Rate']}, total win chips {result['totalWinChips']}")
+    for entry in result['players']:
+        print(f"  {entry['Player']:<16} {entry['WinOrLose']:<5} {entry['Chips']:>10} "
+              f"fee {entry['ServiceFee']:>8}  final {entry['FinalChips']:>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
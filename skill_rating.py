@@ -0,0 +1,237 @@
+"""Incremental multi-player Elo rating for team building games.
+
+Each game date is one table. Every player is rated against the average rating
+of the other players at that table, scored by finishing position on
+``FinalChips`` (beating everyone = 1, losing to everyone = 0, ties split).
+Applying a game only touches the players at that table, so
+``/update_leaderboard`` updates the ratings incrementally, and
+``rebuild_from_csv`` replays ``team_building_record.csv`` once, in file
+(commit) order, to reproduce exactly the same state.
+
+State is stored as JSON in ``player_ratings.json`` next to
+``player_statistics.csv``.
+"""
+
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+
+import record_archive
+import record_normalize
+import settlement
+
+RATINGS_FILE = 'player_ratings.json'
+INITIAL_RATING = 1500.0
+# Maximum rating change per game
+K_FACTOR = 32.0
+
+
+def new_state():
+    """Return an empty rating state."""
+    return {
+        'version': 1,
+        'initialRating': INITIAL_RATING,
+        'kFactor': K_FACTOR,
+        'games': 0,
+        'lastGame': None,
+        'players': {}
+    }
+
+
+def apply_game(state, date, records):
+    """Apply one game day to ``state`` in place and return the rating deltas.
+
+    Cost is O(n log n) in the number of players at the table; players who did
+    not attend are never touched.
+    """
+    results = {}
+    for record in records:
+        player = record.get('Player')
+        if player:
+            # A player appearing twice on one day keeps the summed result (cents: ties compare exactly)
+            results[player] = results.get(player, 0) + settlement.final_cents(record)
+
+    players = state['players']
+    n = len(results)
+    deltas = {}
+    if n >= 2:
+        ratings = {p: players.get(p, {}).get('rating', state['initialRating']) for p in results}
+        rating_sum = sum(ratings.values())
+
+        # Score = (players beaten + 0.5 * players tied) / (n - 1), from one sort
+        ordered = sorted(results.items(), key=lambda item: item[1])
+        scores = {}
+        i = 0
+        while i < n:
+            j = i
+            while j + 1 < n and ordered[j + 1][1] == ordered[i][1]:
+                j += 1
+            score = (i + 0.5 * (j - i)) / (n - 1)
+            for k in range(i, j + 1):
+                scores[ordered[k][0]] = score
+            i = j + 1
+
+        for player, rating in ratings.items():
+            opponents = (rating_sum - rating) / (n - 1)
+            expected = 1.0 / (1.0 + 10 ** ((opponents - rating) / 400.0))
+            deltas[player] = state['kFactor'] * (scores[player] - expected)
+
+    for player in results:
+        entry = players.setdefault(player, {'rating': state['initialRating'], 'games': 0})
+        entry['rating'] = round(entry['rating'] + deltas.get(player, 0.0), 4)
+        entry['games'] += 1
+        entry['lastGame'] = date
+
+    state['games'] += 1
+    state['lastGame'] = date
+    return deltas
+
+
+def iter_games(records):
+    """Yield ``(date, records)`` for each run of consecutive rows with the same date.
+
+    ``records`` must be normalized (``record_normalize``), so ``Time`` is
+    compared as an ISO string; rows without a Time are skipped.
+    """
+    current_date = None
+    current = []
+    for record in records:
+        date = record.get('Time')
+        if not date:
+            continue
+        if date != current_date and current:
+            yield current_date, current
+            current = []
+        current_date = date
+        current.append(record)
+    if current:
+        yield current_date, current
+
+
+def game_tail(records, count):
+    """Return ``(games, dates)``: the number of games in ``records`` and the dates of the last ``count``.
+
+    A ``record_archive.History`` answers from its index and the hot rows.
+    """
+    if hasattr(records, 'game_tail'):
+        return records.game_tail(count)
+    dates = [date for date, _ in iter_games(records)]
+    return len(dates), dates[max(0, len(dates) - count):]
+
+
+def is_synced(state, game_records, new_dates):
+    """True if ``state`` covers exactly the games of ``game_records`` before ``new_dates``.
+
+    ``new_dates`` must be the last games of ``game_records``. The state only
+    records its game count and last game date (``games`` / ``lastGame``), so
+    the check does not walk the whole history.
+    """
+    if state is None:
+        return False
+    games, tail = game_tail(game_records, len(new_dates) + 1)
+    if len(tail) < len(new_dates) or tail[len(tail) - len(new_dates):] != new_dates:
+        return False
+    previous = tail[:len(tail) - len(new_dates)]
+    return state['games'] == games - len(new_dates) and state['lastGame'] == (previous[-1] if previous else None)
+
+
+def rebuild_from_records(records):
+    """Replay all game records (in order) into a fresh state."""
+    state = new_state()
+    seen = set()
+    for date, game in iter_games(records):
+        if date in seen:
+            logging.warning(f"Skill rating: date {date} appears in non-adjacent rows, applying as a separate game")
+        seen.add(date)
+        apply_game(state, date, game)
+    return state
+
+
+def rebuild_from_csv(records_path):
+    """Stream ``team_building_record.csv`` once and rebuild the rating state.
+
+    Sealed quarters in the ``archive/`` directory next to it are replayed first.
+    """
+    archive = record_archive.Archive(os.path.dirname(os.path.abspath(records_path)))
+    if not os.path.exists(records_path):
+        logging.warning(f"CSV file not found: {records_path}")
+        return rebuild_from_records(archive.rows())
+    with open(records_path, 'r', encoding='utf-8') as file:
+        records, quarantined = record_normalize.normalize_records(csv.DictReader(file))
+    for item in quarantined:
+        logging.warning(f"Skill rating: skipping record row {item['row'] + 2}: {'; '.join(item['reasons'])}")
+    return rebuild_from_records(itertools.chain(archive.rows(), records))
+
+
+def load_ratings(path):
+    """Load the rating state, or None if the file is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('version') != 1:
+            logging.warning(f"Unsupported rating state version in {path}")
+            return None
+        # Older files listed every applied date; games / lastGame carry the same sync check
+        state.pop('appliedDates', None)
+        return state
+    except (IOError, ValueError) as e:
+        logging.warning(f"Failed to read rating state {path}: {str(e)}")
+        return None
+
+
+def save_ratings(path, state):
+    """Write the rating state atomically."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    os.chmod(temp_path, 0o664)
+    os.replace(temp_path, path)
+
+
+def update_ratings(path, game_records, new_games, save=True):
+    """Bring the rating state up to date after a commit (and save it unless ``save`` is False).
+
+    ``game_records`` is the full merged history and ``new_games`` the list of
+    ``(date, records)`` just committed. The stored state is updated
+    incrementally when it covers exactly the history before ``new_games``;
+    otherwise it is rebuilt from ``game_records``.
+    """
+    state = load_ratings(path)
+    if is_synced(state, game_records, [date for date, _ in new_games]):
+        for date, records in new_games:
+            apply_game(state, date, records)
+        logging.info(f"Skill rating: applied {len(new_games)} new game(s) incrementally")
+    else:
+        state = rebuild_from_records(game_records)
+        logging.info(f"Skill rating: rebuilt from {state['games']} game(s)")
+
+    if save:
+        save_ratings(path, state)
+    return state
+
+
+def rating_of(state, player):
+    """Return the rounded rating of ``player`` (initial rating if unrated)."""
+    entry = state['players'].get(player) if state else None
+    rating = entry['rating'] if entry else INITIAL_RATING
+    return round(rating)
+
+
+if __name__ == "__main__":
+    # python3 skill_rating.py [team_building_record.csv] [player_ratings.json]
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    records_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, 'team_building_record.csv')
+    ratings_file = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, RATINGS_FILE)
+
+    rebuilt = rebuild_from_csv(records_file)
+    save_ratings(ratings_file, rebuilt)
+    print(f"Rebuilt ratings from {rebuilt['games']} games for {len(rebuilt['players'])} players -> {ratings_file}")
+    for name, info in sorted(rebuilt['players'].items(), key=lambda item: -item[1]['rating']):
+        print(f"  {name}: {round(info['rating'])} ({info['games']} games)")
@@ -0,0 +1,369 @@
+"""Check the live player statistics against a full recompute.
+
+``player_statistics.csv`` is produced incrementally (commits, reloads, crash
+recovery, archived quarter totals). The verifier ignores all of that state
+and replays the ground truth: the baseline ``player_statistics_251029.csv``
+plus every game record, archived segments (read and checksummed from the raw
+rows, not from their stored totals) and the hot ``team_building_record.csv``.
+
+The history is cut into chunks - one per archive segment and one per
+CHUNK_ROWS hot rows on game-day boundaries - that are summed in parallel
+across a process pool; the merge is a per-player addition, so chunk order
+does not matter. Skill ratings depend on the game order and are replayed
+sequentially, as one more pool task. The result is diffed per player and
+per field (WinChips, counts, WinningRate, Ranking, Date, Rating) against
+the live file; a data version change during the run
+(a commit) makes it start over, up to MAX_ATTEMPTS times. ``--timeout``
+bounds the wall time: chunks still running then are abandoned and the run
+is reported as incomplete.
+
+::
+
+    python3 stats_verifier.py [--workers 4] [--timeout 300] [--report verify_report.json]
+
+Exit code 0 = consistent, 1 = drift found, 2 = incomplete or failed. The
+server runs the same check every AIRANKING_VERIFY_INTERVAL seconds in a
+``nice`` child process (``BackgroundVerifier``) and logs drift as an error.
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime
+
+import data_version
+import ranking_index
+import record_archive
+import settlement
+import skill_rating
+
+BASELINE_FILE = 'player_statistics_251029.csv'
+STATS_FILE = 'player_statistics.csv'
+REPORT_FILE = 'verify_report.json'
+# Hot rows per pool task
+CHUNK_ROWS = 20000
+MAX_ATTEMPTS = 3
+DEFAULT_TIMEOUT = 300.0
+COUNT_FIELDS = ('AttendCount', 'WinCount', 'LoseCount', 'PeaceCount')
+# Lowest CPU priority for the background run
+NICE = 19
+
+
+def sum_rows(rows):
+    """``{player: [cents, attend, wins, losses, peaces]}`` and the latest date of ``rows``."""
+    totals = {}
+    latest = None
+    for row in rows:
+        player = row.get('Player')
+        if not player:
+            continue
+        cents = settlement.final_cents(row)
+        total = totals.setdefault(player, [0, 0, 0, 0, 0])
+        total[0] += cents
+        total[1] += 1
+        total[2 if cents > 0 else (3 if cents < 0 else 4)] += 1
+        if latest is None or row['Time'] > latest:
+            latest = row['Time']
+    return totals, latest
+
+
+def sum_segment(path, sha256):
+    """Pool task: decompress one archive segment and sum it."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ValueError(f"{os.path.basename(path)} does not match its checksum")
+    return sum_rows(csv.DictReader(io.StringIO(zlib.decompress(data).decode('utf-8'))))
+
+
+def replay_ratings(data_dir):
+    """Pool task: replay the ratings over the whole history; ``{player: rating}``."""
+    history, _ = record_archive.read_history(data_dir)
+    state = skill_rating.rebuild_from_records(history)
+    return {player: skill_rating.rating_of(state, player) for player in state['players']}
+
+
+def _hot_chunks(rows, size):
+    """Split ``rows`` into chunks of about ``size`` rows, never inside a game day."""
+    chunk = []
+    for row in rows:
+        if len(chunk) >= size and row['Time'] != chunk[-1]['Time']:
+            yield chunk
+            chunk = []
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (ValueError, TypeError):
+        return 0
+
+
+def expected_stats(baseline_rows, totals, latest):
+    """Build player_statistics rows the way the server does, from scratch."""
+    stats = {}
+    for row in baseline_rows:
+        player = row.get('Player')
+        if not player:
+            continue
+        try:
+            cents = settlement.to_cents(row.get('WinChips', 0) or 0)
+        except ValueError:
+            cents = 0
+        stats[player] = [cents] + [_to_int(row.get(field)) for field in COUNT_FIELDS]
+    for player, values in totals.items():
+        stat = stats.setdefault(player, [0, 0, 0, 0, 0])
+        for i, value in enumerate(values):
+            stat[i] += value
+    rows = []
+    for player, (cents, attend, wins, losses, peaces) in stats.items():
+        rows.append({
+            'Player': player,
+            'WinChips': settlement.round_cents(cents),
+            'AttendCount': attend,
+            'WinCount': wins,
+            'LoseCount': losses,
+            'PeaceCount': peaces,
+            'WinningRate': f"{(wins / attend) * 100 if attend > 0 else 0:.2f}%",
+            'Date': latest
+        })
+    rows.sort(key=ranking_index.rank_key)
+    for i, row in enumerate(rows):
+        row['Ranking'] = i + 1
+    return {row['Player']: row for row in rows}
+
+
+def _same(field, expected, actual):
+    if actual is None or actual == '':
+        return expected is None or expected == ''
+    if field == 'WinChips':
+        try:
+            # Both sides are rounded the same way from integer cents: no tolerance
+            return settlement.to_cents(actual) == settlement.to_cents(expected)
+        except ValueError:
+            return False
+    if field in COUNT_FIELDS or field in ('Ranking', 'Rating'):
+        try:
+            return float(actual) == expected
+        except (ValueError, TypeError):
+            return False
+    return str(actual) == str(expected)
+
+
+def diff_stats(expected, live_rows):
+    """Per-player, per-field differences between the recompute and the live rows."""
+    drift = []
+    live = {row.get('Player'): row for row in live_rows if row.get('Player')}
+    for player in sorted(set(expected) | set(live)):
+        if player not in live:
+            drift.append({'player': player, 'field': None, 'expected': 'present', 'actual': 'missing'})
+            continue
+        if player not in expected:
+            drift.append({'player': player, 'field': None, 'expected': 'absent', 'actual': 'present'})
+            continue
+        for field, value in expected[player].items():
+            if field == 'Player' or (field == 'Rating' and 'Rating' not in live[player]):
+                continue
+            if not _same(field, value, live[player].get(field)):
+                drift.append({'player': player, 'field': field, 'expected': value, 'actual': live[player].get(field)})
+    return drift
+
+
+def _recompute(data_dir, pool, deadline, ratings):
+    """One pass: returns ``(expected, live_rows, version, problems, complete)``."""
+    version_path = os.path.join(data_dir, data_version.VERSION_FILE)
+    version = data_version.load(version_path)['version']
+    # Ratings depend on the game order: one sequential replay, started first as the longest task
+    rating_task = pool.apply_async(replay_ratings, (data_dir,)) if ratings else None
+    history, quarantined = record_archive.read_history(data_dir)
+    problems = [f"record row {item['row'] + 2} cannot be parsed: {'; '.join(item['reasons'])}" for item in quarantined]
+
+    tasks = [pool.apply_async(sum_segment, (os.path.join(history.archive.path, segment['file']), segment['sha256']))
+             for segment in history.archive.segments]
+    tasks += [pool.apply_async(sum_rows, (chunk,)) for chunk in _hot_chunks(history.hot, CHUNK_ROWS)]
+
+    totals = {}
+    latest = []
+    complete = True
+    for task in tasks:
+        try:
+            chunk_totals, chunk_latest = task.get(timeout=max(deadline - time.monotonic(), 0))
+        except multiprocessing.TimeoutError:
+            complete = False
+            break
+        except Exception as e:
+            problems.append(f"chunk failed: {str(e)}")
+            continue
+        latest.append(chunk_latest)
+        for player, values in chunk_totals.items():
+            total = totals.setdefault(player, [0, 0, 0, 0, 0])
+            for i, value in enumerate(values):
+                total[i] += value
+
+    expected = expected_stats(_read_csv(os.path.join(data_dir, BASELINE_FILE)), totals,
+                              max(filter(None, latest), default=None))
+    if rating_task is not None and complete:
+        try:
+            rating_of = rating_task.get(timeout=max(deadline - time.monotonic(), 0))
+            for player, row in expected.items():
+                row['Rating'] = rating_of.get(player, round(skill_rating.INITIAL_RATING))
+        except multiprocessing.TimeoutError:
+            complete = False
+        except Exception as e:
+            problems.append(f"rating replay failed: {str(e)}")
+    live_rows = _read_csv(os.path.join(data_dir, STATS_FILE))
+    if data_version.load(version_path)['version'] != version:
+        version = None
+    return expected, live_rows, version, problems, complete
+
+
+def verify(data_dir, workers=None, timeout=DEFAULT_TIMEOUT, ratings=True):
+    """Recompute the statistics and diff them against the live file; return the report."""
+    started = time.monotonic()
+    deadline = started + timeout
+    report = {'time': datetime.now().isoformat(timespec='seconds'), 'dataDir': data_dir}
+    pool = multiprocessing.Pool(workers)
+    try:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            expected, live_rows, version, problems, complete = _recompute(data_dir, pool, deadline, ratings)
+            if version is not None or not complete:
+                break
+            logging.info(f"Data version changed during verification, starting over (attempt {attempt})")
+    finally:
+        # Chunks still running past the deadline are abandoned
+        pool.terminate()
+        pool.join()
+    if not complete:
+        problems.append(f"timed out after {timeout:g}s")
+    elif version is None:
+        problems.append(f"data changed during {MAX_ATTEMPTS} attempts")
+        complete = False
+    drift = diff_stats(expected, live_rows) if complete else []
+    report.update({
+        'version': version,
+        'complete': complete,
+        'players': len(expected),
+        'drift': drift,
+        'problems': problems,
+        'seconds': round(time.monotonic() - started, 3)
+    })
+    return report
+
+
+def save_report(path, report):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=1)
+    os.chmod(temp_path, 0o664)
+    os.replace(temp_path, path)
+
+
+def exit_code(report):
+    if not report['complete'] or report['problems']:
+        return 2
+    return 1 if report['drift'] else 0
+
+
+class BackgroundVerifier:
+    """Runs this module in a ``nice`` child process every ``interval`` seconds.
+
+    ``poll()`` is called from the serve loop between requests (no threads):
+    it starts a run when one is due and logs the report of a finished run.
+    """
+
+    def __init__(self, data_dir, interval, workers=1, timeout=DEFAULT_TIMEOUT):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.workers = workers
+        self.timeout = timeout
+        self.report_path = os.path.join(data_dir, REPORT_FILE)
+        self.process = None
+        self.next_run = time.monotonic() + interval
+
+    def poll(self):
+        if self.process is None:
+            if time.monotonic() >= self.next_run:
+                self.start()
+            return
+        if self.process.poll() is None:
+            return
+        code = self.process.returncode
+        self.process = None
+        self.next_run = time.monotonic() + self.interval
+        self.log_report(code)
+
+    def start(self):
+        command = [sys.executable, os.path.abspath(__file__), '--data-dir', self.data_dir, '--workers', str(self.workers),
+                   '--timeout', str(self.timeout), '--report', self.report_path, '--quiet']
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                        preexec_fn=lambda: os.nice(NICE))
+        logging.info(f"🔎 Background statistics verification started (pid {self.process.pid})")
+
+    def log_report(self, code):
+        try:
+            with open(self.report_path, 'r', encoding='utf-8') as file:
+                report = json.load(file)
+        except (IOError, ValueError) as e:
+            logging.error(f"❌ Statistics verification exited with {code} and no readable report: {str(e)}")
+            return
+        if code == 0:
+            logging.info(f"✓ Statistics verified: {report['players']} players match a full recompute "
+                         f"(v{report['version']}, {report['seconds']}s)")
+        elif code == 1:
+            sample = '; '.join(f"{d['player']}.{d['field']}: {d['actual']} != {d['expected']}" for d in report['drift'][:5])
+            logging.error(f"❌ STATISTICS DRIFT: {len(report['drift'])} difference(s) against a full recompute "
+                          f"(v{report['version']}), see {self.report_path}: {sample}")
+        else:
+            logging.warning(f"⚠️ Statistics verification incomplete: {report['problems']}")
+
+
+def main(argv=None):
+    base_dir = os.environ.get('AIRANKING_DATA_DIR') or os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Verify player_statistics.csv against a full recompute")
+    parser.add_argument('--data-dir', default=base_dir, help="data directory (default: AIRANKING_DATA_DIR or script dir)")
+    parser.add_argument('--workers', type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="wall time limit in seconds")
+    parser.add_argument('--report', default=None, help="write the JSON report to this file")
+    parser.add_argument('--no-ratings', action='store_true', help="skip the sequential rating replay")
+    parser.add_argument('--quiet', action='store_true', help="print nothing (exit code and report only)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format='%(message)s')
+    try:
+        report = verify(args.data_dir, args.workers, args.timeout, not args.no_ratings)
+    except Exception as e:
+        report = {'time': datetime.now().isoformat(timespec='seconds'), 'dataDir': args.data_dir, 'version': None,
+                  'complete': False, 'players': 0, 'drift': [], 'problems': [f"{type(e).__name__}: {str(e)}"], 'seconds': 0}
+    if args.report:
+        save_report(args.report, report)
+    if not args.quiet:
+        for problem in report['problems']:
+            print(f"❌ {problem}")
+        for item in report['drift']:
+            print(f"❌ {item['player']} {item['field'] or ''}: live {item['actual']}, expected {item['expected']}")
+        status = 'incomplete' if not report['complete'] else f"{len(report['drift'])} difference(s)"
+        print(f"{report['players']} players checked at v{report['version']} in {report['seconds']}s: {status}")
+    return exit_code(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
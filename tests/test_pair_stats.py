@@ -0,0 +1,141 @@
+"""Tests for the sparse pair matrix in pair_stats.py.
+
+The matrix kept up to date commit by commit (``update_pairs``) must equal
+``rebuild_from_records`` over the same history, and a history the
+``games`` / ``lastGame`` marker does not cover must be rebuilt.
+
+    python3 -m unittest discover -s tests
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pair_stats  # noqa: E402
+import skill_rating  # noqa: E402
+
+PLAYERS = ['Anton', 'Peter', 'West', 'Onion', 'mimi', 'BigTree', 'Seek', '张三']
+
+
+def random_days(count, seed=8, start=date(2025, 10, 4)):
+    """``count`` game days a week apart as ``(date, rows)``, some with ties and repeated players."""
+    rng = random.Random(seed)
+    days = []
+    for i in range(count):
+        day = (start + timedelta(weeks=i)).isoformat()
+        table = rng.sample(PLAYERS, rng.randint(2, 7))
+        chips = [rng.choice((0.0, 40.0, -40.0, round(rng.uniform(-300, 300), 2))) for _ in table[:-1]]
+        chips.append(-round(sum(chips), 2))
+        rows = [{'Time': day, 'Player': player, 'FinalChips': f"{value:.2f}"} for player, value in zip(table, chips)]
+        if i % 5 == 4:
+            # A player with two rows on one day
+            rows.append({'Time': day, 'Player': table[0], 'FinalChips': '-5.00'})
+            rows.append({'Time': day, 'Player': table[1], 'FinalChips': '5.00'})
+        days.append((day, rows))
+    return days
+
+
+class PairMatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, pair_stats.PAIRS_FILE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def commit(self, records, new_games):
+        """Append ``new_games`` to ``records`` like a commit; return True if it was incremental."""
+        for _, rows in new_games:
+            records.extend(rows)
+        with self.assertLogs(level='INFO') as logs:
+            pair_stats.update_pairs(self.path, records, new_games)
+        return any('added' in line for line in logs.output)
+
+    def test_incremental_equals_rebuild(self):
+        records = []
+        for i, game in enumerate(random_days(15)):
+            with self.subTest(day=game[0]):
+                self.assertEqual(self.commit(records, [game]), i > 0)
+                self.assertEqual(pair_stats.load_state(self.path), pair_stats.rebuild_from_records(records))
+
+    def test_batch_commits_equal_rebuild(self):
+        days = random_days(14)
+        records = []
+        for start in range(0, len(days), 4):
+            self.commit(records, days[start:start + 4])
+        rebuilt = pair_stats.rebuild_from_records(records)
+        self.assertEqual(pair_stats.load_state(self.path), rebuilt)
+        self.assertEqual((rebuilt['games'], rebuilt['lastGame']), (len(days), days[-1][0]))
+
+    def test_uncovered_history_change_rebuilds(self):
+        days = random_days(10)
+        extra = ('2025-09-27', [{'Time': '2025-09-27', 'Player': 'Anton', 'FinalChips': '10.00'},
+                                {'Time': '2025-09-27', 'Player': 'Seek', 'FinalChips': '-10.00'}])
+        cases = {
+            'day inserted before the state': lambda records: extra[1] + records,
+            'day removed from the middle': lambda records: [r for r in records if r['Time'] != days[2][0]],
+            # Same game count, different last date: a history the state never saw
+            'last day replaced': lambda records: [r for r in records if r['Time'] != days[5][0]] + [
+                {**r, 'Time': '2025-11-09'} for r in days[5][1]],
+        }
+        for name, change in cases.items():
+            with self.subTest(case=name):
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                records = []
+                for game in days[:6]:
+                    self.commit(records, [game])
+                records = change(records)
+                self.assertFalse(self.commit(records, [days[6]]))
+                self.assertEqual(pair_stats.load_state(self.path), pair_stats.rebuild_from_records(records))
+                # In step again: the next commit is incremental
+                self.assertTrue(self.commit(records, [days[7]]))
+                self.assertEqual(pair_stats.load_state(self.path), pair_stats.rebuild_from_records(records))
+
+    def test_version_2_state_keeps_syncing_incrementally(self):
+        days = random_days(6)
+        records = [row for _, rows in days[:5] for row in rows]
+        state = pair_stats.rebuild_from_records(records)
+        del state['games'], state['lastGame']
+        state.update(version=2, appliedDates=[day for day, _ in days[:5]])
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        self.assertTrue(self.commit(records, [days[5]]))
+        saved = pair_stats.load_state(self.path)
+        self.assertNotIn('appliedDates', saved)
+        self.assertEqual(saved, pair_stats.rebuild_from_records(records))
+
+    def test_matches_rating_marker(self):
+        # Both state files are kept in step by the same skill_rating.is_synced check
+        records = [row for _, rows in random_days(9) for row in rows]
+        state = pair_stats.rebuild_from_records(records)
+        ratings = skill_rating.rebuild_from_records(records)
+        self.assertEqual((state['games'], state['lastGame']), (ratings['games'], ratings['lastGame']))
+
+
+class PairCacheTest(unittest.TestCase):
+
+    def test_reloads_only_on_a_new_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, pair_stats.PAIRS_FILE)
+            cache = pair_stats.PairCache(path)
+            self.assertEqual(cache.get(0), pair_stats.new_state())
+            days = random_days(3)
+            records = [row for _, rows in days for row in rows]
+            pair_stats.save_state(path, pair_stats.rebuild_from_records(records))
+            # Same version: the loaded matrix is kept, the file is not read again
+            self.assertEqual(cache.get(0)['games'], 0)
+            first = cache.get(1)
+            self.assertEqual(first, pair_stats.rebuild_from_records(records))
+            self.assertIs(cache.get(1), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
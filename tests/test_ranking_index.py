@@ -0,0 +1,82 @@
+"""Tests for the ordered ranking index in ranking_index.py.
+
+A page of the index must be the same rows, in the same form, as the slice of
+the full /leaderboard (``player_statistics.csv`` read with ``csv.DictReader``).
+
+    python3 -m unittest discover -s tests
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ranking_index  # noqa: E402
+
+FIELDS = ('Player', 'WinChips', 'AttendCount', 'WinCount', 'LoseCount', 'PeaceCount',
+          'WinningRate', 'Date', 'Ranking')
+
+
+def board_from_csv(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def synthetic_board(players=60, seed=3):
+    """A player_statistics.csv as the server writes it, with many WinChips ties."""
+    rng = random.Random(seed)
+    rows = [{'Player': f"P{i:03d}", 'WinChips': rng.choice((-120.5, 0.0, 33.3, 250.0, 1000.1)),
+             'AttendCount': 10, 'WinCount': 5, 'LoseCount': 5, 'PeaceCount': 0,
+             'WinningRate': '50.00%', 'Date': '2026-02-03'} for i in range(players)]
+    rng.shuffle(rows)
+    rows.sort(key=ranking_index.rank_key)
+    for i, row in enumerate(rows):
+        row['Ranking'] = i + 1
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return list(csv.DictReader(io.StringIO(out.getvalue())))
+
+
+class PageTest(unittest.TestCase):
+
+    def boards(self):
+        yield 'player_statistics.csv', board_from_csv(os.path.join(ROOT, 'player_statistics.csv'))
+        yield 'synthetic', synthetic_board()
+
+    def index_of(self, board):
+        shuffled = list(board)
+        random.Random(1).shuffle(shuffled)
+        return ranking_index.RankingIndex.from_rows(shuffled, max(row['Date'] for row in board))
+
+    def test_top_n_is_the_head_of_the_full_board(self):
+        for name, board in self.boards():
+            index = self.index_of(board)
+            for n in range(len(board) + 2):
+                with self.subTest(board=name, top=n):
+                    self.assertEqual(index.page(0, n), board[:n])
+
+    def test_every_page_matches_the_full_board(self):
+        for name, board in self.boards():
+            index = self.index_of(board)
+            for offset in range(len(board) + 1):
+                for limit in (1, 7, len(board)):
+                    with self.subTest(board=name, offset=offset, limit=limit):
+                        self.assertEqual(index.page(offset, limit), board[offset:offset + limit])
+
+    def test_rank_of_matches_stored_ranking(self):
+        for name, board in self.boards():
+            index = self.index_of(board)
+            for row in board:
+                with self.subTest(board=name, player=row['Player']):
+                    self.assertEqual(str(index.rank_of(row['Player'])), row['Ranking'])
+
+
+if __name__ == '__main__':
+    unittest.main()
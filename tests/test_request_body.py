@@ -0,0 +1,111 @@
+"""Tests for the streaming JSON decoder in request_body.py.
+
+Every payload is split at every byte offset (and fed one byte at a time) to
+check that values crossing a chunk boundary decode exactly as ``json.loads``.
+
+    python3 -m unittest discover -s tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import request_body  # noqa: E402
+
+STREAM_KEYS = ('newRecords', 'gameDays')
+
+PAYLOADS = [
+    b'{}',
+    b'{"n":1e3}',
+    b'{"n": -12.5E-2, "m": 0}',
+    b'{"a": 1, "b": 23456789, "c": 0.25, "d": -0, "e": 1E+2}',
+    b'{"flag": true, "off": false, "none": null, "list": [1, 2.5, -3e1]}',
+    '{"name": "张三", "note": "\\u00e9t\\u00e9 \\"quoted\\""}'.encode('utf-8'),
+    b'{"password": "88888", "serviceFee": 10, "dryRun": false}',
+    ('{"password": "88888", "newRecords": ['
+     '{"Time": "2025-10-01", "Player": "王五", "Chips": 120, "FinalChips": "115.5"},'
+     '{"Time": "2025-10-01", "Player": "Anton", "Chips": -120, "FinalChips": -120}]}').encode('utf-8'),
+    (b'{"gameDays": [{"date": "2025-10-02", "records": [{"Player": "A", "Chips": 1e2}, '
+     b'{"Player": "B", "Chips": -100}]}, {"date": "2025-10-03", "records": []}], "n": 7}'),
+    b'{"gameDays": [], "newRecords": [ ], "tail": 12}',
+    b'  {\r\n "x" : [ {"y": [ ]} ] , "z":-1.0e-1 }\n',
+]
+
+INVALID = [
+    b'',
+    b'[1, 2]',
+    b'{"n": 1e}',
+    b'{"n": 1.}',
+    b'{"n": -}',
+    b'{"n": 01}',
+    b'{"n": 1} x',
+    b'{"n" 1}',
+    b'{"gameDays": [1 2]}',
+    b'{"gameDays": [1, 2}',
+    b'{"s": "unterminated}',
+    b'{"n": 1',
+]
+
+
+def splits(payload):
+    """``payload`` cut into two chunks at every offset, then one byte per chunk."""
+    for offset in range(len(payload) + 1):
+        yield [payload[:offset], payload[offset:]]
+    yield [payload[i:i + 1] for i in range(len(payload))]
+
+
+class ParseJSONObjectTest(unittest.TestCase):
+
+    def test_every_split_matches_json_loads(self):
+        for payload in PAYLOADS:
+            expected = json.loads(payload.decode('utf-8'))
+            for chunks in splits(payload):
+                with self.subTest(chunks=chunks):
+                    self.assertEqual(request_body.parse_json_object(chunks, STREAM_KEYS), expected)
+
+    def test_number_split_after_exponent(self):
+        self.assertEqual(request_body.parse_json_object([b'{"n":1e', b'3}']), {'n': 1000.0})
+
+    def test_streamed_items_are_reported_in_order(self):
+        payload = PAYLOADS[8]
+        expected = [('gameDays', i, day) for i, day in enumerate(json.loads(payload)['gameDays'])]
+        for chunks in splits(payload):
+            seen = []
+            request_body.parse_json_object(chunks, STREAM_KEYS, lambda *item: seen.append(item))
+            self.assertEqual(seen, expected)
+
+    def test_callback_error_aborts_parsing(self):
+        def reject(key, index, item):
+            raise request_body.RequestBodyError(400, f"{key}[{index}] rejected")
+
+        consumed = []
+
+        def chunks():
+            for chunk in (b'{"newRecords": [{"a": 1}, ', b'{"a": 2}]}'):
+                consumed.append(chunk)
+                yield chunk
+
+        with self.assertRaises(request_body.RequestBodyError) as raised:
+            request_body.parse_json_object(chunks(), STREAM_KEYS, reject)
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(len(consumed), 1)
+
+    def test_invalid_payloads_fail_at_every_split(self):
+        for payload in INVALID:
+            for chunks in splits(payload):
+                with self.subTest(chunks=chunks):
+                    with self.assertRaises(ValueError):
+                        request_body.parse_json_object(chunks, STREAM_KEYS)
+
+    def test_invalid_utf8(self):
+        for chunks in splits('{"s": "é"}'.encode('latin-1')):
+            with self.assertRaises(request_body.RequestBodyError) as raised:
+                request_body.parse_json_object(chunks, STREAM_KEYS)
+            self.assertEqual(raised.exception.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Tests for the integer-cent fee settlement in settlement.py.
+
+    python3 -m unittest discover -s tests
+"""
+
+import itertools
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settlement  # noqa: E402
+
+
+def random_table(rng):
+    """``[(player, cents), ...]`` summing to zero, with ties, zeros and losers."""
+    players = rng.sample(['Anton', 'Peter', 'West', 'Onion', 'mimi', '张三', 'Zed', 'a'], rng.randint(1, 8))
+    chips = [rng.choice((0, 100, 3300, 10000, rng.randint(-50000, 50000))) for _ in players[:-1]]
+    chips.append(-sum(chips))
+    return list(zip(players, chips))
+
+
+class AllocateFeeTest(unittest.TestCase):
+
+    def test_shares_sum_exactly_to_the_fee(self):
+        rng = random.Random(5)
+        for _ in range(3000):
+            chips = random_table(rng)
+            fee = rng.choice((0, 1, 999, 1000, 3333, rng.randint(0, 100000)))
+            with self.subTest(chips=chips, fee=fee):
+                fees = settlement.allocate_fee(chips, fee)
+                winners = any(amount > 0 for _, amount in chips)
+                self.assertEqual(sum(fees), fee if winners else 0)
+                for (_, amount), share in zip(chips, fees):
+                    if amount <= 0:
+                        self.assertEqual(share, 0)
+                    else:
+                        # Never more than one cent away from the exact proportional share
+                        total = sum(a for _, a in chips if a > 0)
+                        self.assertLessEqual(abs(share * total - fee * amount), total)
+
+    def test_leftover_cents_go_to_largest_remainders(self):
+        # 10.00 over three equal winners: 3.34 + 3.33 + 3.33, the extra cent by name
+        chips = [('C', 10000), ('A', 10000), ('B', 10000), ('D', -30000)]
+        self.assertEqual(settlement.allocate_fee(chips, 1000), [333, 334, 333, 0])
+        # One cent over 1.00 and 2.00 of winnings: the larger remainder (2.00) gets it
+        self.assertEqual(settlement.allocate_fee([('A', 100), ('B', 200), ('C', -300)], 1), [0, 1, 0])
+
+    def test_result_does_not_depend_on_player_order(self):
+        rng = random.Random(9)
+        for _ in range(200):
+            chips = random_table(rng)[:6]
+            fee = rng.randint(0, 5000)
+            expected = dict(zip((p for p, _ in chips), settlement.allocate_fee(chips, fee)))
+            for order in itertools.islice(itertools.permutations(chips), 24):
+                with self.subTest(chips=order, fee=fee):
+                    fees = settlement.allocate_fee(list(order), fee)
+                    self.assertEqual(dict(zip((p for p, _ in order), fees)), expected)
+
+    def test_no_winners_pay_no_fee(self):
+        self.assertEqual(settlement.allocate_fee([('A', 0), ('B', 0)], 1000), [0, 0])
+        self.assertEqual(settlement.allocate_fee([], 1000), [])
+
+
+class CentsTest(unittest.TestCase):
+
+    def test_half_cents_round_half_up(self):
+        cases = {
+            '0.005': 1, '-0.005': -1, '0.015': 2, '1.005': 101, '2.675': 268, '-2.675': -268,
+            '0.004': 0, '-0.004': 0, '10': 1000, 7: 700, '-3.5': -350, '1e-2': 1, ' 12.34 ': 1234
+        }
+        for text, cents in cases.items():
+            with self.subTest(value=text):
+                self.assertEqual(settlement.to_cents(text), cents)
+
+    def test_round_cents_half_away_from_zero(self):
+        cases = [((5,), 0.1), ((-5,), -0.1), ((4,), 0.0), ((-4,), 0.0),
+                 ((315495,), 3155.0), ((315494,), 3154.9), ((315485,), 3154.9),
+                 ((50, 0), 1.0), ((-150, 0), -2.0), ((49, 0), 0.0), ((1234, 2), 12.34)]
+        for args, expected in cases:
+            with self.subTest(args=args):
+                self.assertEqual(settlement.round_cents(*args), expected)
+
+    def test_to_cents_rejects_malformed_amounts(self):
+        for value in ('', 'abc', '1,5', '1.2.3', '--1', 'nan', 'inf', '-Infinity', None, True, False, [1], {}):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    settlement.to_cents(value)
+
+    def test_final_cents_treats_bad_values_as_zero(self):
+        self.assertEqual(settlement.final_cents({'FinalChips': '-12.50'}), -1250)
+        self.assertEqual(settlement.final_cents({'FinalChips': 'n/a'}), 0)
+        self.assertEqual(settlement.final_cents({}), 0)
+
+
+class SettleTest(unittest.TestCase):
+
+    def test_losers_and_peace_keep_their_chips(self):
+        result = settlement.settle([
+            {'Player': 'A', 'Chips': 150}, {'Player': 'B', 'Chips': 0},
+            {'Player': 'C', 'Chips': -100}, {'Player': 'D', 'Chips': '-50'}
+        ], '7.5')
+        rows = {row['Player']: row for row in result['players']}
+        self.assertEqual([row['Player'] for row in result['players']], ['A', 'B', 'C', 'D'])
+        self.assertEqual(rows['A']['ServiceFee'], '7.50')
+        self.assertEqual(rows['A']['FinalChips'], '142.50')
+        self.assertEqual((rows['B']['WinOrLose'], rows['B']['ServiceFeeCents'], rows['B']['FinalChips']),
+                         ('Peace', 0, '0.00'))
+        self.assertEqual((rows['C']['WinOrLose'], rows['C']['ServiceFee'], rows['C']['FinalChipsCents']),
+                         ('Lose', '0.00', -10000))
+        self.assertEqual(rows['D']['FinalChips'], '-50.00')
+        self.assertEqual(result['ServiceFee_Rate'], '7.50')
+        self.assertEqual(result['totalWinChips'], '150.00')
+
+    def test_final_chips_add_up_to_minus_the_fee(self):
+        rng = random.Random(11)
+        for _ in range(500):
+            table = random_table(rng)
+            fee = rng.randint(0, 20000)
+            players = [{'Player': p, 'Chips': f"{c / 100:.2f}"} for p, c in table]
+            with self.subTest(players=players, fee=fee):
+                result = settlement.settle(players, settlement.format_cents(fee))
+                total = sum(row['FinalChipsCents'] for row in result['players'])
+                winners = any(c > 0 for _, c in table)
+                self.assertEqual(total, -fee if winners else 0)
+
+    def test_invalid_days_are_rejected(self):
+        cases = [
+            ([], 10),
+            ([{'Player': 'A', 'Chips': 10}, {'Player': 'B', 'Chips': -5}], 10),
+            ([{'Player': 'A', 'Chips': 10}, {'Player': 'A', 'Chips': -10}], 10),
+            ([{'Player': 'A', 'Chips': 'ten'}, {'Player': 'B', 'Chips': -10}], 10),
+            ([{'Player': '', 'Chips': 0}], 10),
+            ([{'Player': 'A', 'Chips': 10}, {'Player': 'B', 'Chips': -10}], -1),
+            ([{'Player': 'A', 'Chips': 10}, {'Player': 'B', 'Chips': -10}], 'abc'),
+        ]
+        for players, fee in cases:
+            with self.subTest(players=players, fee=fee):
+                with self.assertRaises(ValueError):
+                    settlement.settle(players, fee)
+
+
+if __name__ == '__main__':
+    unittest.main()
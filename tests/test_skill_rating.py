@@ -0,0 +1,123 @@
+"""Tests for the incremental skill ratings in skill_rating.py.
+
+Committing game days one at a time (``update_ratings``) must give exactly the
+state that ``rebuild_from_records`` computes from the same history; the
+``games`` / ``lastGame`` marker decides between the two paths.
+
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_archive  # noqa: E402
+import skill_rating  # noqa: E402
+
+PLAYERS = ['Anton', 'Peter', 'West', 'Onion', 'mimi', 'BigTree', 'Seek', '张三']
+
+
+def day_rows(day, results):
+    return [{'Time': day, 'Player': player, 'FinalChips': f"{chips:.2f}"} for player, chips in results]
+
+
+def random_days(count, seed=4, start=date(2025, 10, 4)):
+    """``count`` game days a week apart, some with tied results."""
+    rng = random.Random(seed)
+    days = []
+    for i in range(count):
+        table = rng.sample(PLAYERS, rng.randint(2, 6))
+        chips = [rng.choice((50.0, -50.0, round(rng.uniform(-300, 300), 2))) for _ in table[:-1]]
+        chips.append(-round(sum(chips), 2))
+        days.append(((start + timedelta(weeks=i)).isoformat(), list(zip(table, chips))))
+    return days
+
+
+def history_with_ties_and_repeated_date():
+    days = random_days(12)
+    # A tie for first and last place
+    days.insert(3, ('2025-10-26', [('Anton', 100.0), ('Peter', 100.0), ('West', -100.0), ('Onion', -100.0)]))
+    # A late correction day filed under an earlier date: same date in non-adjacent rows
+    days.append((days[2][0], [('mimi', 20.5), ('Seek', -20.5)]))
+    days.append(('2026-01-31', [('Anton', 0.0), ('Seek', 0.0)]))
+    return days
+
+
+class IncrementalRatingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, skill_rating.RATINGS_FILE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def commit(self, records, new_days):
+        """Append ``new_days`` to ``records`` like a commit; return True if it was incremental."""
+        new_games = []
+        for day, results in new_days:
+            rows = day_rows(day, results)
+            records.extend(rows)
+            new_games.append((day, rows))
+        with self.assertLogs(level='INFO') as logs:
+            skill_rating.update_ratings(self.path, records, new_games)
+        return any('incrementally' in line for line in logs.output)
+
+    def test_one_by_one_equals_rebuild(self):
+        records = []
+        for i, day in enumerate(history_with_ties_and_repeated_date()):
+            with self.subTest(day=day[0]):
+                # Only the first commit, without a state file, rebuilds
+                self.assertEqual(self.commit(records, [day]), i > 0)
+                self.assertEqual(skill_rating.load_ratings(self.path), skill_rating.rebuild_from_records(records))
+
+    def test_batch_commits_equal_rebuild(self):
+        days = history_with_ties_and_repeated_date()
+        records = []
+        for start in range(0, len(days), 3):
+            self.commit(records, days[start:start + 3])
+        rebuilt = skill_rating.rebuild_from_records(records)
+        self.assertEqual(skill_rating.load_ratings(self.path), rebuilt)
+        self.assertEqual(rebuilt['games'], len(days))
+
+    def test_tie_scores_half(self):
+        state = skill_rating.new_state()
+        rows = day_rows('2025-10-26', [('A', 50), ('B', 50), ('C', -100)])
+        deltas = skill_rating.apply_game(state, '2025-10-26', rows)
+        self.assertEqual(deltas['A'], deltas['B'])
+        self.assertGreater(deltas['A'], 0)
+        self.assertAlmostEqual(sum(deltas.values()), 0.0)
+
+    def test_marker_mismatch_rebuilds(self):
+        days = history_with_ties_and_repeated_date()
+        records = []
+        for day in days[:5]:
+            self.commit(records, [day])
+        # A game day edited into the middle of the history behind the state's back
+        records[:0] = day_rows('2025-09-27', [('Anton', 10.0), ('Peter', -10.0)])
+        self.assertFalse(self.commit(records, [days[5]]))
+        self.assertEqual(skill_rating.load_ratings(self.path), skill_rating.rebuild_from_records(records))
+        # The state is in step again: the next commit is incremental
+        self.assertTrue(self.commit(records, [days[6]]))
+        self.assertEqual(skill_rating.load_ratings(self.path), skill_rating.rebuild_from_records(records))
+
+    def test_archived_history_stays_incremental(self):
+        days = random_days(20)
+        records = []
+        for day in days[:10]:
+            self.commit(records, [day])
+        history = record_archive.load_history(self.tmp.name, records, list(record_archive.FIELDS))
+        self.assertTrue(history.seal(date(2026, 1, 1)))
+        for day in days[10:]:
+            with self.subTest(day=day[0]):
+                self.assertTrue(self.commit(history, [day]))
+        self.assertEqual(skill_rating.load_ratings(self.path), skill_rating.rebuild_from_records(history))
+
+
+if __name__ == '__main__':
+    unittest.main()